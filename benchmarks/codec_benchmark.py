@@ -0,0 +1,113 @@
+"""
+Codec Micro-Benchmark
+
+Compares encode/decode cost and bytes per event for the wire formats used on
+the ZeroMQ hops:
+- legacy:  plain json.dumps per message (what send_json/recv_json did)
+- json:    event_codec's tagged JSON
+- struct:  event_codec's compact binary layout
+- msgpack: for reference, only if the msgpack package happens to be installed
+
+Usage:
+    python3 benchmarks/codec_benchmark.py [--events 20000] [--batch 200] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Shared modules (event codec) live in microservices/Common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "microservices", "Common"))
+
+import event_codec
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def make_events(count, seed=361):
+    """Builds a reproducible mix of events shaped like the Simulator's."""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        kind = rng.choice(["flush", "water_refill", "planet_visit"])
+        if kind == "flush":
+            events.append({"event_type": "flush", "waste_volume": rng.randint(1, 5), "timestamp": time.time()})
+        elif kind == "water_refill":
+            events.append({"event_type": "water_refill", "water_added": rng.randint(10, 50), "timestamp": time.time()})
+        else:
+            events.append({"event_type": "planet_visit", "planet_name": rng.choice(["Mars", "Europa", "Titan", "Ganymede"]),
+                           "timestamp": time.time()})
+    return events
+
+
+def codecs():
+    """Returns {name: (encode(list) -> bytes, decode(bytes) -> list)}."""
+    available = {
+        "legacy": (lambda events: json.dumps(events).encode(), json.loads),
+        "json": (lambda events: event_codec.encode_events(events, "json"), event_codec.decode_events),
+        "struct": (lambda events: event_codec.encode_events(events, "struct"), event_codec.decode_events),
+    }
+    if msgpack is not None:
+        available["msgpack"] = (msgpack.packb, msgpack.unpackb)
+    return available
+
+
+def measure(encode, decode, messages):
+    """Encodes then decodes every message, returning (encode_s, decode_s, total_bytes)."""
+    started = time.perf_counter()
+    payloads = [encode(message) for message in messages]
+    encoded = time.perf_counter()
+    for payload in payloads:
+        decode(payload)
+    decoded = time.perf_counter()
+    return encoded - started, decoded - encoded, sum(len(payload) for payload in payloads)
+
+
+def run(event_count, batch_size):
+    events = make_events(event_count)
+    shapes = {
+        "single": [[event] for event in events],  # Simulator -> LiveTrack, one event per message
+        f"batch{batch_size}": [events[i:i + batch_size] for i in range(0, len(events), batch_size)],  # LiveTrack -> WaterLog
+    }
+
+    results = []
+    for shape, messages in shapes.items():
+        for name, (encode, decode) in codecs().items():
+            encode_s, decode_s, total_bytes = measure(encode, decode, messages)
+            results.append({
+                "codec": name,
+                "shape": shape,
+                "encode_us_per_event": encode_s / event_count * 1e6,
+                "decode_us_per_event": decode_s / event_count * 1e6,
+                "bytes_per_event": total_bytes / event_count,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event wire codecs")
+    parser.add_argument("--events", type=int, default=20000, help="events to encode per run")
+    parser.add_argument("--batch", type=int, default=200, help="events per message in the batch shape")
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON instead of a table")
+    args = parser.parse_args()
+
+    results = run(args.events, args.batch)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'shape':<10} {'codec':<8} {'encode µs/ev':>13} {'decode µs/ev':>13} {'bytes/ev':>9}")
+    for r in results:
+        print(f"{r['shape']:<10} {r['codec']:<8} {r['encode_us_per_event']:>13.2f} "
+              f"{r['decode_us_per_event']:>13.2f} {r['bytes_per_event']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+End-to-End Pipeline Benchmark
+
+Boots WaterLog and LiveTrack locally (same commands as main_program.py) in a
+scratch directory, drives a fixed Simulator load through
+Simulator -> LiveTrack -> WaterLog, and reports:
+- achieved send rate and sustained commit throughput (events/sec)
+- p50/p95/p99 generation-to-commit latency (event timestamp -> logged_at)
+- /history query latency at several table sizes
+
+Results are emitted as JSON so runs can be compared between versions.
+The services bind their usual ports (5001, 5556, 5557), so stop a running
+W.E.T. System first.
+
+Usage:
+    python3 benchmarks/pipeline_benchmark.py --rate 2000 --events 20000 --output results.json
+    python3 benchmarks/pipeline_benchmark.py --sizes 10000,1000000,10000000 --skip-pipeline
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BASE_DIR)
+sys.path.append(os.path.join(BASE_DIR, "microservices", "WaterLog"))
+
+from main_program import SERVICES
+import water_log
+
+WATERLOG_URL = "http://127.0.0.1:5001"
+SIMULATOR_SCRIPT = os.path.join(BASE_DIR, "microservices", "Simulator", "simulator.py")
+# Retention off: the synthetic history spans 30 days and must not be archived mid-run
+WATERLOG_ENV = {"WATERLOG_RETENTION_DAYS": "0"}
+
+
+def service_command(name_prefix):
+    """Returns main_program's command for a service, with its script path made absolute."""
+    for name, command, *_ in SERVICES:
+        if name.startswith(name_prefix):
+            return [sys.executable] + [os.path.join(BASE_DIR, arg) if arg.startswith("./") else arg for arg in command[1:]]
+    raise KeyError(name_prefix)
+
+
+def start_service(name_prefix, workdir, env=None):
+    """Starts a service in its own process group (so reloader children stop with it)."""
+    return subprocess.Popen(service_command(name_prefix), cwd=workdir, env={**os.environ, **(env or {})},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def stop_service(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(proc.pid, signal.SIGKILL)
+
+
+def wait_for_waterlog(timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{WATERLOG_URL}/history", params={"limit": 1}, timeout=1).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("WaterLog did not become ready")
+
+
+def percentiles(samples):
+    """Returns p50/p95/p99/max/mean in milliseconds for samples given in seconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {"p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99),
+            "max_ms": ordered[-1] * 1000, "mean_ms": statistics.fmean(ordered) * 1000, "samples": len(ordered)}
+
+
+def run_pipeline(args, workdir):
+    """Drives args.events through the full pipeline and measures throughput and latency."""
+    database = os.path.join(workdir, "data", "water_log.db")
+    waterlog = start_service("WaterLog", workdir, env=WATERLOG_ENV)
+    livetrack = None
+    try:
+        wait_for_waterlog()
+        livetrack = start_service("LiveTrack", workdir, env={"LIVETRACK_TRANSPORT": args.transport})
+        time.sleep(1)  # LiveTrack has no readiness probe; give its SUB socket time to connect
+
+        report_path = os.path.join(workdir, "simulator_report.json")
+        simulator = subprocess.run(
+            [sys.executable, SIMULATOR_SCRIPT, "--rate", str(args.rate), "--count", str(args.events),
+             "--seed", str(args.seed), "--report-json", report_path, "--report-interval", "3600"],
+            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=args.timeout)
+        if simulator.returncode != 0:
+            raise RuntimeError(f"Simulator exited with {simulator.returncode}")
+        with open(report_path) as f:
+            sim_report = json.load(f)
+
+        # Wait for the tail of the load to be committed (or for the drain timeout)
+        deadline = time.monotonic() + args.drain_timeout
+        committed = 0
+        while time.monotonic() < deadline:
+            committed = sqlite3.connect(database).execute("SELECT COUNT(*) FROM events").fetchone()[0]
+            if committed >= sim_report["sent"]:
+                break
+            time.sleep(0.2)
+
+        conn = sqlite3.connect(database)
+        rows = conn.execute("SELECT timestamp, logged_at FROM events WHERE logged_at IS NOT NULL").fetchall()
+        conn.close()
+    finally:
+        if livetrack:
+            stop_service(livetrack)
+        stop_service(waterlog)
+
+    latencies = [logged_at - generated for generated, logged_at in rows]
+    first_generated = min((generated for generated, _ in rows), default=0)
+    last_logged = max((logged_at for _, logged_at in rows), default=0)
+    span = last_logged - first_generated
+
+    return {
+        "transport": args.transport,
+        "target_rate": args.rate,
+        "events_sent": sim_report["sent"],
+        "achieved_send_rate": sim_report["achieved_rate"],
+        "events_committed": len(rows),
+        "events_lost": sim_report["sent"] - len(rows),
+        "sustained_events_per_sec": len(rows) / span if span > 0 else 0.0,
+        "generation_to_commit_latency": percentiles(latencies),
+    }
+
+
+def build_database(path, size, seed):
+    """Creates a WaterLog database with `size` synthetic events spread over the last 30 days."""
+    water_log.DATABASE = path
+    water_log.init_db()
+
+    rng = random.Random(seed)
+    now = time.time()
+    start = now - 30 * 86400
+    step = (now - start) / size
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    chunk = 100000
+    for offset in range(0, size, chunk):
+        rows = []
+        for i in range(offset, min(size, offset + chunk)):
+            timestamp = start + i * step
+            if rng.random() < 0.5:
+                rows.append(("flush", rng.randint(1, 5), None, None, timestamp, timestamp))
+            else:
+                rows.append(("water_refill", None, rng.randint(10, 50), None, timestamp, timestamp))
+        conn.executemany('''
+            INSERT INTO events (event_type, waste_volume, water_added, planet_name, timestamp, logged_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+    water_log.rollups.rebuild(conn)  # Rows were inserted directly, not through the writer
+    conn.close()
+
+
+def time_requests(params_list, repeats):
+    samples = []
+    for _ in range(repeats):
+        for params in params_list:
+            started = time.perf_counter()
+            response = requests.get(f"{WATERLOG_URL}/history", params=params, timeout=60)
+            response.raise_for_status()
+            samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def run_history(args, size):
+    """Measures /history latency for typical client queries against a table of `size` rows."""
+    with tempfile.TemporaryDirectory(prefix=f"wet_bench_{size}_") as workdir:
+        os.makedirs(os.path.join(workdir, "data"))
+        database = os.path.join(workdir, "data", "water_log.db")
+
+        started = time.perf_counter()
+        build_database(database, size, args.seed)
+        build_seconds = time.perf_counter() - started
+
+        waterlog = start_service("WaterLog", workdir, env=WATERLOG_ENV)
+        try:
+            wait_for_waterlog()
+            first = requests.get(f"{WATERLOG_URL}/history", params={"limit": 100}).json()
+            latest_id = first["latest_id"]
+            one_hour_ago = time.time() - 3600
+
+            queries = {
+                "latest_page": [{"limit": 100}],
+                "poll_since_id": [{"since_id": latest_id - 10, "station_id": "main"}],
+                "next_page": [{"limit": 100, "cursor": first["next_cursor"]}],
+                "type_last_hour": [{"event_type": "flush", "since": one_hour_ago, "limit": 500}],
+            }
+            results = {name: time_requests(params, args.repeats) for name, params in queries.items()}
+        finally:
+            stop_service(waterlog)
+
+    return {"rows": size, "build_seconds": build_seconds, "queries": results}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Simulator -> LiveTrack -> WaterLog pipeline")
+    parser.add_argument("--rate", type=float, default=2000, help="Simulator target events/sec")
+    parser.add_argument("--events", type=int, default=20000, help="events to push through the pipeline")
+    parser.add_argument("--seed", type=int, default=361, help="seed for the workload and synthetic tables")
+    parser.add_argument("--transport", choices=("zmq", "http"), default="zmq", help="LiveTrack -> WaterLog transport")
+    parser.add_argument("--sizes", default="10000,1000000", help="comma-separated table sizes for /history (e.g. 10000,1000000,10000000)")
+    parser.add_argument("--repeats", type=int, default=50, help="requests per /history query type")
+    parser.add_argument("--timeout", type=float, default=600, help="max seconds for the Simulator run")
+    parser.add_argument("--drain-timeout", type=float, default=60, help="max seconds to wait for the last commits")
+    parser.add_argument("--skip-pipeline", action="store_true", help="only run the /history benchmarks")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    results = {
+        "revision": git_revision(),
+        "started_at": time.time(),
+        "params": vars(args),
+    }
+
+    if not args.skip_pipeline:
+        with tempfile.TemporaryDirectory(prefix="wet_bench_pipeline_") as workdir:
+            os.makedirs(os.path.join(workdir, "data"))
+            results["pipeline"] = run_pipeline(args, workdir)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    results["history"] = [run_history(args, size) for size in sizes]
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
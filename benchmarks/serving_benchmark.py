@@ -0,0 +1,149 @@
+"""
+WaterLog Serving Benchmark
+
+Boots WaterLog in a scratch directory once per serving configuration and
+measures HTTP throughput with concurrent keep-alive clients:
+- /history: the latest page and filtered pages of a pre-built table
+- /log:     single events, each with its own event_id (all go to the one writer)
+
+Configurations are "<workers>x<threads>" (gunicorn processes x threads per
+process); "0x<threads>" is the single-process threaded server. Results are
+emitted as JSON so runs can be compared between versions and machines. Read
+throughput can only scale up to the number of CPU cores; /log is bounded by
+the single writer's group commits, so it scales with concurrency rather than
+workers.
+
+Usage:
+    python3 benchmarks/serving_benchmark.py --configs 0x8,1x8,2x4,4x2 --clients 16 --duration 10
+    python3 benchmarks/serving_benchmark.py --rows 1000000 --output serving.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline_benchmark import (WATERLOG_URL, build_database, git_revision, percentiles, start_service, stop_service,
+                                wait_for_waterlog)
+import event_codec  # Importing water_log (above) put microservices/Common on the path
+
+
+def history_params(rng):
+    """A mix of typical /history queries: newest page, a filtered page, one hour back."""
+    choice = rng.random()
+    if choice < 0.5:
+        return {"limit": 100}
+    if choice < 0.8:
+        return {"limit": 100, "event_type": rng.choice(("flush", "water_refill"))}
+    return {"limit": 100, "until": time.time() - 3600}
+
+
+def log_event(rng):
+    return {"event_type": "flush", "waste_volume": rng.randint(1, 5), "timestamp": time.time(),
+            "event_id": event_codec.new_event_id()}
+
+
+def client(endpoint, duration, seed, results):
+    """Sends requests back to back over one keep-alive connection until the time is up."""
+    rng = random.Random(seed)
+    session = requests.Session()
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if endpoint == "history":
+                response = session.get(f"{WATERLOG_URL}/history", params=history_params(rng), timeout=30)
+            else:
+                response = session.post(f"{WATERLOG_URL}/log", json=log_event(rng), timeout=30)
+            if response.status_code >= 300:
+                errors += 1
+                continue
+        except requests.exceptions.RequestException:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    results.put((latencies, errors))
+
+
+def run_load(endpoint, clients, duration):
+    """Runs `clients` client processes against one endpoint and returns throughput and latency."""
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client, args=(endpoint, duration, seed, results))
+                 for seed in range(clients)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    latencies, errors = [], 0
+    for _ in processes:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    return {"requests_per_sec": len(latencies) / elapsed, "errors": errors, "latency": percentiles(latencies)}
+
+
+def run_config(args, config, database):
+    """Measures /history and /log for one "<workers>x<threads>" serving configuration."""
+    workers, _, threads = config.partition("x")
+    with tempfile.TemporaryDirectory(prefix=f"wet_serve_{config}_") as workdir:
+        os.makedirs(os.path.join(workdir, "data"))
+        with open(database, "rb") as source, open(os.path.join(workdir, "data", "water_log.db"), "wb") as target:
+            target.write(source.read())
+
+        env = {"WATERLOG_WORKERS": workers, "WATERLOG_THREADS": threads or "1", "WATERLOG_RETENTION_DAYS": "0"}
+        waterlog = start_service("WaterLog", workdir, env)
+        try:
+            wait_for_waterlog()
+            result = {"config": config, "workers": int(workers), "threads": int(threads or 1)}
+            for endpoint in ("history", "log"):
+                result[endpoint] = run_load(endpoint, args.clients, args.duration)
+                print(f"⏱ {config:>6} {endpoint:>7}: {result[endpoint]['requests_per_sec']:8.0f} req/s", file=sys.stderr)
+        finally:
+            stop_service(waterlog)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WaterLog's HTTP throughput per serving configuration")
+    parser.add_argument("--configs", default="0x8,1x8,2x4,4x2", help="comma-separated <workers>x<threads> configurations")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client processes")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per endpoint")
+    parser.add_argument("--rows", type=int, default=100000, help="events in the table /history reads from")
+    parser.add_argument("--seed", type=int, default=361, help="seed for the synthetic table")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    results = {
+        "revision": git_revision(),
+        "started_at": time.time(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+    }
+
+    with tempfile.TemporaryDirectory(prefix="wet_serve_db_") as build_dir:
+        database = os.path.join(build_dir, "water_log.db")
+        build_database(database, args.rows, args.seed)
+        results["configs"] = [run_config(args, config, database) for config in args.configs.split(",") if config]
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
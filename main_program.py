@@ -5,56 +5,220 @@ Launches and manages the microservices:
 - LiveTrack (ZeroMQ)
 - WaterLog (SQLite & Flask API)
 - ViewPort (Tkinter GUI)
+
+- Services start in parallel as soon as the services they depend on are ready
+- Readiness is probed (HTTP for WaterLog, a TCP connect for LiveTrack's ZeroMQ
+  socket) instead of waiting fixed delays, and each startup time is reported
+- Crashed services are restarted with exponential backoff
 """
 
 import subprocess
+import threading
 import time
 import logging
+import os
 import signal
+import socket
 import sys
+import urllib.error
+import urllib.request
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# Store process references
-processes = {}
-
-def start_process(name, command, delay=0):
-    """Starts a subprocess and stores it in the processes dictionary."""
-    logging.info(f"🔹 Starting {name}...")
-    try:
-        proc = subprocess.Popen(command)
-        processes[name] = proc
-        time.sleep(delay)  # Give time for startup if needed
-    except Exception as e:
-        logging.error(f"❌ Failed to start {name}: {e}")
-        shutdown()
-        sys.exit(1)
+READY_TIMEOUT = 60  # seconds a service gets to pass its readiness probe before it is restarted
+PROBE_INTERVAL = 0.05  # seconds between readiness probes
+RESTART_BACKOFF = 1.0  # first restart delay in seconds; doubles on every crash in a row
+RESTART_BACKOFF_MAX = 30.0
+STABLE_AFTER = 60  # seconds of uptime after which a crash counts as the first in a row again
+STOP_TIMEOUT = 10  # seconds to wait for a service to exit before killing it
+
+
+def http_probe(url):
+    """Returns a probe that passes once url answers 200."""
+    def probe():
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return response.status == 200
+        except (urllib.error.URLError, OSError):
+            return False
+    return probe
+
+
+def tcp_probe(host, port):
+    """Returns a probe that passes once something (e.g. a bound ZeroMQ socket) accepts connections on port."""
+    def probe():
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            return False
+    return probe
+
+
+# Service launch layout: (name, command, readiness probe or None, names of services to wait for).
+# Commands are relative to the repository root; benchmarks reuse this list.
+SERVICES = [
+    ("WaterLog (Flask API & SQLite)", ["python3", "./microservices/WaterLog/water_log.py"],
+     http_probe("http://127.0.0.1:5001/history?limit=1"), ()),
+    ("LiveTrack (ZeroMQ Listener)", ["python3", "./microservices/LiveTrack/live_track.py"],
+     tcp_probe("127.0.0.1", 5558), ()),  # Buffers to its spool until WaterLog is up, so it needn't wait
+    ("ViewPort (Tkinter GUI)", ["python3", "./microservices/ViewPort/view_port.py"],
+     None, ("WaterLog (Flask API & SQLite)",)),  # Loads its history from WaterLog on startup
+]
+
+
+class Service:
+    """
+    Runs one microservice from a supervising thread: waits for its dependencies,
+    starts it, probes it until ready and restarts it with backoff when it crashes.
+
+    Args:
+        name (str): Display name
+        command (list): Command line, relative to the repository root
+        probe (callable): Returns True once the service is ready (None: ready once started)
+        after (list): Services that must be ready before this one starts
+    """
+
+    def __init__(self, name, command, probe=None, after=()):
+        self.name = name
+        self.command = command
+        self.probe = probe
+        self.after = after
+        self.proc = None
+        self.ready = threading.Event()
+        self.failed = threading.Event()  # Set when the first start did not become ready
+        self.startup_seconds = None
+        self.restarts = 0
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._supervise, name=f"supervise-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops supervising and terminates the service (and any children it started)."""
+        self._stopping.set()
+        self._terminate()
+        self._thread.join(STOP_TIMEOUT)
+
+    def _supervise(self):
+        for dependency in self.after:
+            while not dependency.ready.wait(0.5):
+                if self._stopping.is_set():
+                    return
+
+        backoff = RESTART_BACKOFF
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            if self._launch(started):
+                self.proc.wait()
+            self.ready.clear()
+            if self._stopping.is_set():
+                return
+
+            code = self.proc.returncode if self.proc else None
+            if code == 0:
+                logging.info(f"⏹ {self.name} exited normally, not restarting.")
+                return
+            if time.monotonic() - started > STABLE_AFTER:
+                backoff = RESTART_BACKOFF
+            self._terminate()  # Clear out leftover children (e.g. WaterLog's gunicorn workers)
+            logging.error(f"💥 {self.name} stopped (exit code {code}), restarting in {backoff:.0f}s...")
+            if self._stopping.wait(backoff):
+                return
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+            self.restarts += 1
+
+    def _launch(self, started):
+        """Starts the process and waits for its probe; returns False if it died or never became ready."""
+        logging.info(f"🔹 Starting {self.name}...")
+        self.proc = None
+        try:
+            # Own process group, so the service's children stop with it
+            self.proc = subprocess.Popen(self.command, start_new_session=True)
+        except OSError as e:
+            logging.error(f"❌ Failed to start {self.name}: {e}")
+            self.failed.set()
+            return False
+
+        while self.probe and not self.probe():
+            if self.proc.poll() is not None or self._stopping.is_set():
+                self.failed.set()
+                return False
+            if time.monotonic() - started > READY_TIMEOUT:
+                logging.error(f"❌ {self.name} not ready after {READY_TIMEOUT}s")
+                self.failed.set()
+                self._terminate()
+                return False
+            time.sleep(PROBE_INTERVAL)
+
+        elapsed = time.monotonic() - started
+        if self.startup_seconds is None:
+            self.startup_seconds = elapsed
+        self.ready.set()
+        logging.info(f"✅ {self.name} ready in {elapsed:.2f}s")
+        return True
+
+    def _terminate(self):
+        proc = self.proc
+        if proc is None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            proc.wait(timeout=STOP_TIMEOUT)
+        except ProcessLookupError:
+            pass
+        except subprocess.TimeoutExpired:
+            logging.warning(f"⚠️ {self.name} did not stop in time, killing it.")
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+
+
+# Store running services by name
+services = {}
+
+def start_services():
+    """Starts every service in parallel (each after its dependencies) and reports startup times."""
+    started = time.monotonic()
+    for name, command, probe, after in SERVICES:
+        services[name] = Service(name, command, probe, [services[dependency] for dependency in after])
+    for service in services.values():
+        service.start()
+
+    # Wait until every service is ready, or it (or a service it waits for) failed on its first start
+    for service in services.values():
+        while not (service.ready.wait(0.1) or service.failed.is_set()
+                   or any(dependency.failed.is_set() for dependency in service.after)):
+            pass
+
+    for service in services.values():
+        status = f"{service.startup_seconds:.2f}s" if service.startup_seconds is not None else "not ready"
+        logging.info(f"⏱ {service.name}: {status}")
+    logging.info(f"⏱ Cold start: {time.monotonic() - started:.2f}s")
 
 def shutdown(signum=None, frame=None):
     """Gracefully shuts down all running microservices."""
     logging.info("🔴 Shutting down W.E.T. System...")
 
-    for name, proc in processes.items():
+    for name, service in reversed(list(services.items())):
         logging.info(f"🛑 Stopping {name}...")
-        proc.terminate()
-        proc.wait()  # Ensure the process is fully stopped
+        service.stop()
 
     logging.info("✅ All microservices have been stopped.")
     sys.exit(0)
 
-# Handle manual interrupts (Ctrl+C)
-signal.signal(signal.SIGINT, shutdown)
-
-# Start Microservices (EXCLUDING SIMULATOR)
-logging.info("🚀 Starting W.E.T. System Microservices...")
-
-start_process("WaterLog (Flask API & SQLite)", ["python3", "./microservices/WaterLog/water_log.py"], delay=2)
-start_process("LiveTrack (ZeroMQ Listener)", ["python3", "./microservices/LiveTrack/live_track.py"], delay=1)
-start_process("ViewPort (Tkinter GUI)", ["python3", "./microservices/ViewPort/view_port.py"])
+if __name__ == "__main__":
+    # Handle manual interrupts (Ctrl+C) and termination
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
 
-logging.info("✅ W.E.T. System is now running (Simulator NOT Started).")
+    # Start Microservices (EXCLUDING SIMULATOR)
+    logging.info("🚀 Starting W.E.T. System Microservices...")
+    start_services()
+    logging.info("✅ W.E.T. System is now running (Simulator NOT Started).")
 
-# Keep running until interrupted
-while True:
-    time.sleep(1)
+    # Keep running until interrupted; the supervising threads restart crashed services
+    while True:
+        time.sleep(1)
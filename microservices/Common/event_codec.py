@@ -0,0 +1,251 @@
+"""
+Event Codec (shared by Simulator, LiveTrack and WaterLog)
+
+- Encodes lists of astronaut events for the ZeroMQ hops
+- "struct": compact fixed binary layout for the event schema (the default)
+- "json": human-readable, for debugging with any ZeroMQ client
+- Every payload starts with a tag byte, so receivers decode whatever they are
+  sent; plain JSON payloads (no tag) from older senders are still accepted
+- new_event_id() gives producers the idempotency key WaterLog deduplicates on
+- Events name the station (station_id) and crew member (astronaut_id) they come
+  from; events without a station_id belong to DEFAULT_STATION_ID
+
+Struct layout (little-endian), version 4:
+    header:  "S" | version:u8 | count:u32
+    event:   type:u8 | flags:u8 | waste_volume:i32 | water_added:i32 | timestamp:f64
+             [type_len:u8 type:utf8]            if type == CUSTOM_TYPE
+             [name_len:u16 planet_name:utf8]    if flags & HAS_PLANET_NAME
+             [id:i64]                           if flags & HAS_ID
+             [event_id_len:u8 event_id:utf8]    if flags & HAS_EVENT_ID
+             [len:u8 station_id:utf8]           if flags & HAS_STATION_ID
+             [len:u8 astronaut_id:utf8]         if flags & HAS_ASTRONAUT_ID
+
+Versions 1 (no id), 2 (no event_id) and 3 (no station or astronaut) lay out
+their fields the same way; all are decoded.
+
+Events that don't fit the layout (extra fields, non-integer volumes, ...)
+are sent as JSON instead, so nothing is ever lost to the binary format.
+"""
+
+import json
+import os
+import struct
+import time
+
+CODECS = ("struct", "json")
+
+JSON_TAG = b"J"
+STRUCT_TAG = b"S"
+STRUCT_VERSION = 4
+SUPPORTED_STRUCT_VERSIONS = (1, 2, 3, 4)
+
+EVENT_TYPES = ("flush", "water_refill", "planet_visit")
+EVENT_TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+CUSTOM_TYPE = 255
+
+HAS_WASTE_VOLUME = 0x01
+HAS_WATER_ADDED = 0x02
+HAS_PLANET_NAME = 0x04
+HAS_ID = 0x08  # WaterLog's id, present once an event has been stored
+HAS_EVENT_ID = 0x10  # The producer's idempotency key
+HAS_STATION_ID = 0x20
+HAS_ASTRONAUT_ID = 0x40
+
+# Optional strings stored as u8 length + utf8, in this order after the fixed fields
+SHORT_STRINGS = (("event_id", HAS_EVENT_ID), ("station_id", HAS_STATION_ID), ("astronaut_id", HAS_ASTRONAUT_ID))
+
+STRUCT_FIELDS = {"id", "event_id", "station_id", "astronaut_id", "event_type", "waste_volume", "water_added",
+                 "planet_name", "timestamp"}
+
+DEFAULT_STATION_ID = "main"  # Station of events that don't name one (single-station setups)
+
+HEADER = struct.Struct("<cBI")
+EVENT = struct.Struct("<BBiid")
+U8 = struct.Struct("<B")
+U16 = struct.Struct("<H")
+I64 = struct.Struct("<q")
+
+INT32_MIN, INT32_MAX = -2**31, 2**31 - 1
+
+
+def new_event_id():
+    """
+    Returns a unique event_id: 16 hex digits of nanosecond time, then 16 random ones.
+
+    Ids from one clock sort roughly by creation time, so WaterLog's unique index
+    grows at its right edge instead of taking random-page writes like a uuid4 would.
+    """
+    return f"{time.time_ns():016x}{os.urandom(8).hex()}"
+
+
+class CodecError(ValueError):
+    """A payload could not be decoded."""
+
+
+def encode_events(events, codec="struct"):
+    """
+    Encodes a list of event dicts into one payload.
+
+    Args:
+        events (list): Event dicts (e.g., flush, refill, planet visit)
+        codec (str): "struct" or "json"
+
+    Returns:
+        bytes: The tagged payload
+    """
+    if codec not in CODECS:
+        raise ValueError(f"codec must be one of {CODECS}, got {codec!r}")
+
+    if codec == "struct" and all(fits_struct(event) for event in events):
+        return encode_struct(events)
+    return JSON_TAG + json.dumps(events, separators=(",", ":")).encode()
+
+
+def decode_events(payload):
+    """
+    Decodes a payload produced by encode_events (or a plain JSON event/list).
+
+    Returns:
+        list: Event dicts
+
+    Raises:
+        CodecError: The payload is malformed, uses an unknown codec version or isn't events
+    """
+    if not payload:
+        raise CodecError("Empty payload")
+
+    tag = payload[:1]
+    try:
+        if tag == STRUCT_TAG:
+            return decode_struct(payload)
+        if tag == JSON_TAG:
+            events = json.loads(payload[1:])
+        elif tag in (b"{", b"["):
+            events = json.loads(payload)
+        else:
+            raise CodecError(f"Unknown codec tag {tag!r}")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise CodecError(str(e)) from e
+
+    if isinstance(events, dict):
+        return [events]
+    # Valid JSON isn't necessarily events (e.g. [1, 2] or "[null]"); callers rely on getting dicts
+    if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+        raise CodecError("Expected an event object or a list of event objects")
+    return events
+
+
+def fits_struct(event):
+    """Returns True if the event can be encoded with the struct layout without loss."""
+    if not isinstance(event, dict) or not STRUCT_FIELDS.issuperset(event):
+        return False
+    event_type = event.get("event_type")
+    if not isinstance(event_type, str):
+        return False
+    if event_type not in EVENT_TYPE_CODES and len(event_type.encode()) > 0xFF:
+        return False
+    if not isinstance(event.get("timestamp"), (int, float)) or isinstance(event.get("timestamp"), bool):
+        return False
+    for field in ("waste_volume", "water_added"):
+        value = event.get(field)
+        if value is not None and (type(value) is not int or not INT32_MIN <= value <= INT32_MAX):
+            return False
+    stored_id = event.get("id")
+    if stored_id is not None and (type(stored_id) is not int or stored_id < 0):
+        return False
+    for field, _ in SHORT_STRINGS:
+        value = event.get(field)
+        if value is not None and (not isinstance(value, str) or len(value.encode()) > 0xFF):
+            return False
+    planet_name = event.get("planet_name")
+    return planet_name is None or (isinstance(planet_name, str) and len(planet_name.encode()) <= 0xFFFF)
+
+
+def encode_struct(events):
+    parts = [HEADER.pack(STRUCT_TAG, STRUCT_VERSION, len(events))]
+
+    for event in events:
+        event_type = event["event_type"]
+        type_code = EVENT_TYPE_CODES.get(event_type, CUSTOM_TYPE)
+        waste_volume = event.get("waste_volume")
+        water_added = event.get("water_added")
+        planet_name = event.get("planet_name")
+        stored_id = event.get("id")
+
+        flags = 0
+        if waste_volume is not None:
+            flags |= HAS_WASTE_VOLUME
+        if water_added is not None:
+            flags |= HAS_WATER_ADDED
+        if planet_name is not None:
+            flags |= HAS_PLANET_NAME
+        if stored_id is not None:
+            flags |= HAS_ID
+        for field, flag in SHORT_STRINGS:
+            if event.get(field) is not None:
+                flags |= flag
+
+        parts.append(EVENT.pack(type_code, flags, waste_volume or 0, water_added or 0, event["timestamp"]))
+
+        if type_code == CUSTOM_TYPE:
+            raw = event_type.encode()
+            parts.append(U8.pack(len(raw)) + raw)
+        if planet_name is not None:
+            raw = planet_name.encode()
+            parts.append(U16.pack(len(raw)) + raw)
+        if stored_id is not None:
+            parts.append(I64.pack(stored_id))
+        for field, flag in SHORT_STRINGS:
+            if flags & flag:
+                raw = event[field].encode()
+                parts.append(U8.pack(len(raw)) + raw)
+
+    return b"".join(parts)
+
+
+def decode_struct(payload):
+    try:
+        _, version, count = HEADER.unpack_from(payload, 0)
+        if version not in SUPPORTED_STRUCT_VERSIONS:
+            raise CodecError(f"Unsupported struct codec version {version}")
+
+        offset = HEADER.size
+        events = []
+        for _ in range(count):
+            type_code, flags, waste_volume, water_added, timestamp = EVENT.unpack_from(payload, offset)
+            offset += EVENT.size
+
+            if type_code == CUSTOM_TYPE:
+                (length,) = U8.unpack_from(payload, offset)
+                event_type = payload[offset + 1:offset + 1 + length].decode()
+                offset += 1 + length
+            else:
+                event_type = EVENT_TYPES[type_code]
+
+            event = {"event_type": event_type}
+            if flags & HAS_WASTE_VOLUME:
+                event["waste_volume"] = waste_volume
+            if flags & HAS_WATER_ADDED:
+                event["water_added"] = water_added
+            if flags & HAS_PLANET_NAME:
+                (length,) = U16.unpack_from(payload, offset)
+                event["planet_name"] = payload[offset + 2:offset + 2 + length].decode()
+                offset += 2 + length
+            event["timestamp"] = timestamp
+            if flags & HAS_ID:
+                (event["id"],) = I64.unpack_from(payload, offset)
+                offset += I64.size
+            for field, flag in SHORT_STRINGS:
+                if flags & flag:
+                    (length,) = U8.unpack_from(payload, offset)
+                    event[field] = payload[offset + 1:offset + 1 + length].decode()
+                    offset += 1 + length
+
+            events.append(event)
+
+        if offset != len(payload):
+            raise CodecError("Struct payload length does not match its contents")
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise CodecError(f"Malformed struct payload: {e}") from e
+
+    return events
@@ -0,0 +1,67 @@
+"""
+Console Logging for the W.E.T. System services
+
+- Services log through the standard logging module at WET_LOG_LEVEL (DEBUG,
+  INFO, WARNING or ERROR; default INFO), keeping their emoji lines as-is
+- Per-event lines (an event received, sent or stored) go through SampledLog,
+  which prints at most WET_LOG_EVENTS_PER_SEC of them per second and folds the
+  rest into a "(+N more)" count on the next line, so console output can't
+  become the bottleneck at high rates
+
+Usage:
+    WET_LOG_LEVEL=WARNING python3 main_program.py       # errors and warnings only
+    WET_LOG_EVENTS_PER_SEC=100 python3 microservices/LiveTrack/live_track.py
+"""
+
+import logging
+import os
+import sys
+import time
+
+LOG_LEVEL = os.environ.get("WET_LOG_LEVEL", "INFO").upper()
+EVENT_LOG_RATE = float(os.environ.get("WET_LOG_EVENTS_PER_SEC", 1))  # 0 turns per-event lines off
+
+
+def get_logger(name):
+    """Returns a logger that prints bare messages to stdout at WET_LOG_LEVEL."""
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=LOG_LEVEL, format="%(message)s", stream=sys.stdout)
+    return logging.getLogger(name)
+
+
+class SampledLog:
+    """
+    Logs at most `rate` lines per second; lines in between are only counted.
+
+    Messages use logging's lazy %-formatting, so a skipped line costs one clock
+    read and nothing is formatted for it. Counts are approximate if several
+    threads share one SampledLog.
+
+    Args:
+        logger (logging.Logger): Where sampled lines go
+        rate (float): Lines per second (0 logs none)
+        level (int): Level of the lines; below the logger's level nothing is logged
+    """
+
+    def __init__(self, logger, rate=EVENT_LOG_RATE, level=logging.INFO):
+        self.logger = logger
+        self.level = level
+        self.interval = 1 / rate if rate > 0 else None
+        self.enabled = rate > 0 and logger.isEnabledFor(level)
+        self.skipped = 0
+        self._next_at = 0.0
+
+    def __call__(self, message, *args):
+        """Logs message % args unless this second's lines are used up."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now < self._next_at:
+            self.skipped += 1
+            return
+        self._next_at = now + self.interval
+        if self.skipped:
+            message = f"{message} (+{self.skipped} more)"
+            self.skipped = 0
+        self.logger.log(self.level, message, *args)
@@ -0,0 +1,293 @@
+"""
+Service Metrics for the W.E.T. System
+
+- Counters, gauges and histograms (latencies, batch sizes) kept in memory by
+  each service process
+- Served on a local /metrics endpoint in the Prometheus text format; add
+  ?format=json for the same numbers as JSON, with p50/p95/p99 estimated from
+  the histogram buckets
+- WaterLog serves /metrics from its API; the other services start serve()
+  on their own port (0 disables it)
+- Updates take one lock (plus a bisect for histograms), cheap enough for the
+  per-event hot paths
+
+Ports (all bound to 127.0.0.1):
+    WaterLog   5001/metrics   (the API port)
+    Simulator  5571           SIMULATOR_METRICS_PORT (with --processes, the parent serves the workers' total)
+    LiveTrack  5572           LIVETRACK_METRICS_PORT
+    ViewPort   5573           VIEWPORT_METRICS_PORT
+
+Usage:
+    curl -s localhost:5572/metrics
+    curl -s 'localhost:5001/metrics?format=json'
+"""
+
+import bisect
+import contextlib
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+
+# Seconds; fine at the low end for SQLite commits, wide enough for retries at the top
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Counter:
+    """A count that only goes up; with fn, the count is read from fn() when scraped."""
+
+    kind = "counter"
+
+    def __init__(self, fn=None):
+        self.fn = fn
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self.fn() if self.fn else self._value
+
+
+class Gauge(Counter):
+    """A value that goes up and down (queue depths); set() it, or read it from fn() when scraped."""
+
+    kind = "gauge"
+
+    def set(self, value):
+        self._value = value
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets (upper bounds), plus their sum and count.
+
+    Args:
+        buckets (tuple): Increasing upper bounds; larger values land in an implicit +Inf bucket
+    """
+
+    kind = "histogram"
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def observe_all(self, values):
+        """Records many observations under a single lock acquisition (e.g. one per event of a batch)."""
+        indexes = [(bisect.bisect_left(self.bounds, value), value) for value in values]
+        with self._lock:
+            for index, value in indexes:
+                self.counts[index] += 1
+                self.sum += value
+            self.count += len(indexes)
+
+    @contextlib.contextmanager
+    def time(self):
+        """Observes the seconds spent in the with block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q):
+        """Estimates the q-quantile by interpolating within its bucket (None without observations)."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if index == len(self.bounds):
+                    return self.bounds[-1]  # Beyond the last bound; report the bound
+                lower = self.bounds[index - 1] if index else 0.0
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    @property
+    def value(self):
+        with self._lock:
+            counts, total, sum_ = list(self.counts), self.count, self.sum
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            buckets[format_number(bound)] = cumulative
+        summary = {"count": total, "sum": sum_, "mean": sum_ / total if total else None}
+        for q in QUANTILES:
+            summary[f"p{round(q * 100)}"] = self.quantile(q)
+        summary["buckets"] = buckets
+        return summary
+
+
+def format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels, extra=()):
+    """Formats (name, value) label pairs as {name="value",...} ("" without labels)."""
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Registry:
+    """
+    Holds a process's metrics by name and label set.
+
+    Asking for an existing name and labels returns the same metric, so modules
+    can look their metrics up wherever they need them.
+    """
+
+    def __init__(self):
+        self._families = {}  # name -> {"kind", "help", "series": {labels tuple: metric}}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, make):
+        key = tuple(sorted(labels.items()))
+        family = self._families.get(name)
+        metric = family["series"].get(key) if family else None
+        if metric is None:
+            with self._lock:
+                family = self._families.setdefault(name, {"kind": cls.kind, "help": help, "series": {}})
+                if family["kind"] != cls.kind:
+                    raise ValueError(f"Metric {name} is a {family['kind']}, not a {cls.kind}")
+                metric = family["series"].get(key)
+                if metric is None:
+                    metric = family["series"][key] = make()
+        return metric
+
+    def counter(self, name, help, fn=None, **labels):
+        """Returns the counter name{labels}; fn (if given) supplies its value when scraped."""
+        metric = self._get(Counter, name, help, labels, lambda: Counter(fn))
+        if fn is not None:
+            metric.fn = fn  # Point a re-created owner's callback at the new owner
+        return metric
+
+    def gauge(self, name, help, fn=None, **labels):
+        """Returns the gauge name{labels}; fn (if given) supplies its value when scraped."""
+        metric = self._get(Gauge, name, help, labels, lambda: Gauge(fn))
+        if fn is not None:
+            metric.fn = fn
+        return metric
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, **labels):
+        """Returns the histogram name{labels} (buckets only apply when it is first created)."""
+        return self._get(Histogram, name, help, labels, lambda: Histogram(buckets))
+
+    def _series(self):
+        with self._lock:
+            return [(name, family["kind"], family["help"], list(family["series"].items()))
+                    for name, family in sorted(self._families.items())]
+
+    def snapshot(self):
+        """
+        Returns every metric's current value as a JSON-ready dict.
+
+        Returns:
+            dict: name -> {label string ("" without labels): value}; histograms give
+                count, sum, mean, p50/p95/p99 and cumulative bucket counts
+        """
+        result = {}
+        for name, _, _, series in self._series():
+            values = {}
+            for labels, metric in series:
+                try:
+                    values[format_labels(labels)] = metric.value
+                except Exception as e:  # A callback whose owner is gone must not break the scrape
+                    values[format_labels(labels)] = f"error: {e}"
+            result[name] = values
+        return result
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, kind, help, series in self._series():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series:
+                if kind == "histogram":
+                    summary = metric.value
+                    for bound, cumulative in summary["buckets"].items():
+                        lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {summary['sum']!r}")
+                    lines.append(f"{name}_count{format_labels(labels)} {summary['count']}")
+                    continue
+                try:
+                    value = metric.value
+                except Exception:
+                    continue
+                lines.append(f"{name}{format_labels(labels)} {format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# The process-wide registry every service module records into
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != "/metrics":
+            self.send_error(404)
+            return
+        if urllib.parse.parse_qs(url.query).get("format") == ["json"]:
+            body, content_type = json.dumps(self.registry.snapshot()).encode(), "application/json"
+        else:
+            body, content_type = self.registry.render().encode(), "text/plain; version=0.0.4"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise print a line each
+
+
+def serve(port, registry=REGISTRY, host="127.0.0.1"):
+    """
+    Serves registry on http://host:port/metrics from a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer | None: The server, or None if port is 0 or already taken
+            (metrics are optional; the service keeps running without them)
+    """
+    if not port:
+        return None
+    handler = type("Handler", (MetricsHandler,), {"registry": registry})
+    try:
+        server = http.server.ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        print(f"⚠️ Metrics disabled, can't listen on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
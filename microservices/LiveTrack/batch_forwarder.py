@@ -0,0 +1,429 @@
+"""
+Batch Forwarder for LiveTrack
+
+- Buffers received events in a bounded in-memory queue
+- Flushes them to WaterLog's /log_batch when the batch is full or old enough
+- Delivers over WaterLog's ZeroMQ ingest socket when configured, otherwise
+  over HTTP with keep-alive connections from a pooled requests.Session
+- Applies an explicit overflow policy when WaterLog falls behind:
+  - block: the receiver waits for room (ZeroMQ then buffers up to its HWM)
+  - drop_oldest: the oldest queued event is discarded
+  - spill: overflow is appended to a local NDJSON file and sent once the queue drains
+- With a disk spool (see disk_spool.py) every event is persisted on receipt and
+  batches are read back from the spool, so nothing is lost to an outage or a restart
+- Records batch sizes, batching delay, delivery time and end-to-end event
+  latency in the process's metrics (see metrics.py)
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+import uuid
+
+import requests
+import zmq
+from requests.adapters import HTTPAdapter
+
+import event_codec
+import logs
+import metrics
+
+log = logs.get_logger("livetrack.forwarder")
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "spill")
+
+
+class IngestTimeout(Exception):
+    """WaterLog did not acknowledge a ZeroMQ batch in time."""
+
+
+class ZmqIngestClient:
+    """
+    Sends batches to WaterLog's ZeroMQ ingest socket and waits for the ack.
+
+    Only use it from one thread (the forwarder thread); the socket is created on first use.
+
+    Args:
+        endpoint (str): WaterLog's ingest address (e.g. "tcp://localhost:5557")
+        timeout (float): Seconds to wait for an acknowledgement
+        codec (str): event_codec codec used for the batches ("struct" or "json")
+    """
+
+    def __init__(self, endpoint, timeout=10, codec="struct"):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.codec = codec
+        self._socket = None
+
+    def send(self, events):
+        """
+        Sends events and returns WaterLog's (status, reply) acknowledgement.
+
+        Raises:
+            IngestTimeout: No acknowledgement arrived in time
+        """
+        if self._socket is None:
+            self._socket = zmq.Context.instance().socket(zmq.DEALER)
+            self._socket.setsockopt(zmq.LINGER, 0)
+            self._socket.connect(self.endpoint)
+
+        request_id = uuid.uuid4().bytes
+        self._socket.send_multipart([request_id, event_codec.encode_events(events, self.codec)])
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._socket.poll(remaining * 1000):
+                # Drop the socket so the unacknowledged batch isn't delivered again on reconnect
+                self.close()
+                raise IngestTimeout(f"No ack from {self.endpoint} within {self.timeout}s")
+            reply_id, reply = self._socket.recv_multipart()
+            if reply_id == request_id:  # Late acks for abandoned attempts are skipped
+                reply = json.loads(reply)
+                return reply["status"], reply
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class BatchForwarder:
+    """
+    Ships events to WaterLog in batches from a background thread.
+
+    Args:
+        waterlog_url (str): Base URL of WaterLog (e.g. "http://localhost:5001")
+        batch_size (int): Flush as soon as this many events are waiting
+        max_age (float): Flush once the oldest waiting event is this many seconds old
+        queue_size (int): Max events held in memory
+        overflow (str): One of OVERFLOW_POLICIES
+        spill_path (str): NDJSON file used by the "spill" policy
+        timeout (float): Seconds before a delivery to WaterLog is abandoned
+        zmq_endpoint (str): WaterLog's ZeroMQ ingest address; None delivers over HTTP
+        codec (str): event_codec codec for ZeroMQ delivery ("struct" or "json")
+        on_delivered (callable): Called from the forwarding thread with each accepted
+            batch, its events stamped with the ids WaterLog assigned (a retried event
+            keeps the id it was first stored with, so consumers should key on it)
+        spool (DiskSpool): Durable log that replaces the in-memory queue (queue_size and
+            overflow then don't apply); batches are acknowledged in it once WaterLog accepts them
+    """
+
+    def __init__(self, waterlog_url, batch_size=200, max_age=0.05, queue_size=10000,
+                 overflow="block", spill_path="data/livetrack_spill.ndjson", timeout=10, zmq_endpoint=None, codec="struct",
+                 on_delivered=None, spool=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+
+        self.batch_url = f"{waterlog_url}/log_batch"
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.zmq_client = ZmqIngestClient(zmq_endpoint, timeout, codec) if zmq_endpoint else None
+        self.on_delivered = on_delivered
+        self.spool = spool
+
+        self._queue = collections.deque()
+        self._oldest_at = None  # monotonic time the oldest queued event arrived
+        if spool and spool.unread():
+            self._oldest_at = time.monotonic()  # Left over from the last run, send right away
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._running = False
+        self._thread = threading.Thread(target=self._run, name="livetrack-forwarder", daemon=True)
+
+        self.events_sent = 0
+        self.batches_sent = 0
+        self.events_dropped = 0
+        self.events_rejected = 0
+        self.events_spilled = 0
+
+        transport = "zmq" if self.zmq_client else "http"
+        self._batch_events = metrics.histogram("livetrack_batch_events", "Events per batch sent to WaterLog",
+                                               metrics.SIZE_BUCKETS)
+        self._batch_wait = metrics.histogram("livetrack_batch_wait_seconds",
+                                             "Time a batch's oldest event waited for the batch to be taken")
+        self._forward_time = metrics.histogram("livetrack_forward_seconds", "Round trip of one delivery to WaterLog",
+                                               transport=transport)
+        self._event_latency = metrics.histogram("livetrack_event_latency_seconds",
+                                                "Time from an event's timestamp to WaterLog storing it")
+        self._delivery_errors = metrics.counter("livetrack_delivery_errors_total",
+                                                "Failed deliveries to WaterLog (retried)", transport=transport)
+        metrics.counter("livetrack_events_sent_total", "Events stored by WaterLog", lambda: self.events_sent)
+        metrics.counter("livetrack_batches_sent_total", "Batches stored by WaterLog", lambda: self.batches_sent)
+        metrics.counter("livetrack_events_dropped_total", "Events dropped by the overflow policy or a spool failure",
+                        lambda: self.events_dropped)
+        metrics.counter("livetrack_events_rejected_total", "Events WaterLog refused as malformed",
+                        lambda: self.events_rejected)
+        metrics.counter("livetrack_events_spilled_total", "Events spilled to the overflow file",
+                        lambda: self.events_spilled)
+        metrics.gauge("livetrack_queue_depth", "Events waiting to be batched", self._waiting)
+        metrics.gauge("livetrack_spool_pending", "Events in the disk spool not yet acknowledged",
+                      lambda: self.spool.pending() if self.spool else 0)
+        self._log_batch = logs.SampledLog(log)
+
+    def start(self):
+        """Starts the forwarding thread and returns the forwarder."""
+        self._running = True
+        self._thread.start()
+        return self
+
+    def close(self, timeout=None):
+        """Sends whatever is still queued, then stops the forwarding thread."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def submit(self, event):
+        """
+        Queues one event for forwarding, applying the overflow policy if the queue is full.
+
+        Args:
+            event (dict): The event data (e.g., flush, refill, planet visit)
+        """
+        if self.spool:
+            self._submit_to_spool(event)
+            return
+
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                if self.overflow == "block":
+                    while len(self._queue) >= self.queue_size and self._running:
+                        self._cond.wait()
+                elif self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self.events_dropped += 1
+                else:
+                    self._spill([event])
+                    return
+
+            if not self._queue:
+                self._oldest_at = time.monotonic()
+            self._queue.append(event)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _submit_to_spool(self, event):
+        with self._cond:
+            try:
+                self.spool.append(event)
+            except OSError as e:
+                self.events_dropped += 1
+                log.error(f"❌ Event dropped, spool write failed: {e}")
+                return
+
+            waiting = self.spool.unread()
+            if waiting == 1:
+                self._oldest_at = time.monotonic()
+            if waiting >= self.batch_size:
+                self._cond.notify_all()
+
+    def _waiting(self):
+        return self.spool.unread() if self.spool else len(self._queue)
+
+    def stats(self):
+        """Returns forwarding counters."""
+        with self._cond:
+            return {
+                "queue_depth": self._waiting(),
+                "spool_pending": self.spool.pending() if self.spool else 0,
+                "events_sent": self.events_sent,
+                "batches_sent": self.batches_sent,
+                "mean_batch_size": self.events_sent / self.batches_sent if self.batches_sent else 0.0,
+                "events_dropped": self.events_dropped,
+                "events_rejected": self.events_rejected,
+                "events_spilled": self.events_spilled,
+            }
+
+    def _next_batch(self):
+        """
+        Waits until a batch is due (full, old enough, or shutting down) and takes it.
+
+        Returns:
+            tuple: (batch, last spool seq in it, or None without a spool)
+        """
+        with self._cond:
+            while True:
+                if not self._running and self.spool:
+                    return [], None  # Unsent events stay in the spool for the next run
+                if self._waiting() >= self.batch_size or not self._running:
+                    break
+                if self._waiting():
+                    remaining = self._oldest_at + self.max_age - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                elif self._has_spill():
+                    return [], None  # Queue is idle, let the caller drain the spill file
+                else:
+                    self._cond.wait()
+
+            if self._oldest_at is not None and self._waiting():
+                self._batch_wait.observe(time.monotonic() - self._oldest_at)
+
+            if self.spool:
+                seq, batch = self.spool.read_batch(self.batch_size)
+                self._oldest_at = time.monotonic() if self.spool.unread() else None
+                return batch, seq
+
+            count = min(len(self._queue), self.batch_size)
+            batch = [self._queue.popleft() for _ in range(count)]
+            self._oldest_at = time.monotonic() if self._queue else None
+            self._cond.notify_all()  # Wake a receiver blocked on a full queue
+            return batch, None
+
+    def _run(self):
+        while True:
+            batch, seq = self._next_batch()
+            if batch:
+                if self._send(batch) and seq is not None:
+                    self.spool.ack(seq)
+            elif self._running and self._has_spill():
+                self._drain_spill()
+            elif not self._running:
+                if self.zmq_client:
+                    self.zmq_client.close()
+                return
+
+    def _deliver(self, events):
+        """Sends events over the configured transport and returns (status, reply dict)."""
+        with self._forward_time.time():
+            if self.zmq_client:
+                return self.zmq_client.send(events)
+            response = self.session.post(self.batch_url, json=events, timeout=self.timeout)
+        try:
+            reply = response.json()
+        except ValueError:
+            reply = {"error": response.text}
+        return response.status_code, reply
+
+    def _delivered(self, events, reply):
+        """Records an accepted delivery and hands the stored events to on_delivered."""
+        with self._cond:
+            self.events_sent += len(events)
+            self.batches_sent += 1
+        self._batch_events.observe(len(events))
+        now = time.time()
+        self._event_latency.observe_all(now - event["timestamp"] for event in events
+                                        if isinstance(event.get("timestamp"), (int, float)))
+
+        # With duplicates (a retry of events already stored) WaterLog lists every event's id
+        ids = reply.get("ids")
+        if ids is None and reply.get("first_id") is not None:
+            ids = range(reply["first_id"], reply["first_id"] + len(events))
+        if self.on_delivered and ids is not None:
+            self.on_delivered([{**event, "id": event_id} for event, event_id in zip(events, ids)])
+
+    def _send(self, batch):
+        """
+        Posts a batch to WaterLog, retrying with backoff until it is accepted.
+
+        Returns:
+            bool: False if the forwarder shut down before the batch was delivered
+        """
+        delay = 0.1
+        while True:
+            try:
+                status, reply = self._deliver(batch)
+                if status == 201:
+                    self._delivered(batch, reply)
+                    self._log_batch("✅ Batch Logged: %d events", len(batch))
+                    return True
+                if status == 400:
+                    # One malformed event rejects the whole batch; isolate it
+                    return self._send_individually(batch)
+                self._delivery_errors.inc()
+                log.warning(f"⚠️ Error logging batch: {status} | Response: {reply.get('error')}")
+            except (requests.exceptions.RequestException, IngestTimeout) as e:
+                self._delivery_errors.inc()
+                log.error(f"❌ Connection Error: {e}")
+
+            if not self._running and self.spool:
+                return False  # Shutting down: the batch is still in the spool
+            if not self._running and self.overflow == "spill":
+                # Shutting down with WaterLog unreachable: keep the batch for the next run
+                self._spill(batch)
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    def _send_individually(self, batch):
+        """
+        Sends a batch WaterLog refused (400) one event at a time, dropping only the events it rejects.
+
+        Events hitting a transient failure (5xx, a connection error) are retried until accepted,
+        so the batch is only reported delivered, and acknowledged in the spool, once each event
+        was either stored or rejected as invalid.
+
+        Returns:
+            bool: False if the forwarder shut down before every event was stored or rejected
+        """
+        for index, event in enumerate(batch):
+            try:
+                status, reply = self._deliver([event])
+            except (requests.exceptions.RequestException, IngestTimeout) as e:
+                self._delivery_errors.inc()
+                log.error(f"❌ Connection Error: {e}")
+                status, reply = None, None
+            if status == 201:
+                self._delivered([event], reply)
+            elif status is not None and 400 <= status < 500:
+                with self._cond:
+                    self.events_rejected += 1
+                log.warning(f"⚠️ Event rejected by WaterLog: {event} | Response: {reply.get('error')}")
+            else:
+                if status is not None:
+                    self._delivery_errors.inc()
+                    log.warning(f"⚠️ Error logging event: {status} | Response: {reply.get('error')}")
+                if not self._send([event]):
+                    # Shutting down: the rest stays unacknowledged in the spool, or is spilled like the event
+                    if not self.spool and self.overflow == "spill":
+                        self._spill(batch[index + 1:])
+                    return False
+        return True
+
+    def _has_spill(self):
+        return self.overflow == "spill" and (
+            os.path.exists(self.spill_path) or os.path.exists(self._draining_path()))
+
+    def _draining_path(self):
+        return f"{self.spill_path}.draining"
+
+    def _spill(self, events):
+        with self._spill_lock:
+            with open(self.spill_path, "a") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+        self.events_spilled += len(events)
+
+    def _drain_spill(self):
+        """Sends spilled events back to WaterLog, oldest file first."""
+        draining = self._draining_path()
+        with self._spill_lock:
+            # Leftovers from a previous run are drained before new overflow
+            if not os.path.exists(draining):
+                os.replace(self.spill_path, draining)
+
+        with open(draining) as f:
+            batch = []
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= self.batch_size:
+                    self._send(batch)
+                    batch = []
+            if batch:
+                self._send(batch)
+
+        os.remove(draining)
@@ -0,0 +1,260 @@
+"""
+Durable Disk Spool for LiveTrack
+
+- Every received event is appended to a local log before it is forwarded, so
+  a WaterLog outage (or a LiveTrack restart) loses nothing
+- Records carry increasing sequence numbers; the forwarder reads them in
+  batches and acknowledges the last sequence number WaterLog accepted
+- The log is split into segment files; fully acknowledged segments are deleted
+- Appends are buffered and fsynced on an interval by a background thread, so
+  the spool keeps up with full ingest rate (a crash can lose at most the last
+  interval's appends)
+- Delivery is at-least-once: events acknowledged just before a crash may be
+  sent again after the restart
+
+Layout (in the spool directory):
+    segment-<first seq>.log   records: length:u32 | crc32:u32 | seq:u64 | payload
+    ack                       last acknowledged sequence number (text)
+
+Payloads are single events encoded with event_codec.
+"""
+
+import glob
+import os
+import struct
+import threading
+import zlib
+
+import event_codec
+
+RECORD_HEADER = struct.Struct("<IIQ")
+SEGMENT_BYTES = 8 * 1024 * 1024  # start a new segment file after this many bytes
+READ_CHUNK = 1024 * 1024
+
+
+class DiskSpool:
+    """
+    Append-only, segment-based event log with an acknowledgement pointer.
+
+    One thread may append while another reads and acknowledges.
+
+    Args:
+        directory (str): Where the segments and the ack file live (created if missing)
+        codec (str): event_codec codec for the stored payloads
+        max_bytes (int): Appends are refused once the segments reach this size
+        sync_interval (float): Seconds between fsyncs of new appends
+    """
+
+    def __init__(self, directory, codec="struct", max_bytes=1024 * 1024 * 1024, sync_interval=0.1):
+        self.directory = directory
+        self.codec = codec
+        self.max_bytes = max_bytes
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._closed = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+
+        self.acked_seq = self._read_ack()
+        self._segments = sorted(glob.glob(os.path.join(directory, "segment-*.log")))
+
+        # Recover: find the last complete record, dropping a torn tail left by a crash
+        self.next_seq = self.acked_seq + 1
+        if self._segments:
+            last = self._segments[-1]
+            end, last_seq = self._scan(last)
+            if end < os.path.getsize(last):
+                with open(last, "r+b") as f:
+                    f.truncate(end)
+            # A newest segment left empty (a crash right after a roll) says nothing about
+            # the sequence numbers already used; take them from the segments before it
+            for path in reversed(self._segments[:-1]):
+                if last_seq is not None:
+                    break
+                last_seq = self._scan(path)[1]
+            # A segment is named after the first seq it holds, so the newest one's name is a floor too
+            self.next_seq = max(self.next_seq, self._first_seq(last), (last_seq or 0) + 1)
+
+        self._total_bytes = sum(os.path.getsize(path) for path in self._segments)
+        self._writer = None
+        self._writer_bytes = 0
+        self._open_writer()
+
+        # Read position: the first unacknowledged record
+        self.read_seq = self.acked_seq  # last sequence number handed out by read_batch
+        self._reader = None
+        self._reader_index = 0
+        self._open_reader(0)
+        self.delete_acked_segments()
+
+        threading.Thread(target=self._sync_periodically, name="livetrack-spool-sync", daemon=True).start()
+
+    # ---- Writing ----
+
+    def append(self, event):
+        """
+        Appends one event and returns its sequence number.
+
+        Raises:
+            OSError: The spool is full (max_bytes) or the disk write failed
+        """
+        payload = event_codec.encode_events([event], self.codec)
+        with self._lock:
+            if self._total_bytes >= self.max_bytes:
+                raise OSError(f"Spool {self.directory} is full ({self.max_bytes} bytes)")
+            if self._writer_bytes >= SEGMENT_BYTES:
+                self._roll()
+            seq = self.next_seq
+            self._writer.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload), seq) + payload)
+            self._writer_bytes += RECORD_HEADER.size + len(payload)
+            self._total_bytes += RECORD_HEADER.size + len(payload)
+            self._dirty = True
+            self.next_seq += 1
+            return seq
+
+    def sync(self):
+        """Makes every append so far durable."""
+        with self._lock:
+            if self._dirty:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+                self._dirty = False
+
+    def unread(self):
+        """Number of appended events not yet handed out by read_batch."""
+        return self.next_seq - 1 - self.read_seq
+
+    def pending(self):
+        """Number of appended events not yet acknowledged."""
+        return self.next_seq - 1 - self.acked_seq
+
+    def size_bytes(self):
+        return self._total_bytes
+
+    # ---- Reading & acknowledging ----
+
+    def read_batch(self, max_events):
+        """
+        Returns up to max_events unread events as (last_seq, events).
+
+        Reads continue after the previous batch even before it is acknowledged;
+        whatever is unacknowledged at shutdown is read again by the next run.
+        """
+        with self._lock:
+            self._writer.flush()  # Make buffered appends visible to the reader
+            segment_count = len(self._segments)
+
+        events = []
+        while len(events) < max_events and self._reader is not None:
+            position = self._reader.tell()
+            header = self._reader.read(RECORD_HEADER.size)
+            if len(header) == RECORD_HEADER.size:
+                length, crc, seq = RECORD_HEADER.unpack(header)
+                payload = self._reader.read(length)
+                if len(payload) == length and zlib.crc32(payload) == crc:
+                    if seq > self.read_seq:
+                        events.extend(event_codec.decode_events(payload))
+                        self.read_seq = seq
+                    continue
+
+            # End of this segment (or a record still being written): move on only if a newer segment exists
+            self._reader.seek(position)
+            if self._reader_index + 1 < segment_count:
+                self._open_reader(self._reader_index + 1)
+            else:
+                break
+
+        return self.read_seq, events
+
+    def ack(self, seq):
+        """Records that every event up to seq reached WaterLog, and deletes finished segments."""
+        if seq <= self.acked_seq:
+            return
+        self.acked_seq = seq
+        # Not fsynced: losing the latest ack in a crash only means resending those events
+        temporary = os.path.join(self.directory, "ack.tmp")
+        with open(temporary, "w") as f:
+            f.write(str(seq))
+        os.replace(temporary, os.path.join(self.directory, "ack"))
+        self.delete_acked_segments()
+
+    def delete_acked_segments(self):
+        with self._lock:
+            # Once everything is acknowledged, close out a large active segment so it can go too
+            if self.acked_seq >= self.next_seq - 1 and self._writer_bytes >= READ_CHUNK:
+                self._roll()
+            while len(self._segments) > 1 and self._first_seq(self._segments[1]) <= self.acked_seq + 1:
+                path = self._segments.pop(0)
+                self._total_bytes -= os.path.getsize(path)
+                os.remove(path)
+                self._reader_index -= 1
+        if self._reader_index < 0:
+            self._open_reader(0)
+
+    def close(self):
+        self._closed.set()
+        self.sync()
+        with self._lock:
+            self._writer.close()
+            if self._reader:
+                self._reader.close()
+
+    # ---- Internals ----
+
+    def _sync_periodically(self):
+        while not self._closed.wait(self.sync_interval):
+            try:
+                self.sync()
+            except (OSError, ValueError) as e:
+                print(f"❌ Spool sync failed: {e}")
+
+    def _read_ack(self):
+        try:
+            with open(os.path.join(self.directory, "ack")) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _first_seq(self, path):
+        return int(os.path.basename(path)[len("segment-"):-len(".log")])
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.directory, f"segment-{first_seq:020d}.log")
+
+    def _open_writer(self):
+        if not self._segments:
+            self._segments.append(self._segment_path(self.next_seq))
+        path = self._segments[-1]
+        self._writer = open(path, "ab")
+        self._writer_bytes = self._writer.tell()
+
+    def _roll(self):
+        """Starts a new segment (caller holds the lock)."""
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._dirty = False
+        self._writer.close()
+        self._segments.append(self._segment_path(self.next_seq))
+        self._writer = open(self._segments[-1], "ab")
+        self._writer_bytes = 0
+
+    def _open_reader(self, index):
+        if self._reader:
+            self._reader.close()
+        self._reader_index = index
+        self._reader = open(self._segments[index], "rb", buffering=READ_CHUNK) if index < len(self._segments) else None
+
+    def _scan(self, path):
+        """Returns (end offset of the last complete record, its seq) for a segment."""
+        end, last_seq = 0, None
+        with open(path, "rb", buffering=READ_CHUNK) as f:
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                length, crc, seq = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                end, last_seq = f.tell(), seq
+        return end, last_seq
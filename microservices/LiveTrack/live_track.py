@@ -3,42 +3,113 @@ LiveTrack Microservice
 
 - Receives astronaut activity data from the Simulator via ZeroMQ
 - Tracks events: Flushes, Water Additions, Planet Visits
-- Logs all events into WaterLog (SQLite via Flask API)
+- Logs all events into WaterLog in batches (see batch_forwarder.py), over its
+  ZeroMQ ingest socket or, with LIVETRACK_TRANSPORT=http, its Flask API
+- Republishes every stored event (with its WaterLog id) to ViewPort over ZeroMQ PUB
+- Persists received events in a disk spool first (see disk_spool.py), so WaterLog
+  outages and LiveTrack restarts don't lose them
+- Serves received/sent/dropped counts and batching and delivery latencies on
+  http://127.0.0.1:5572/metrics (LIVETRACK_METRICS_PORT, 0 disables it); per-event
+  lines are sampled (see Common/logs.py)
 """
 
 import zmq
-import requests
-import json
+import os
+import sys
 
+# Shared modules (event codec, metrics, logging) live in microservices/Common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Common"))
+
+import event_codec
+import logs
+import metrics
+from batch_forwarder import BatchForwarder
+from disk_spool import DiskSpool
+
+WATERLOG_URL = "http://localhost:5001"
+WATERLOG_ZMQ_INGEST = "tcp://localhost:5557"
+TRANSPORT = os.environ.get("LIVETRACK_TRANSPORT", "zmq")  # zmq or http
+CODEC = os.environ.get("WET_CODEC", "struct")  # struct, or json for debugging
+
+# Batching & backpressure tuning
+BATCH_SIZE = int(os.environ.get("LIVETRACK_BATCH_SIZE", 200))
+BATCH_MAX_AGE = float(os.environ.get("LIVETRACK_BATCH_MAX_AGE_MS", 50)) / 1000
+QUEUE_SIZE = int(os.environ.get("LIVETRACK_QUEUE_SIZE", 10000))
+OVERFLOW_POLICY = os.environ.get("LIVETRACK_OVERFLOW", "block")  # block, drop_oldest or spill
+SPILL_PATH = "data/livetrack_spill.ndjson"
+
+# Durable spool; set LIVETRACK_SPOOL_DIR="" to keep events in memory only (then the overflow policy applies)
+SPOOL_DIR = os.environ.get("LIVETRACK_SPOOL_DIR", "data/livetrack_spool")
+SPOOL_MAX_BYTES = int(os.environ.get("LIVETRACK_SPOOL_MAX_MB", 1024)) * 1024 * 1024
+
+LIVE_UPDATES_ENDPOINT = "tcp://*:5558"  # ViewPort subscribes here for stored events
+METRICS_PORT = int(os.environ.get("LIVETRACK_METRICS_PORT", 5572))
+
+log = logs.get_logger("livetrack")
+log_event = logs.SampledLog(log)
+events_received = metrics.counter("livetrack_events_received_total", "Events received from the Simulator")
+undecodable = metrics.counter("livetrack_undecodable_messages_total", "Messages dropped as undecodable")
+live_updates = metrics.counter("livetrack_live_updates_total", "Stored events republished to ViewPort")
 
 # ZeroMQ Subscriber Setup
 context = zmq.Context()
 socket = context.socket(zmq.SUB)
+socket.setsockopt(zmq.RCVHWM, 100000)  # Absorb bursts while the forwarder catches up
 socket.connect("tcp://localhost:5556")  # Connect to the Simulator
 socket.setsockopt_string(zmq.SUBSCRIBE, "")
 
-print("🚀 LiveTrack: Listening for astronaut activity events...")
+# Live update publisher for ViewPort; only the forwarder thread sends on it after startup
+publisher = context.socket(zmq.PUB)
+publisher.setsockopt(zmq.SNDHWM, 100000)
+publisher.bind(LIVE_UPDATES_ENDPOINT)
 
-def send_to_waterlog(event):
+def publish_live_update(events):
     """
-    Sends received event data to WaterLog for storage.
-    
+    Republishes events WaterLog has acknowledged, stamped with their ids.
+
     Args:
-        event (dict): The event data (e.g., flush, refill, planet visit)
+        events (list): Stored events, each with its WaterLog "id"
     """
-    try:
-        response = requests.post("http://localhost:5001/log", json=event)
-        if response.status_code == 201:
-            print(f"✅ Event Logged: {event}")
-        else:
-            print(f"⚠️ Error logging event: {response.status_code} | Response: {response.text}")
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Connection Error: {e}")
-
-while True:
-    # Receive event data from the Simulator
-    message = socket.recv_json()
-    print(f"📥 Received Event: {json.dumps(message, indent=2)}")
-
-    # Log the received data into WaterLog
-    send_to_waterlog(message)
+    publisher.send(event_codec.encode_events(events, CODEC))
+    live_updates.inc(len(events))
+
+spool = DiskSpool(SPOOL_DIR, CODEC, SPOOL_MAX_BYTES) if SPOOL_DIR else None
+if spool and spool.pending():
+    log.info(f"💾 Resuming {spool.pending()} spooled events from the last run")
+
+forwarder = BatchForwarder(
+    WATERLOG_URL,
+    batch_size=BATCH_SIZE,
+    max_age=BATCH_MAX_AGE,
+    queue_size=QUEUE_SIZE,
+    overflow=OVERFLOW_POLICY,
+    spill_path=SPILL_PATH,
+    zmq_endpoint=WATERLOG_ZMQ_INGEST if TRANSPORT == "zmq" else None,
+    codec=CODEC,
+    on_delivered=publish_live_update,
+    spool=spool,
+).start()
+
+metrics.serve(METRICS_PORT)
+log.info("🚀 LiveTrack: Listening for astronaut activity events...")
+
+try:
+    while True:
+        # Receive event data from the Simulator (any event_codec encoding)
+        try:
+            events = event_codec.decode_events(socket.recv())
+        except event_codec.CodecError as e:
+            undecodable.inc()
+            log.warning(f"⚠️ Dropped undecodable message: {e}")
+            continue
+
+        events_received.inc(len(events))
+        for message in events:
+            log_event("📥 Received Event: %s", message)
+
+            # Queue the event for the next batch to WaterLog
+            forwarder.submit(message)
+finally:
+    forwarder.close(timeout=5)
+    if spool:
+        spool.close()
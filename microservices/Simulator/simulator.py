@@ -6,20 +6,56 @@ Simulator Microservice
   - Water refills
   - Planet visits
 - Sends data to LiveTrack via ZeroMQ
+- Load mode (--rate) drives a configurable, reproducible event rate for capacity testing
+- Events come from a crew of astronauts (--astronauts) spread over one or more
+  stations (--stations); WaterLog stores each station in its own shard
+- Serves events sent, target rate and schedule lag on
+  http://127.0.0.1:5571/metrics (SIMULATOR_METRICS_PORT, 0 disables it)
+
+Usage:
+    python3 simulator.py                                   # astronaut-paced, one event every 3-7 s
+    python3 simulator.py --rate 5000 --duration 60 --seed 7
+    python3 simulator.py --rate 20000 --profile burst --processes 4 \\
+        --mix flush=3,water_refill=2,planet_visit=1
+    python3 simulator.py --rate 5000 --stations main,lunar-gateway,mars-base --astronauts 6
 """
 
+import argparse
+import json
+import math
+import multiprocessing
+import queue
+import threading
 import zmq
 import time
 import random
 import signal
 import sys
+import os
+
+# Shared modules (event codec, metrics, logging) live in microservices/Common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Common"))
+
+import event_codec
+import logs
+import metrics
+
+CODEC = os.environ.get("WET_CODEC", "struct")  # struct, or json for debugging
+
+PUB_ENDPOINT = "tcp://*:5556"  # LiveTrack subscribes to this
+FANOUT_ENDPOINT = "tcp://127.0.0.1:5566"  # Load-mode workers publish here, a proxy republishes on PUB_ENDPOINT
+METRICS_PORT = int(os.environ.get("SIMULATOR_METRICS_PORT", 5571))
 
-# ZeroMQ Publisher Setup
-context = zmq.Context()
-socket = context.socket(zmq.PUB)
-socket.bind("tcp://*:5556")  # LiveTrack subscribes to this
+DEFAULT_MIX = {"flush": 1, "water_refill": 1}  # Planet visits are off unless requested in --mix
+PLANETS = ["Mars", "Europa", "Titan", "Ganymede"]
+PROFILES = ("steady", "burst", "ramp", "sine")
+DEFAULT_STATIONS = [event_codec.DEFAULT_STATION_ID]
+DEFAULT_ASTRONAUTS = 4  # crew members per station
 
-print("🚀 Simulator: Generating astronaut activity...")
+log = logs.get_logger("simulator")
+events_sent = metrics.counter("simulator_events_sent_total", "Events published to LiveTrack")
+schedule_lag = metrics.histogram("simulator_schedule_lag_seconds", "How far load-mode sends ran behind schedule")
+target_rate_gauge = metrics.gauge("simulator_target_rate", "Events/sec the load profile currently asks for")
 
 # Global flag to stop the simulator properly
 running = True
@@ -30,26 +66,271 @@ def shutdown_simulator(signum, frame):
     print("🛑 Simulator Shutting Down...")
     running = False  # Set flag to stop the event loop
 
-# Catch termination signals
-signal.signal(signal.SIGTERM, shutdown_simulator)
-signal.signal(signal.SIGINT, shutdown_simulator)  # Handle Ctrl+C
+def generate_event(rng=random, mix=DEFAULT_MIX, stations=DEFAULT_STATIONS, astronauts=DEFAULT_ASTRONAUTS):
+    """
+    Randomly generates an astronaut event, tagged with a unique event_id so
+    WaterLog can drop redelivered copies.
+
+    Args:
+        rng (random.Random): Source of randomness (seed it for reproducible runs)
+        mix (dict): Relative weight of each event type
+        stations (list): Station ids to spread events over
+        astronauts (int): Crew members per station (astronaut-1 .. astronaut-N)
+    """
+    event_type = rng.choices(list(mix), weights=list(mix.values()))[0]
 
-def generate_event():
-    """Randomly generates an astronaut event."""
-    event_type = random.choice(["flush", "water_refill", "planet_visit"])
-    
     if event_type == "flush":
-        return {"event_type": "flush", "waste_volume": random.randint(1, 5), "timestamp": time.time()}
+        event = {"event_type": "flush", "waste_volume": rng.randint(1, 5)}
     elif event_type == "water_refill":
-        return {"event_type": "water_refill", "water_added": random.randint(10, 50), "timestamp": time.time()}
-    #else:  # planet_visit
-      # return {"event_type": "planet_visit", "planet_name": random.choice(["Mars", "Europa", "Titan", "Ganymede"]), "timestamp": time.time()}
-
-# Modified loop that stops when running = False
-while running:
-    event = generate_event()
-    socket.send_json(event)
-    print(f"📤 Sent Event: {event}")
-    time.sleep(random.randint(3, 7))  # Simulate astronaut activity
-
-print("✅ Simulator Stopped Cleanly.")
+        event = {"event_type": "water_refill", "water_added": rng.randint(10, 50)}
+    else:  # planet_visit
+        event = {"event_type": "planet_visit", "planet_name": rng.choice(PLANETS)}
+    event["station_id"] = rng.choice(stations)
+    event["astronaut_id"] = f"astronaut-{rng.randint(1, astronauts)}"
+    # Not drawn from rng: reseeded runs must not collide with events already stored
+    return {**event, "timestamp": time.time(), "event_id": event_codec.new_event_id()}
+
+def parse_stations(text):
+    """Parses a comma-separated list of station ids like "main,lunar-gateway"."""
+    stations = [station.strip() for station in text.split(",") if station.strip()]
+    if not stations:
+        raise argparse.ArgumentTypeError("At least one station is needed")
+    return stations
+
+def parse_mix(text):
+    """Parses an event-type mix like "flush=3,water_refill=2,planet_visit=1"."""
+    mix = {}
+    for part in text.split(","):
+        event_type, _, weight = part.partition("=")
+        if event_type not in ("flush", "water_refill", "planet_visit"):
+            raise argparse.ArgumentTypeError(f"Unknown event type {event_type!r}")
+        mix[event_type] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("At least one event type needs a positive weight")
+    return mix
+
+def target_rate(args, elapsed):
+    """
+    Returns the events/sec the load profile asks for at `elapsed` seconds into the run.
+
+    - steady: args.rate throughout
+    - burst:  args.rate, multiplied by --burst-factor for --burst-length s every --burst-period s
+    - ramp:   climbs linearly from 0 to args.rate over --duration (or 60 s)
+    - sine:   oscillates between 10% and 190% of args.rate every --burst-period s
+    """
+    if args.profile == "burst":
+        in_burst = elapsed % args.burst_period < args.burst_length
+        return args.rate * args.burst_factor if in_burst else args.rate
+    if args.profile == "ramp":
+        return args.rate * min(1.0, elapsed / (args.duration or 60))
+    if args.profile == "sine":
+        return args.rate * (1 + 0.9 * math.sin(2 * math.pi * elapsed / args.burst_period))
+    return args.rate
+
+def run_astronaut_paced(socket, args):
+    """Original behaviour: one random event every 3-7 seconds until stopped."""
+    log_event = logs.SampledLog(log)
+    while running:
+        event = generate_event(stations=args.stations, astronauts=args.astronauts)
+        socket.send(event_codec.encode_events([event], CODEC))
+        events_sent.inc()
+        log_event("📤 Sent Event: %s", event)
+        time.sleep(random.randint(3, 7))  # Simulate astronaut activity
+
+def run_load(socket, args, worker_index=0, share=1.0, progress=None):
+    """
+    Sends events on a fixed schedule derived from the load profile.
+
+    Sends are scheduled against absolute times, so a slow iteration is caught up
+    immediately (as fast as possible) instead of drifting the whole run.
+
+    Args:
+        socket (zmq.Socket): Connected PUB socket
+        args (argparse.Namespace): Parsed load options
+        worker_index (int): Offsets the seed so workers don't send identical streams
+        share (float): This worker's fraction of the target rate
+        progress (multiprocessing.Array): Shared per-worker sent counts the fan-out parent serves as metrics
+
+    Returns:
+        dict: sent, elapsed, target and max lag behind schedule
+    """
+    rng = random.Random(None if args.seed is None else args.seed + worker_index)
+    time.sleep(args.warmup)  # Let subscribers connect; PUB drops everything sent before that
+
+    started = time.monotonic()
+    next_send = started
+    next_report = started + args.report_interval
+    sent = 0
+    max_lag = 0.0
+
+    while running:
+        now = time.monotonic()
+        elapsed = now - started
+        if args.duration and elapsed >= args.duration:
+            break
+        if args.count and sent >= args.count:
+            break
+
+        rate = target_rate(args, elapsed) * share
+        target_rate_gauge.set(rate / share)
+        if rate <= 0:
+            time.sleep(0.01)
+            next_send = time.monotonic()
+            continue
+
+        if now < next_send:
+            time.sleep(min(next_send - now, 0.05))
+            continue
+
+        # Send every event that is due, then sleep until the next one
+        max_lag = max(max_lag, now - next_send)
+        schedule_lag.observe(now - next_send)
+        burst_started = sent
+        while next_send <= now and running:
+            socket.send(event_codec.encode_events([generate_event(rng, args.mix, args.stations, args.astronauts)], CODEC))
+            sent += 1
+            next_send += 1 / rate
+            if args.count and sent >= args.count:
+                break
+        events_sent.inc(sent - burst_started)
+        if progress is not None:
+            progress[worker_index] = sent
+
+        if worker_index == 0 and now >= next_report:
+            # Worker 0 speaks for the whole run, scaling its own numbers by its share
+            print(f"📈 {elapsed:6.1f}s  target {rate / share:9.1f} ev/s  achieved {sent / elapsed / share:9.1f} ev/s"
+                  f"  lag {now - next_send:6.3f}s")
+            next_report += args.report_interval
+
+    elapsed = time.monotonic() - started
+    return {"sent": sent, "elapsed": elapsed, "max_lag": max_lag}
+
+def load_worker(args, worker_index, results, progress):
+    """Entry point for one fan-out process: publish a share of the load into the proxy."""
+    signal.signal(signal.SIGTERM, shutdown_simulator)
+    signal.signal(signal.SIGINT, shutdown_simulator)
+
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    socket.setsockopt(zmq.SNDHWM, 100000)
+    socket.connect(FANOUT_ENDPOINT)
+
+    results.put(run_load(socket, args, worker_index, share=1 / args.processes, progress=progress))
+    socket.close(linger=2000)
+    context.term()
+
+def run_fanout(args):
+    """Runs args.processes load workers behind an XSUB/XPUB proxy bound on PUB_ENDPOINT."""
+    context = zmq.Context()
+    frontend = context.socket(zmq.XSUB)
+    frontend.bind(FANOUT_ENDPOINT)
+    backend = context.socket(zmq.XPUB)
+    backend.setsockopt(zmq.SNDHWM, 100000)
+    backend.bind(PUB_ENDPOINT)
+
+    # zmq.proxy forwards in C, so one thread keeps up with many workers
+    threading.Thread(target=zmq.proxy, args=(frontend, backend), daemon=True).start()
+
+    results = multiprocessing.Queue()
+    progress = multiprocessing.Array("q", args.processes, lock=False)  # each worker writes only its own slot
+    # The workers' own metrics stay in their processes; this one serves their combined count
+    metrics.counter("simulator_events_sent_total", "Events published to LiveTrack", lambda: sum(progress))
+    started = time.monotonic() + args.warmup  # when the workers start sending
+    target_rate_gauge.fn = lambda: target_rate(args, max(0.0, time.monotonic() - started))
+    workers = [multiprocessing.Process(target=load_worker, args=(args, i, results, progress), daemon=True)
+               for i in range(args.processes)]
+    for worker in workers:
+        worker.start()
+
+    reports = []
+    while len(reports) < len(workers):
+        if not running:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()  # Workers stop gracefully on SIGTERM and still report
+        try:
+            reports.append(results.get(timeout=0.5))
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers) and results.empty():
+                break
+
+    for worker in workers:
+        worker.join(timeout=5)
+    time.sleep(0.5)  # Let the proxy forward what the workers handed it
+    return reports
+
+def summarize(args, reports):
+    """Prints (and returns) the achieved send rate versus the target."""
+    sent = sum(r["sent"] for r in reports)
+    elapsed = max((r["elapsed"] for r in reports), default=0.0)
+    summary = {
+        "profile": args.profile,
+        "target_rate": args.rate,
+        "processes": args.processes,
+        "seed": args.seed,
+        "sent": sent,
+        "elapsed_s": elapsed,
+        "achieved_rate": sent / elapsed if elapsed else 0.0,
+        "max_lag_s": max((r["max_lag"] for r in reports), default=0.0),
+    }
+    print(f"📊 Sent {sent} events in {elapsed:.2f}s: achieved {summary['achieved_rate']:.1f} ev/s "
+          f"(target {args.rate} ev/s, {args.profile}, max lag {summary['max_lag_s']:.3f}s)")
+    if summary["max_lag_s"] > 1:
+        print("⚠️ The generator fell behind its schedule; add --processes to tell its limits from the pipeline's.")
+    if args.report_json:
+        with open(args.report_json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate astronaut activity for LiveTrack")
+    parser.add_argument("--rate", type=float, help="load mode: target events/sec (omit for astronaut pacing)")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (0 = until stopped)")
+    parser.add_argument("--count", type=int, default=0, help="stop after this many events per process (0 = no limit)")
+    parser.add_argument("--profile", choices=PROFILES, default="steady", help="how the rate varies over time")
+    parser.add_argument("--burst-factor", type=float, default=10, help="burst profile: rate multiplier during bursts")
+    parser.add_argument("--burst-period", type=float, default=10, help="burst/sine profiles: seconds per cycle")
+    parser.add_argument("--burst-length", type=float, default=1, help="burst profile: seconds of burst per cycle")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="event-type weights, e.g. flush=3,water_refill=2")
+    parser.add_argument("--stations", type=parse_stations, default=DEFAULT_STATIONS,
+                        help="comma-separated station ids to spread events over, e.g. main,lunar-gateway")
+    parser.add_argument("--astronauts", type=int, default=DEFAULT_ASTRONAUTS, help="crew members per station")
+    parser.add_argument("--seed", type=int, help="seed for reproducible event streams")
+    parser.add_argument("--processes", type=int, default=1, help="fan the load out over this many processes")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds to wait for subscribers before sending")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="seconds between progress lines")
+    parser.add_argument("--report-json", help="write the final summary to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics.serve(METRICS_PORT)
+
+    # Catch termination signals
+    signal.signal(signal.SIGTERM, shutdown_simulator)
+    signal.signal(signal.SIGINT, shutdown_simulator)  # Handle Ctrl+C
+
+    if args.rate and args.processes > 1:
+        print(f"🚀 Simulator: Load mode, {args.rate} ev/s ({args.profile}) over {args.processes} processes...")
+        summarize(args, run_fanout(args))
+        print("✅ Simulator Stopped Cleanly.")
+        return
+
+    # ZeroMQ Publisher Setup
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    socket.setsockopt(zmq.SNDHWM, 100000)
+    socket.bind(PUB_ENDPOINT)  # LiveTrack subscribes to this
+
+    if args.rate:
+        print(f"🚀 Simulator: Load mode, {args.rate} ev/s ({args.profile})...")
+        summarize(args, [run_load(socket, args)])
+    else:
+        print("🚀 Simulator: Generating astronaut activity...")
+        run_astronaut_paced(socket, args)
+
+    socket.close(linger=2000)
+    print("✅ Simulator Stopped Cleanly.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Event Stream Recorder & Replayer
+
+- record: taps the Simulator's ZeroMQ PUB stream (port 5556) next to LiveTrack
+  and appends every message, byte for byte, with its receive time to a
+  compact recording file
+- replay: publishes a recording on port 5556 in place of the Simulator (stop
+  the Simulator first), so LiveTrack receives it exactly as it was recorded,
+  at 1x, Nx or as fast as possible
+- info: prints a recording's message count, time span and rate
+
+Replays keep the recorded gaps between messages, scheduled against absolute
+times so they don't drift. At high speeds the replayer waits for LiveTrack
+instead of dropping messages at the socket's high-water mark, so every
+recorded event is delivered and the achieved rate shows where the pipeline
+tops out.
+
+Recorded events keep their event_ids, so replaying into a database that
+already holds them only produces duplicates; use --new-ids for repeated
+load tests and --retime to stamp events with the replay time.
+
+Recording layout (little-endian):
+    header:  "WETREC1\\n"
+    record:  received_at_ns:u64 | length:u32 | message (event_codec payload as published)
+
+Usage:
+    python3 stream_recorder.py record data/recordings/day1.wetrec --duration 86400
+    python3 stream_recorder.py replay data/recordings/day1.wetrec --speed 60
+    python3 stream_recorder.py replay data/recordings/day1.wetrec --speed max --new-ids --retime
+    python3 stream_recorder.py info data/recordings/day1.wetrec
+"""
+
+import argparse
+import os
+import signal
+import struct
+import sys
+import time
+
+import zmq
+
+# Shared modules (event codec) live in microservices/Common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Common"))
+
+import event_codec
+
+TAP_ENDPOINT = "tcp://localhost:5556"  # The Simulator's stream, as LiveTrack subscribes to it
+REPLAY_ENDPOINT = "tcp://*:5556"  # Where LiveTrack expects the Simulator
+
+FILE_MAGIC = b"WETREC1\n"
+RECORD_HEADER = struct.Struct("<QI")
+FILE_BUFFER = 1024 * 1024
+REPLAY_HWM = 100000  # messages queued for LiveTrack before the replayer waits
+
+# Global flag to stop recording or replaying properly
+running = True
+
+def shutdown(signum, frame):
+    """Handles termination signals (e.g., SIGTERM, SIGINT) to stop after the current message."""
+    global running
+    print("🛑 Stopping...")
+    running = False
+
+def open_for_append(path):
+    """Opens a recording for appending, writing the header to a new file (or checking an existing one's)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    f = open(path, "ab", buffering=FILE_BUFFER)
+    if f.tell() == 0:
+        f.write(FILE_MAGIC)
+    else:
+        with open(path, "rb") as existing:
+            if existing.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                f.close()
+                raise ValueError(f"{path} is not a stream recording")
+    return f
+
+def read_recording(path):
+    """
+    Yields (received_at_ns, message) from a recording, oldest first.
+
+    A record cut short (the recorder was killed mid-write) ends the recording.
+    """
+    with open(path, "rb", buffering=FILE_BUFFER) as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a stream recording")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            received_at_ns, length = RECORD_HEADER.unpack(header)
+            message = f.read(length)
+            if len(message) < length:
+                return
+            yield received_at_ns, message
+
+def record(args):
+    """Appends every message published on args.endpoint to args.file until stopped."""
+    context = zmq.Context()
+    socket = context.socket(zmq.SUB)
+    socket.setsockopt(zmq.RCVHWM, 100000)  # Absorb bursts between disk writes
+    socket.connect(args.endpoint)
+    socket.setsockopt_string(zmq.SUBSCRIBE, "")
+
+    recorded = recorded_bytes = 0
+    started = time.monotonic()
+    next_report = started + args.report_interval
+    print(f"🎙 Recording {args.endpoint} to {args.file}...")
+    with open_for_append(args.file) as f:
+        while running:
+            now = time.monotonic()
+            if args.duration and now - started >= args.duration:
+                break
+            if now >= next_report:
+                print(f"📈 {now - started:8.1f}s  {recorded} messages  {recorded_bytes / 1e6:.1f} MB")
+                next_report += args.report_interval
+            if not socket.poll(200):
+                continue
+
+            # Drain whatever is queued before checking the clock again
+            while True:
+                try:
+                    message = socket.recv(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                f.write(RECORD_HEADER.pack(time.time_ns(), len(message)) + message)
+                recorded += 1
+                recorded_bytes += RECORD_HEADER.size + len(message)
+
+    socket.close(linger=0)
+    print(f"✅ Recorded {recorded} messages ({recorded_bytes / 1e6:.1f} MB) in {time.monotonic() - started:.1f}s")
+
+def rewrite(message, new_ids, retime):
+    """Re-encodes a recorded message with fresh event_ids and/or the current time as timestamp."""
+    events = event_codec.decode_events(message)
+    now = time.time()
+    for event in events:
+        if new_ids:
+            event["event_id"] = event_codec.new_event_id()
+        if retime:
+            event["timestamp"] = now
+    return event_codec.encode_events(events, "struct" if message[:1] == event_codec.STRUCT_TAG else "json")
+
+def replay(args):
+    """
+    Publishes a recording on args.endpoint, keeping its timing scaled by args.speed (0: as fast as possible).
+
+    Returns:
+        dict: sent, elapsed, achieved rate and max lag behind schedule
+    """
+    context = zmq.Context()
+    # XPUB with NODROP blocks at the high-water mark instead of silently dropping like PUB
+    socket = context.socket(zmq.XPUB)
+    socket.setsockopt(zmq.XPUB_NODROP, 1)
+    socket.setsockopt(zmq.SNDHWM, REPLAY_HWM)
+    socket.bind(args.endpoint)
+
+    speed_label = f"{args.speed:g}x" if args.speed else "max speed"
+    print(f"▶️ Replaying {args.file} on {args.endpoint} at {speed_label}...")
+    time.sleep(args.warmup)  # Let LiveTrack connect; messages sent before that would be lost
+
+    sent = 0
+    max_lag = 0.0
+    first_ns = None
+    started = time.monotonic()
+    next_report = started + args.report_interval
+    for received_at_ns, message in read_recording(args.file):
+        if not running or (args.count and sent >= args.count):
+            break
+        if first_ns is None:
+            first_ns = received_at_ns
+
+        now = time.monotonic()
+        if args.speed:
+            due = started + (received_at_ns - first_ns) / 1e9 / args.speed
+            if due > now:
+                # Sleep in short steps so a stop signal is noticed during long quiet stretches
+                remaining = due - now
+                while running and remaining > 0:
+                    time.sleep(min(remaining, 0.2))
+                    remaining = due - time.monotonic()
+            else:
+                max_lag = max(max_lag, now - due)
+
+        if args.new_ids or args.retime:
+            message = rewrite(message, args.new_ids, args.retime)
+        socket.send(message)
+        sent += 1
+
+        if now >= next_report:
+            recorded = (received_at_ns - first_ns) / 1e9
+            print(f"📈 {now - started:8.1f}s  {sent} messages  {sent / (now - started):9.1f} msg/s"
+                  f"  at recording time +{recorded:.1f}s")
+            next_report += args.report_interval
+
+    elapsed = time.monotonic() - started
+    socket.close(linger=2000)
+    summary = {"sent": sent, "elapsed_s": elapsed, "achieved_rate": sent / elapsed if elapsed else 0.0,
+               "speed": args.speed, "max_lag_s": max_lag}
+    print(f"📊 Replayed {sent} messages in {elapsed:.2f}s: {summary['achieved_rate']:.1f} msg/s "
+          f"({speed_label}, max lag {max_lag:.3f}s)")
+    if args.speed and max_lag > 1:
+        print("⚠️ The replay fell behind the recording's timing; LiveTrack (or this replayer) couldn't keep up.")
+    return summary
+
+def info(args):
+    """Prints a recording's message count, time span and mean rate."""
+    count = size = 0
+    first_ns = last_ns = None
+    for received_at_ns, message in read_recording(args.file):
+        if first_ns is None:
+            first_ns = received_at_ns
+        last_ns = received_at_ns
+        count += 1
+        size += RECORD_HEADER.size + len(message)
+
+    if not count:
+        print(f"📼 {args.file}: empty")
+        return
+    span = (last_ns - first_ns) / 1e9
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(first_ns / 1e9))
+    print(f"📼 {args.file}: {count} messages ({size / 1e6:.1f} MB) from {started} over {span:.1f}s"
+          f" ({count / span if span else 0:.1f} msg/s)")
+
+def parse_speed(text):
+    """Parses a replay speed: a multiplier like "1" or "60", or "max" (returned as 0)."""
+    if text.lower() in ("max", "0"):
+        return 0.0
+    speed = float(text.lower().rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive, or max")
+    return speed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Record the Simulator's event stream and replay it into LiveTrack")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="append the live stream to a recording")
+    record_parser.add_argument("file", help="recording to append to (created if missing)")
+    record_parser.add_argument("--endpoint", default=TAP_ENDPOINT, help="PUB stream to record")
+    record_parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (0 = until stopped)")
+    record_parser.add_argument("--report-interval", type=float, default=60.0, help="seconds between progress lines")
+
+    replay_parser = commands.add_parser("replay", help="publish a recording in place of the Simulator")
+    replay_parser.add_argument("file", help="recording to replay")
+    replay_parser.add_argument("--endpoint", default=REPLAY_ENDPOINT, help="address to publish on")
+    replay_parser.add_argument("--speed", type=parse_speed, default=1.0, help="time multiplier (e.g. 1, 60) or max")
+    replay_parser.add_argument("--count", type=int, default=0, help="stop after this many messages (0 = all)")
+    replay_parser.add_argument("--new-ids", action="store_true", help="give every event a fresh event_id")
+    replay_parser.add_argument("--retime", action="store_true", help="stamp events with the replay time")
+    replay_parser.add_argument("--warmup", type=float, default=1.0, help="seconds to wait for subscribers before sending")
+    replay_parser.add_argument("--report-interval", type=float, default=5.0, help="seconds between progress lines")
+
+    info_parser = commands.add_parser("info", help="summarize a recording")
+    info_parser.add_argument("file", help="recording to summarize")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Catch termination signals
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)  # Handle Ctrl+C
+
+    try:
+        {"record": record, "replay": replay, "info": info}[args.command](args)
+    except (OSError, ValueError, zmq.ZMQError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Name Generator Pool for ViewPort
+
+- Runs the Name Generator Microservice (`name_generator.py --quote/--planet/--station`)
+  in one long-lived helper process instead of a new interpreter per lookup
+- The helper compiles the generator once and executes it per request with its
+  output captured, so a value costs microseconds of generator work, not an
+  interpreter startup
+- Pools of pre-generated values per flag are topped up by a background thread,
+  so ViewPort's lookups are a deque pop
+
+Helper protocol (stdin/stdout, one line each):
+    request:  <flag>                       e.g. --quote
+    reply:    {"value": "..."} or {"error": "..."}
+
+Run the helper by hand to try it:
+    python3 name_pool.py ../CS361_partner_Microservice/name_generator.py
+"""
+
+import collections
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+FLAGS = ("--quote", "--planet", "--station")
+RESTART_DELAY = 5.0  # seconds before starting the helper again after it failed
+
+
+class NamePool:
+    """
+    Keeps a pool of ready-made name generator results per flag.
+
+    Args:
+        script (str): Path to name_generator.py
+        pool_size (int): Values kept ready per flag
+        refill_below (int): Refill a pool once it drops below this many values
+        timeout (float): Seconds to wait for the helper to answer a request
+    """
+
+    def __init__(self, script, pool_size=20, refill_below=10, timeout=5):
+        self.script = script
+        self.pool_size = pool_size
+        self.refill_below = refill_below
+        self.timeout = timeout
+        self.pools = {flag: collections.deque() for flag in FLAGS}
+        self.last_error = None
+
+        self._cond = threading.Condition()
+        self._helper = None
+        self._closed = False
+        self._stopped = threading.Event()  # Ends the restart delay early on close()
+        self._thread = threading.Thread(target=self._refill, name="viewport-name-pool", daemon=True)
+
+    def start(self):
+        """Starts the helper and the refill thread, and returns the pool."""
+        self._thread.start()
+        return self
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._stopped.set()
+        self._stop_helper()
+
+    def take(self, flag):
+        """Returns a ready value for flag without waiting, or None if its pool is empty."""
+        with self._cond:
+            pool = self.pools[flag]
+            value = pool.popleft() if pool else None
+            if len(pool) < self.refill_below:
+                self._cond.notify_all()
+            return value
+
+    def get(self, flag, timeout=None):
+        """
+        Returns a value for flag, waiting up to timeout for the pool to be refilled.
+
+        Raises:
+            RuntimeError: No value arrived in time (last_error says why, if the helper failed)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self.pools[flag]:
+                self._cond.notify_all()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if self._closed or (remaining is not None and remaining <= 0):
+                    raise RuntimeError(self.last_error or f"No {flag} value available")
+                self._cond.wait(remaining)
+            value = self.pools[flag].popleft()
+            self._cond.notify_all()
+            return value
+
+    # ---- Refilling ----
+
+    def _refill(self):
+        while True:
+            with self._cond:
+                while not self._closed and all(len(pool) >= self.refill_below for pool in self.pools.values()):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                wanted = {flag: self.pool_size - len(pool) for flag, pool in self.pools.items()
+                          if len(pool) < self.refill_below}
+
+            try:
+                values = self._generate(wanted)
+            except (OSError, ValueError, RuntimeError) as e:
+                self.last_error = f"Name generator unavailable: {e}"
+                print(f"❌ {self.last_error}")
+                self._stop_helper()
+                with self._cond:
+                    self._cond.notify_all()  # Let waiting get() calls see last_error
+                self._stopped.wait(RESTART_DELAY)
+                continue
+
+            with self._cond:
+                for flag, flag_values in values.items():
+                    self.pools[flag].extend(flag_values)
+                self.last_error = None
+                self._cond.notify_all()
+
+    def _generate(self, wanted):
+        """Asks the helper for wanted[flag] values per flag (all requests written before reading)."""
+        helper = self._ensure_helper()
+        requests = [flag for flag, count in wanted.items() for _ in range(count)]
+        helper.stdin.write("".join(f"{flag}\n" for flag in requests))
+        helper.stdin.flush()
+
+        values = {flag: [] for flag in wanted}
+        for flag in requests:
+            line = self._read_line(helper)
+            reply = json.loads(line)
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            values[flag].append(reply["value"])
+        return values
+
+    def _read_line(self, helper):
+        # The refill thread is the only reader; a watchdog kills a helper that hangs
+        watchdog = threading.Timer(self.timeout, helper.kill)
+        watchdog.start()
+        try:
+            line = helper.stdout.readline()
+        finally:
+            watchdog.cancel()
+        if not line:
+            raise RuntimeError("helper exited")
+        return line
+
+    def _ensure_helper(self):
+        if self._helper is None or self._helper.poll() is not None:
+            if not os.path.exists(self.script):
+                raise OSError(f"{self.script} not found")
+            self._helper = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), self.script],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1,
+            )
+        return self._helper
+
+    def _stop_helper(self):
+        helper, self._helper = self._helper, None
+        if helper is not None and helper.poll() is None:
+            helper.kill()
+            helper.wait()
+
+
+def run_helper(script):
+    """
+    Serves name generator requests from stdin until it closes (ViewPort exited).
+
+    The generator is compiled once; each request executes it as `__main__` with
+    the request's flag in sys.argv and its printed output captured.
+    """
+    with open(script) as f:
+        code = compile(f.read(), script, "exec")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    out = sys.stdout
+
+    for line in sys.stdin:
+        flag = line.strip()
+        captured = io.StringIO()
+        sys.argv = [script, flag]
+        try:
+            with contextlib.redirect_stdout(captured):
+                exec(code, {"__name__": "__main__", "__file__": script})
+            reply = {"value": captured.getvalue().strip()}
+        except SystemExit as e:
+            reply = {"value": captured.getvalue().strip()} if not e.code else {"error": f"exit code {e.code}"}
+        except Exception as e:
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        out.write(json.dumps(reply) + "\n")
+        out.flush()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python3 name_pool.py <path to name_generator.py>")
+    run_helper(sys.argv[1])
@@ -2,33 +2,83 @@
 ViewPort: GUI for W.E.T. System
 
 - Displays system status, astronaut waste events, and historical logs.
-- Pulls event data from WaterLog API.
+- Pulls event history from WaterLog API once, then applies live updates pushed by LiveTrack.
+- Shows and logs to one station (WET_STATION_ID, default "main"); WaterLog keeps each station in its own shard.
+- Keeps the event table to a window of the newest rows; older pages load on demand.
 - Controls the Simulator (Pause & Resume).
 - Manually triggers flush & water refill events.
-- Fetches random motivational quotes, planets, and stations from Name Generator Microservice.
+- Fetches random motivational quotes, planets, and stations from Name Generator Microservice,
+  served from pools kept filled by one long-lived generator process (see name_pool.py).
+- Runs all network and subprocess I/O on a background worker pool; results are
+  handed back to the Tk loop through a queue, so the GUI never blocks on WaterLog.
+- Serves fetch, table update and chart redraw timings on http://127.0.0.1:5573/metrics
+  (VIEWPORT_METRICS_PORT, 0 disables it).
 """
 
 import psutil 
+import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
 import subprocess
+import sys
 import threading
 import time
 import tkinter as tk
 from tkinter import ttk
 import requests
-import time
 import os
 from PIL import Image, ImageTk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import lru_cache
 from matplotlib.ticker import FuncFormatter
+import zmq
 
 # Get the absolute path to the script's directory
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
 
+# Shared modules (event codec, metrics) live in microservices/Common
+sys.path.append(os.path.join(BASE_DIR, "microservices", "Common"))
+
+import event_codec
+import metrics
+from name_pool import NamePool
+
 # API URLs
 WATERLOG_API = "http://127.0.0.1:5001/history"
+WATERLOG_STATS_API = "http://127.0.0.1:5001/stats"
+WATERLOG_STATE_API = "http://127.0.0.1:5001/state"
 LIVE_TRACK_API = "http://127.0.0.1:5001/log"
+WATERLOG_IMPORT_API = "http://127.0.0.1:5001/import"
+WATERLOG_CLEAR_API = "http://127.0.0.1:5001/clear"
+
+# The station this dashboard shows, and logs its buttons' events to
+STATION_ID = os.environ.get("WET_STATION_ID", event_codec.DEFAULT_STATION_ID)
+
+# Local metrics endpoint (see Common/metrics.py)
+METRICS_PORT = int(os.environ.get("VIEWPORT_METRICS_PORT", 5573))
+
+# LiveTrack republishes every stored event here
+LIVE_UPDATES_ENDPOINT = "tcp://127.0.0.1:5558"
+LIVE_UPDATE_DRAIN_MS = 100  # how often the Tk loop applies pushed events
+CATCH_UP_INTERVAL_MS = 30000  # safety poll for events logged by other HTTP clients
+CHART_REDRAW_DELAY_MS = 1000  # pushed events within this window share one chart redraw
+UI_QUEUE_DRAIN_MS = 50  # how often the Tk loop runs results handed back by background work
+
+# Event table window
+TABLE_WINDOW_ROWS = 500  # newest rows kept in the table; older ones drop off the bottom
+TABLE_PAGE_ROWS = 500  # rows added per "Load Older Events" click
+
+# Chart (bucketed by WaterLog's /stats, so only a few hundred points are fetched)
+CHART_WINDOW = 24 * 3600  # seconds of history shown
+CHART_RESOLUTION = 300  # seconds per point
+
+# Background I/O limits
+IO_WORKERS = 4
+REQUEST_TIMEOUT = 5  # seconds for any WaterLog request
+NAME_GEN_TIMEOUT = 5  # seconds to wait for a name when its pool is empty
+NAME_POOL_SIZE = 20  # names kept ready per kind (quote, planet, station)
 
 # Path to `name_generator.py`
 NAME_GEN_PATH = "../CS361_partner_Microservice/name_generator.py"
@@ -36,10 +86,60 @@ NAME_GEN_PATH = "../CS361_partner_Microservice/name_generator.py"
 # Simulator Process Management
 simulator_process = None
 
+# Dashboard timings (the Tk-thread ones show how responsive the GUI stays)
+ui_delay = metrics.histogram("viewport_ui_delay_seconds", "Time a background result waited for the Tk loop")
+table_update = metrics.histogram("viewport_table_update_seconds", "Tk time to add a set of events to the table")
+chart_redraw = metrics.histogram("viewport_chart_redraw_seconds", "Time from a chart update to matplotlib finishing the redraw")
+live_events = metrics.counter("viewport_live_events_total", "Pushed events received for this station")
+events_applied = metrics.counter("viewport_events_applied_total", "Events added to the table")
+
+def fetch_events(timeout=REQUEST_TIMEOUT, **params):
+    """
+    Fetches every event matching params from WaterLog, following /history's page cursors.
+
+    Args:
+        timeout (float): Seconds allowed per page request
+        params: /history query parameters (e.g. since, event_type)
+
+    Returns:
+        list: Events, newest first (oldest first when polling with since_id)
+    """
+    params.setdefault("limit", 5000)
+    params.setdefault("station_id", STATION_ID)
+    events = []
+    while True:
+        page = requests.get(WATERLOG_API, params=params, timeout=timeout).json()
+        events.extend(page["events"])
+        if "since_id" in params:
+            if not page["has_more"]:
+                return events
+            params["since_id"] = page["last_id"]
+        elif not page["next_cursor"]:
+            return events
+        else:
+            params["cursor"] = page["next_cursor"]
+
+@lru_cache(maxsize=4096)
+def format_timestamp(seconds):
+    """Formats a whole-second timestamp for the table (bursts share a second, so this is cached)."""
+    return datetime.fromtimestamp(seconds).strftime('%Y-%m-%d %H:%M:%S')
+
+def load_history_snapshot():
+    """
+    Fetches what the dashboard needs at startup, without downloading the whole history.
+
+    Returns:
+        tuple: (first table page, tank state from /state)
+    """
+    page = requests.get(WATERLOG_API, params={"limit": TABLE_WINDOW_ROWS, "station_id": STATION_ID},
+                        timeout=REQUEST_TIMEOUT).json()
+    state = requests.get(WATERLOG_STATE_API, params={"station_id": STATION_ID}, timeout=REQUEST_TIMEOUT).json()
+    return page, state
+
 class ViewPortApp:
     def __init__(self, root):
         self.root = root
-        self.root.title("🚀 W.E.T. System Dashboard")
+        self.root.title(f"🚀 W.E.T. System Dashboard - {STATION_ID}")
 
         # Set a light gray background
         self.root.configure(bg='#f5f5f5')  # Light gray background
@@ -109,10 +209,13 @@ class ViewPortApp:
         self.tree.heading("Details", text="Details")
         self.tree.heading("Time", text="Timestamp")
         self.tree.pack(expand=True, fill='both', pady=2)
+        self.load_older_button = tk.Button(self.scrollable_frame, text="⬇ Load Older Events", command=self.load_older_events)
+        self.load_older_button.pack(expand=False, fill='x', pady=2)
 
         # Chart Frame & Insights
         self.chart_frame.pack(expand=True, fill='both', pady=2)
         self.chart_insight_label.pack(expand=False, fill='both', pady=2)
+        self.build_chart()
 
         # ========== BUTTON CONTROLS ==========
         button_frame.pack(expand=False, fill='both', pady=5)
@@ -188,6 +291,34 @@ class ViewPortApp:
         self.station_button.config(**button_style)
         self.refresh_button.config(**button_style)
         self.clear_button.config(**button_style)
+        self.load_older_button.config(**button_style)
+
+        # ========== BACKGROUND I/O ==========
+        self.io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="viewport-io")
+        self.ui_calls = queue.Queue()  # Callables for the Tk thread, posted by background threads
+        self.io_generation = {}  # Latest call per key; older results are stale
+        self.io_futures = {}
+        self.root.after(UI_QUEUE_DRAIN_MS, self.run_ui_calls)
+        self.names = NamePool(NAME_GEN_PATH, pool_size=NAME_POOL_SIZE, refill_below=NAME_POOL_SIZE // 2,
+                              timeout=NAME_GEN_TIMEOUT).start()
+
+        # ========== LIVE UPDATES ==========
+        self.row_timestamps = {}  # Table row iid (event id) -> event timestamp, for paging cursors
+        self.table_limit = TABLE_WINDOW_ROWS  # Grows as older pages are loaded
+        self.last_event_id = 0  # Highest WaterLog id applied; pushed ids above last_event_id + 1 mean a gap
+        self.tank_state = None  # Latest /state response
+        self.chart_redraw_pending = False
+        self.chart_signature = None  # (last id, time bucket) last charted; unchanged means no refetch
+        self.history_loading = False  # While True, pushed events wait in held_events
+        self.history_backfilled = False  # Until the first backfill lands, last_event_id means nothing
+        self.held_events = []
+        self.live_updates = queue.Queue()
+
+        # Subscribe before the backfill so nothing published in between is missed
+        threading.Thread(target=self.listen_for_live_updates, daemon=True).start()
+        self.backfill_event_history()
+        self.root.after(LIVE_UPDATE_DRAIN_MS, self.drain_live_updates)
+        self.root.after(CATCH_UP_INTERVAL_MS, self.periodic_catch_up)
 
         # ========== INITIALIZATION ==========
         self.start_simulator()
@@ -204,6 +335,70 @@ class ViewPortApp:
         for _ in range(4):
             self.canvas.xview_scroll(-1, 'units')
 
+    def run_in_background(self, key, work, on_success, on_error=None):
+        """
+        Runs blocking I/O on the worker pool and hands its outcome back to the Tk loop.
+
+        Args:
+            key (str): Calls sharing a key supersede each other: a newer call cancels the
+                older one if it hasn't started, and the older result is dropped as stale.
+                None means the call is never superseded (e.g. logging an event).
+            work (callable): Runs on a worker thread; must not touch Tk widgets
+            on_success (callable): Called on the Tk thread with work's return value
+            on_error (callable): Called on the Tk thread with the exception work raised
+        """
+        generation = None
+        if key is not None:
+            previous = self.io_futures.get(key)
+            if previous is not None:
+                previous.cancel()
+            generation = self.io_generation[key] = self.io_generation.get(key, 0) + 1
+
+        fetch_time = metrics.histogram("viewport_fetch_seconds", "Background I/O time per task", task=key or "other")
+
+        def timed_work():
+            with fetch_time.time():
+                return work()
+
+        def deliver(future):
+            if future.cancelled():
+                return
+            ready_at = time.perf_counter()
+
+            def apply():
+                ui_delay.observe(time.perf_counter() - ready_at)
+                if key is not None:
+                    if self.io_generation.get(key) != generation:
+                        return  # A newer call with the same key has replaced this one
+                    self.io_futures.pop(key, None)
+                error = future.exception()
+                if error is None:
+                    on_success(future.result())
+                elif on_error:
+                    on_error(error)
+                else:
+                    print(f"❌ Background {key or 'task'} failed: {error}")
+
+            self.ui_calls.put(apply)
+
+        future = self.io_pool.submit(timed_work)
+        if key is not None:
+            self.io_futures[key] = future
+        future.add_done_callback(deliver)
+
+    def run_ui_calls(self):
+        """Runs callables posted by background threads, on the Tk thread."""
+        while True:
+            try:
+                call = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                call()
+            except Exception as e:
+                print(f"❌ Error applying background result: {e}")  # Keep draining the rest
+        self.root.after(UI_QUEUE_DRAIN_MS, self.run_ui_calls)
+
     def update_data(self):
         """Fetches and updates event data, charts, and motivational quote."""
         self.fetch_event_history()
@@ -211,81 +406,272 @@ class ViewPortApp:
         self.fetch_nearby_planet()
         self.fetch_nearby_station()
         self.update_chart()
+        self.fetch_tank_state()
 
     def fetch_event_history(self):
-        """Fetches event history from WaterLog API and dynamically updates the table."""
-        self.tree.delete(*self.tree.get_children())  # Clear previous data
+        """Fetches events logged since the last one shown and applies them to the table."""
+        if not self.history_backfilled:
+            # since_id=0 would page through the station's whole history; the backfill brings the newest
+            if "backfill" not in self.io_futures:
+                self.backfill_event_history()  # The startup backfill failed; try it again
+            return
+        since_id = self.last_event_id
+        self.history_loading = True
+        self.run_in_background("catch_up", lambda: fetch_events(since_id=since_id),
+                               self.finish_history_load, self.fail_history_load)
+
+    def backfill_event_history(self):
+        """Reloads the newest events and the tank state (startup and after a reset)."""
+        self.history_loading = True
+        self.run_in_background("backfill", load_history_snapshot, self.show_full_history, self.fail_history_load)
+
+    def show_full_history(self, snapshot):
+        """Replaces the table with the newest page of events and resets the running totals."""
+        page, state = snapshot
+        self.io_generation["older"] = self.io_generation.get("older", 0) + 1  # Drop pages for the old table
 
-        try:
-            response = requests.get(WATERLOG_API)
-            events = response.json()
+        self.tree.delete(*self.tree.get_children())  # Clear previous data
+        self.row_timestamps = {}
+        self.table_limit = TABLE_WINDOW_ROWS
+        for event in page["events"]:
+            self.insert_row(event, "end")
+        self.load_older_button.config(state="normal" if page["has_more"] else "disabled")
+
+        self.last_event_id = page["latest_id"] or 0
+        self.history_backfilled = True
+        self.show_tank_state(state)
+        self.finish_history_load([])
+
+    def insert_row(self, event, index):
+        """Adds one event to the table, keyed by its WaterLog id."""
+        iid = str(event["id"])
+        if self.tree.exists(iid):
+            return
+        details = event.get("waste_volume") or event.get("water_added") or event.get("planet_name") or "N/A"
+        self.tree.insert("", index, iid=iid, values=(event["event_type"], details, format_timestamp(int(event["timestamp"]))))
+        self.row_timestamps[iid] = event["timestamp"]
+
+    def trim_table(self):
+        """Drops the oldest rows so the table never holds more than table_limit."""
+        rows = self.tree.get_children()
+        overflow = rows[self.table_limit:]
+        if overflow:
+            self.tree.delete(*overflow)
+            for iid in overflow:
+                del self.row_timestamps[iid]
+            self.load_older_button.config(state="normal")
+
+    def load_older_events(self):
+        """Appends the page of events just older than the bottom row of the table."""
+        rows = self.tree.get_children()
+        params = {"limit": TABLE_PAGE_ROWS, "station_id": STATION_ID}
+        if rows:
+            params["cursor"] = f"{self.row_timestamps[rows[-1]]!r}:{rows[-1]}"
+        self.run_in_background(
+            "older",
+            lambda: requests.get(WATERLOG_API, params=params, timeout=REQUEST_TIMEOUT).json(),
+            self.show_older_events,
+            lambda error: print(f"❌ Error loading older events: {error}"),
+        )
 
-            if not events:
-                return  # No data available yet
+    def show_older_events(self, page):
+        for event in page["events"]:
+            self.insert_row(event, "end")
+        self.table_limit = max(self.table_limit, len(self.tree.get_children()))
+        self.load_older_button.config(state="normal" if page["has_more"] else "disabled")
+
+    def finish_history_load(self, events):
+        """Applies fetched events, then any pushed events held back while they loaded."""
+        self.history_loading = False
+        held, self.held_events = self.held_events, []
+        self.apply_events(events + held)
+
+    def fail_history_load(self, error):
+        self.status_label.config(text="❌ Error fetching event data!")
+        self.finish_history_load([])  # Don't hold pushed events back forever
+
+    def apply_events(self, events):
+        """
+        Adds newly stored events to the table, status and chart.
+
+        Args:
+            events (list): Events with WaterLog ids; ones already shown are skipped
+        """
+        started = time.perf_counter()
+        added = 0
+        for event in sorted(events, key=lambda e: e.get("id", 0)):
+            event_id = event.get("id")
+            if event_id is None or event_id <= self.last_event_id:
+                continue
+
+            self.last_event_id = event_id
+            self.insert_row(event, 0)  # Newest on top
+            added += 1
+
+        if added:
+            self.trim_table()
+            self.update_status()
+            self.schedule_chart_redraw()
+            events_applied.inc(added)
+            table_update.observe(time.perf_counter() - started)
+
+    def fetch_tank_state(self):
+        """Fetches the live tank state (level, totals) maintained by WaterLog."""
+        self.run_in_background(
+            "state",
+            lambda: requests.get(WATERLOG_STATE_API, params={"station_id": STATION_ID}, timeout=REQUEST_TIMEOUT).json(),
+            self.show_tank_state,
+            lambda error: print(f"❌ Error fetching tank state: {error}"),
+        )
 
-            # Show all events
-            for event in events:
-                details = event.get("waste_volume") or event.get("water_added") or event.get("planet_name") or "N/A"
-                timestamp = datetime.fromtimestamp(event["timestamp"]).strftime('%Y-%m-%d %H:%M:%S')
-                self.tree.insert("", "end", values=(event["event_type"], details, timestamp))
+    def show_tank_state(self, state):
+        self.tank_state = state
+        self.update_status()
+
+    def update_status(self):
+        """
+        Shows the flush total and the tank level in the status panel.
+
+        Both come from /state only (refetched after each burst of pushed events):
+        counting pushed flushes on top would count the ones /state already includes twice.
+        """
+        if self.tank_state:
+            state = self.tank_state
+            flushes = state["flushes"]
+            level = f"{state['level']:.0f}/{state['capacity']:.0f} ({state['level_fraction']:.0%}) {state['status']}"
+        else:
+            flushes = level = "Loading..."
+        self.status_label.config(text=f"System Status: Running\nTotal Flushes: {flushes}\nWater Level: {level}")
+
+    def water_is_low(self):
+        return bool(self.tank_state) and self.tank_state["status"] != "OK"
+
+    def listen_for_live_updates(self):
+        """Background thread: receives events LiveTrack republishes and queues this station's for the Tk loop."""
+        socket = zmq.Context.instance().socket(zmq.SUB)
+        socket.connect(LIVE_UPDATES_ENDPOINT)
+        socket.setsockopt_string(zmq.SUBSCRIBE, "")
+
+        while True:
+            try:
+                events = [event for event in event_codec.decode_events(socket.recv())
+                          if event.get("station_id", event_codec.DEFAULT_STATION_ID) == STATION_ID]
+            except event_codec.CodecError as e:
+                print(f"⚠️ Dropped undecodable live update: {e}")
+                continue
+            if events:
+                live_events.inc(len(events))
+                self.live_updates.put(events)
+
+    def drain_live_updates(self):
+        """Applies pushed events on the Tk thread, filling any id gap from /history first."""
+        try:
+            while True:
+                events = self.live_updates.get_nowait()
+                if self.history_loading:
+                    self.held_events.extend(events)
+                    continue
+
+                ids = [e["id"] for e in events if "id" in e]
+                if ids and min(ids) > self.last_event_id + 1:
+                    # Missed some (e.g. logged over HTTP); catch up by id, then apply these
+                    self.held_events.extend(events)
+                    self.fetch_event_history()
+                else:
+                    self.apply_events(events)
+        except queue.Empty:
+            pass
+
+        self.root.after(LIVE_UPDATE_DRAIN_MS, self.drain_live_updates)
+
+    def periodic_catch_up(self):
+        """Picks up events logged by clients that bypass LiveTrack, with a cheap since_id query."""
+        self.fetch_event_history()
+        self.root.after(CATCH_UP_INTERVAL_MS, self.periodic_catch_up)
 
-            # Update system status based on latest data
-            flushes = sum(1 for e in events if e["event_type"] == "flush")
-            self.status_label.config(text=f"System Status: Running\nTotal Flushes: {flushes}\nWater Level: OK")
+    def schedule_chart_redraw(self):
+        """Coalesces bursts of pushed events into a single chart redraw and tank state refresh."""
+        if not self.chart_redraw_pending:
+            self.chart_redraw_pending = True
+            self.root.after(CHART_REDRAW_DELAY_MS, self.refresh_after_events)
 
-        except Exception as e:
-            self.status_label.config(text="❌ Error fetching event data!")
+    def refresh_after_events(self):
+        self.update_chart()
+        self.fetch_tank_state()
+
+    def fetch_name(self, flag, on_success, on_error):
+        """Shows a pooled name right away, or waits for the pool in the background if it ran dry."""
+        name = self.names.take(flag)
+        if name is not None:
+            self.io_generation[flag] = self.io_generation.get(flag, 0) + 1  # A pending wait is now stale
+            on_success(name)
+            return
+        self.run_in_background(
+            flag,
+            lambda: self.names.get(flag, NAME_GEN_TIMEOUT),
+            on_success,
+            lambda error: on_error(),
+        )
 
-        # Auto-refresh every 5 seconds
-        self.root.after(5000, self.fetch_event_history)
-    
     def fetch_motivational_quote(self):
         """Fetches a new motivational quote and updates the display."""
-        try:
-            quote = subprocess.check_output(["python3", NAME_GEN_PATH, "--quote"], text=True).strip()
-            self.quote_label.config(text=f"🌟 {quote} 🌟")
-        except Exception:
-            self.quote_label.config(text="🚀 Keep pushing forward, astronaut! 🌌")
-        
-        self.root.update_idletasks()  # Force UI update
+        self.fetch_name(
+            "--quote",
+            lambda quote: self.quote_label.config(text=f"🌟 {quote} 🌟"),
+            lambda: self.quote_label.config(text="🚀 Keep pushing forward, astronaut! 🌌"),
+        )
 
     def fetch_nearby_planet(self):
-        """Fetches a random planet and updates the display immediately."""
-        try:
-            planet = subprocess.check_output(["python3", NAME_GEN_PATH, "--planet"], text=True).strip()
-            self.planet_label.config(text=f"🪐 {planet} has rich water resources! Consider refilling the system there.")
-        except Exception:
-            self.planet_label.config(text="🪐 Unknown planet detected. Water status uncertain.")
-        
-        self.root.update_idletasks()  # Force UI refresh
+        """Fetches a random planet and updates the display."""
+        self.fetch_name(
+            "--planet",
+            lambda planet: self.planet_label.config(
+                text=f"🪐 {planet} has rich water resources! Water is low, refill the system there now." if self.water_is_low()
+                else f"🪐 {planet} has rich water resources! Consider refilling the system there."),
+            lambda: self.planet_label.config(text="🪐 Unknown planet detected. Water status uncertain."),
+        )
 
     def fetch_nearby_station(self):
-        """Fetches a nearby station and updates the display immediately."""
-        try:
-            station = subprocess.check_output(["python3", NAME_GEN_PATH, "--station"], text=True).strip()
-            self.station_label.config(text=f"🏠 {station} offers expert plumbing repairs for your space toilet!")
-        except Exception:
-            self.station_label.config(text="🏠 No plumbing stations nearby. Proceed with caution!")
-        
-        self.root.update_idletasks()  # Force UI refresh
+        """Fetches a nearby station and updates the display."""
+        self.fetch_name(
+            "--station",
+            lambda station: self.station_label.config(text=f"🏠 {station} offers expert plumbing repairs for your space toilet!"),
+            lambda: self.station_label.config(text="🏠 No plumbing stations nearby. Proceed with caution!"),
+        )
+
+    def post_event(self, event_data, on_logged, description):
+        """Logs one event with WaterLog in the background, calling on_logged on success."""
+        def done(response):
+            if response.status_code == 201:
+                print(f"✅ {description} event logged successfully.")
+                on_logged()
+            else:
+                print(f"❌ Failed to log {description.lower()} event. Response: {response.text}")
+
+        self.run_in_background(
+            None,
+            lambda: requests.post(LIVE_TRACK_API, json=event_data, timeout=REQUEST_TIMEOUT),
+            done,
+            lambda error: print(f"❌ Failed to log {description.lower()} event: {error}"),
+        )
 
     def send_flush_event(self):
         """Manually logs a flush event and temporarily changes the image."""
         event_data = {
             "event_type": "flush",
             "waste_volume": 3,
-            "timestamp": time.time()
+            "timestamp": time.time(),
+            "event_id": event_codec.new_event_id(),
+            "station_id": STATION_ID
         }
-        response = requests.post(LIVE_TRACK_API, json=event_data)
-
-        if response.status_code == 201:
-            print("✅ Flush event logged successfully.")
-            self.toilet_img = ImageTk.PhotoImage(Image.open(self.poop_img_path).resize((150, 150)))
-            self.img_label.config(image=self.toilet_img)
-            self.root.after(2000, self.reset_toilet_image)  # Reset after 2 seconds
-            self.update_data()  # Refresh the dashboard
-        else:
-            print(f"❌ Failed to log flush event. Response: {response.text}")
+        self.post_event(event_data, self.show_flush, "Flush")
+
+    def show_flush(self):
+        """Shows the poop image for 2 seconds after a flush and refreshes the dashboard."""
+        self.toilet_img = ImageTk.PhotoImage(Image.open(self.poop_img_path).resize((150, 150)))
+        self.img_label.config(image=self.toilet_img)
+        self.root.after(2000, self.reset_toilet_image)  # Reset after 2 seconds
+        self.update_data()  # Refresh the dashboard
 
     def reset_toilet_image(self):
         """Resets the image back to the toilet after showing the poop image."""
@@ -297,14 +683,11 @@ class ViewPortApp:
         event_data = {
             "event_type": "water_refill",
             "water_added": 20,  # Example value
-            "timestamp": time.time()  # ✅ Ensure timestamp is included
+            "timestamp": time.time(),  # ✅ Ensure timestamp is included
+            "event_id": event_codec.new_event_id(),
+            "station_id": STATION_ID
         }
-        response = requests.post(LIVE_TRACK_API, json=event_data)
-        if response.status_code == 201:
-            print("✅ Water refill event logged successfully.")
-            self.update_data()  # Refresh the dashboard
-        else:
-            print(f"❌ Failed to log water refill event. Response: {response.text}")
+        self.post_event(event_data, self.update_data, "Water refill")
 
     def toggle_simulator(self):
         """Pauses or resumes the simulator process without freezing GUI."""
@@ -331,7 +714,7 @@ class ViewPortApp:
                 proc.terminate()
                 proc.wait(timeout=3)
 
-        self.simulator_status.set("▶ Resume Simulator")
+        self.ui_calls.put(lambda: self.simulator_status.set("▶ Resume Simulator"))  # Tk calls belong on the Tk thread
         print("✅ Simulator Fully Paused.")
         global simulator_process
         simulator_process = None
@@ -350,141 +733,164 @@ class ViewPortApp:
         self.schedule_dashboard_updates()  # Start updating the dashboard
 
     def schedule_dashboard_updates(self):
-        """Schedules regular updates for the dashboard when the simulator is running."""
+        """Schedules regular name-generator refreshes while the simulator is running (events arrive by push)."""
         if simulator_process:
-            self.update_data()
+            self.fetch_motivational_quote()
+            self.fetch_nearby_planet()
+            self.fetch_nearby_station()
             # Schedule the next update in 5 seconds
             self.root.after(5000, self.schedule_dashboard_updates)
 
     def clear_database(self):
-        """Sends a request to WaterLog API to clear all stored events."""
-        response = requests.post("http://127.0.0.1:5001/clear")
-        
-        if response.status_code == 200:
-            print("✅ Database successfully cleared.")
-            self.update_data()  # Refresh the UI after clearing
-        else:
-            print("❌ Failed to clear database. Response:", response.text)
+        """Sends a request to WaterLog API to clear this station's stored events."""
+        def done(response):
+            if response.status_code == 200:
+                print("✅ Database successfully cleared.")
+                self.backfill_event_history()  # Drop the cleared events from the table
+                self.update_data()  # Refresh the UI after clearing
+            else:
+                print("❌ Failed to clear database. Response:", response.text)
+
+        self.run_in_background(
+            None,
+            lambda: requests.post(WATERLOG_CLEAR_API, params={"station_id": STATION_ID}, timeout=REQUEST_TIMEOUT),
+            done,
+            lambda error: print(f"❌ Failed to clear database: {error}"),
+        )
+
+    def import_events(self, events, description):
+        """Sends events to WaterLog's bulk import in one request (in the background), then refreshes the dashboard."""
+        body = "".join(json.dumps(event) + "\n" for event in events)
+
+        def done(response):
+            if response.status_code == 201:
+                print(f"✅ {description} simulated successfully ({response.json()['imported']} events).")
+                self.update_data()  # Refresh the dashboard
+            else:
+                print(f"❌ Failed to simulate {description.lower()}. Response: {response.text}")
+
+        self.run_in_background(
+            None,
+            lambda: requests.post(WATERLOG_IMPORT_API, data=body, headers={"Content-Type": "application/x-ndjson"},
+                                  timeout=REQUEST_TIMEOUT),
+            done,
+            lambda error: print(f"❌ Error simulating {description.lower()}: {error}"),
+        )
 
     def full_refill_and_balance(self):
-        """Simulates a full refill by sending multiple water refill events with recent timestamps."""
-        try:
-            # Simulate 50 water refill events
-            for i in range(50):
-                event_data = {
-                    "event_type": "water_refill",
-                    "water_added": 20,  # Example value
-                    "timestamp": time.time() - i * 60  # Each event 1 minute apart
-                }
-                response = requests.post(LIVE_TRACK_API, json=event_data)
-                if response.status_code != 201:
-                    print(f"❌ Failed to log water refill event. Response: {response.text}")
-                    break
-            print("✅ Full refill simulated successfully.")
-            self.update_data()  # Refresh the dashboard
-        except Exception as e:
-            print(f"❌ Error simulating full refill: {e}")
+        """Simulates a full refill by importing 50 water refill events with recent timestamps."""
+        now = time.time()
+        self.import_events([{
+            "event_type": "water_refill",
+            "water_added": 20,  # Example value
+            "timestamp": now - i * 60,  # Each event 1 minute apart
+            "event_id": event_codec.new_event_id(),
+            "station_id": STATION_ID
+        } for i in range(50)], "Full refill")
+
+    def build_chart(self):
+        """Creates the chart figure and summary labels once; update_chart only changes their data."""
+        self.chart_figure, self.chart_axes = plt.subplots(figsize=(6, 3))
+        self.ratio_line, = self.chart_axes.plot([], [], 'm-', label='Flush-to-Refill Ratio')
+        self.chart_axes.set_title('Flush-to-Refill Ratio Over Time')
+        self.chart_axes.set_ylabel('Ratio')
+        self.chart_axes.legend()
+
+        # Hide x-axis labels
+        self.chart_axes.tick_params(axis='x', labelbottom=False)
+
+        # Embed the chart
+        self.chart_canvas = FigureCanvasTkAgg(self.chart_figure, master=self.chart_frame)
+        self.chart_redraw_requested_at = None
+        self.chart_canvas.mpl_connect("draw_event", self.chart_drawn)
+        self.chart_canvas.draw()
+        self.chart_canvas.get_tk_widget().pack()
+
+        # Total counts and ratio below the chart
+        self.flush_total_label = tk.Label(self.chart_frame, text='', font=("Arial", 10))
+        self.flush_total_label.pack()
+        self.refill_total_label = tk.Label(self.chart_frame, text='', font=("Arial", 10))
+        self.refill_total_label.pack()
+        self.ratio_label = tk.Label(self.chart_frame, text='', font=("Arial", 10, "bold"))
+        self.ratio_label.pack()
+        self.ratio_warning_label = tk.Label(self.chart_frame, text='', font=("Arial", 10, "bold"))
+        self.ratio_warning_label.pack()
 
     def update_chart(self):
-        """Fetches event data and updates the line chart with trend insights."""
-        try:
-            response = requests.get(WATERLOG_API)
-            events = response.json()
-
-            if not events:
-                print("⚠️ No event data available for chart.")
-                return  # Avoid processing empty data
-
-            # Filter events to only include those from the last 24 hours
-            one_day_ago = datetime.now() - timedelta(days=1)
-            recent_events = [event for event in events if datetime.fromtimestamp(event['timestamp']) >= one_day_ago]
-
-            event_counts = {"Flushes": 0, "Water Refills": 0}
-            ratios = []
-            ratio_times = []
-            flush_count = 0
-            refill_count = 0
-
-            for event in recent_events:
-                timestamp = datetime.fromtimestamp(event['timestamp'])
-                
-                if event['event_type'] == 'flush':
-                    flush_count += 1
-                    event_counts["Flushes"] += 1
-                elif event['event_type'] == 'water_refill':
-                    refill_count += 1
-                    event_counts["Water Refills"] += 1
-
-                if refill_count > 0:
-                    ratios.append(flush_count / refill_count)
-                    ratio_times.append(timestamp)
-
-            # Clear existing chart
-            for widget in self.chart_frame.winfo_children():
-                widget.destroy()
-
-            if not ratio_times or not ratios:
-                print("⚠️ No valid ratio data for chart. Skipping plot.")
-                return  # Avoid plotting empty charts
-
-            # Create ratio line chart
-            fig, ax = plt.subplots(figsize=(6, 3))
-            ax.plot(ratio_times, ratios, 'm-', label='Flush-to-Refill Ratio')
-            ax.set_title('Flush-to-Refill Ratio Over Time')
-            ax.set_ylabel('Ratio')
-            ax.legend()
-
-            # Hide x-axis labels
-            ax.xaxis.set_ticklabels([])
-
-            # Embed the chart
-            canvas = FigureCanvasTkAgg(fig, master=self.chart_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack()
-
-            # Add total counts and ratio below the chart
-            flush_total_label = tk.Label(self.chart_frame, text=f'Total Flushes: {event_counts["Flushes"]}', font=("Arial", 10))
-            flush_total_label.pack()
-            refill_total_label = tk.Label(self.chart_frame, text=f'Total Water Refills: {event_counts["Water Refills"]}', font=("Arial", 10))
-            refill_total_label.pack()
-
-            # Calculate and display the flush-to-refill ratio
-            if refill_count > 0:
-                ratio = flush_count / refill_count
-                ratio_label = tk.Label(self.chart_frame, text=f'Flush-to-Refill Ratio: {ratio:.2f}', font=("Arial", 10, "bold"))
-                ratio_label.pack()
-
-                # Add warning brackets based on ratio
-                if ratio > 2.0:
-                    warning_label = tk.Label(self.chart_frame, text='⚠️ High Flush-to-Refill Ratio! Consider refilling.', font=("Arial", 10, "bold"), fg='red')
-                    warning_label.pack()
-                elif ratio > 0.5 and ratio < 2.0:
-                    warning_label = tk.Label(self.chart_frame, text='You flush and fill at a good rate!', font=("Arial", 10, "bold"), fg='green')
-                    warning_label.pack()
-                elif ratio < 0.5:
-                    warning_label = tk.Label(self.chart_frame, text='⚠️ Low Flush-to-Refill Ratio! Consider flushing.', font=("Arial", 10, "bold"), fg='orange')
-                    warning_label.pack()
-
-        except Exception as e:
-            print(f"❌ Error updating chart: {e}")
+        """Fetches bucketed flush/refill stats from WaterLog for the chart, unless nothing changed."""
+        self.chart_redraw_pending = False
+
+        # New events change the data, and so does the window sliding into a new bucket
+        signature = (self.last_event_id, int(time.time() // CHART_RESOLUTION))
+        if signature == self.chart_signature:
+            return
+
+        self.run_in_background(
+            "stats",
+            lambda: requests.get(WATERLOG_STATS_API, params={"window": CHART_WINDOW, "resolution": CHART_RESOLUTION,
+                                                             "station_id": STATION_ID}, timeout=REQUEST_TIMEOUT).json(),
+            lambda stats: self.show_stats(stats, signature),
+            lambda error: print(f"❌ Error updating chart: {error}"),
+        )
+
+    def chart_drawn(self, event):
+        """Records how long a requested chart redraw took to reach the screen (matplotlib draw_event)."""
+        if self.chart_redraw_requested_at is not None:
+            chart_redraw.observe(time.perf_counter() - self.chart_redraw_requested_at)
+            self.chart_redraw_requested_at = None
+
+    def show_stats(self, stats, signature):
+        """Updates the line chart and trend insights from a /stats response (buckets oldest first)."""
+        self.chart_signature = signature
+        totals = stats["totals"]
+
+        if not stats["buckets"]:
+            print("⚠️ No event data available for chart.")
+            return  # Avoid processing empty data
+
+        ratio_times = [bucket["start"] for bucket in stats["buckets"] if bucket["ratio"] is not None]
+        ratios = [bucket["ratio"] for bucket in stats["buckets"] if bucket["ratio"] is not None]
+        if not ratios:
+            print("⚠️ No valid ratio data for chart. Skipping plot.")
+
+        # Update the existing line in place and let Tk repaint when idle
+        self.ratio_line.set_data(ratio_times, ratios)
+        self.chart_axes.relim()
+        self.chart_axes.autoscale_view()
+        self.chart_redraw_requested_at = self.chart_redraw_requested_at or time.perf_counter()
+        self.chart_canvas.draw_idle()
+
+        self.flush_total_label.config(text=f'Total Flushes: {totals["flushes"]}')
+        self.refill_total_label.config(text=f'Total Water Refills: {totals["refills"]}')
+
+        # Display the flush-to-refill ratio
+        ratio = totals["ratio"]
+        if ratio is not None:
+            self.ratio_label.config(text=f'Flush-to-Refill Ratio: {ratio:.2f}')
+
+            # Add warning brackets based on ratio
+            if ratio > 2.0:
+                self.ratio_warning_label.config(text='⚠️ High Flush-to-Refill Ratio! Consider refilling.', fg='red')
+            elif ratio > 0.5 and ratio < 2.0:
+                self.ratio_warning_label.config(text='You flush and fill at a good rate!', fg='green')
+            elif ratio < 0.5:
+                self.ratio_warning_label.config(text='⚠️ Low Flush-to-Refill Ratio! Consider flushing.', fg='orange')
+            else:
+                self.ratio_warning_label.config(text='')
+        else:
+            self.ratio_label.config(text='')
+            self.ratio_warning_label.config(text='')
 
     def simulate_massive_flush(self):
-        """Simulates a massive waste flush by sending multiple flush events with recent timestamps."""
-        try:
-            for i in range(50):  # Simulate 50 flush events
-                event_data = {
-                    "event_type": "flush",
-                    "waste_volume": 3,
-                    "timestamp": time.time() - i * 60  # Each event 1 minute apart
-                }
-                response = requests.post(LIVE_TRACK_API, json=event_data)
-                if response.status_code != 201:
-                    print(f"❌ Failed to log flush event. Response: {response.text}")
-                    break
-            print("✅ Massive waste flush simulated successfully.")
-            self.update_data()  # Refresh the dashboard
-        except Exception as e:
-            print(f"❌ Error simulating massive waste flush: {e}")
+        """Simulates a massive waste flush by importing 50 flush events with recent timestamps."""
+        now = time.time()
+        self.import_events([{
+            "event_type": "flush",
+            "waste_volume": 3,
+            "timestamp": now - i * 60,  # Each event 1 minute apart
+            "event_id": event_codec.new_event_id(),
+            "station_id": STATION_ID
+        } for i in range(50)], "Massive waste flush")
 
     def open_astronaut_readme(self):
         """Opens the astronaut-specific guide file in a new Tkinter window."""
@@ -525,8 +931,10 @@ class ViewPortApp:
 
 
 if __name__ == "__main__":
+    metrics.serve(METRICS_PORT)
     root = tk.Tk()
     app = ViewPortApp(root)
     root.mainloop()
+    app.names.close()
 
 
@@ -0,0 +1,334 @@
+"""
+Bulk Import for WaterLog
+
+- Streams CSV or NDJSON event files (optionally gzipped, e.g. from /export)
+  into the events table without holding the file in memory
+- Routes every row to its station's shard (see shards.py), creating shards on
+  first use; each shard gets its own connection and transactions
+- Inserts with executemany in large transactions on its own connection; the
+  rollups and the tank state are updated in the same transactions, just as
+  the group-commit writer does for live events
+- Keeps every index up to date by default, so WaterLog may keep serving
+  during an import; with --defer-indexes the non-unique events indexes are
+  dropped for the load and rebuilt once at the end (WaterLog recreates them on
+  startup if an import is interrupted), which is refused while anything else
+  has a database open, since /history would lose its indexes mid-load. The
+  unique event_id index always stays, so rows whose event_id is already
+  stored are skipped
+- Reports rows/sec, duplicates and invalid rows
+- HTTP imports (/import) use import_through_writer instead: the same parsing
+  and validation, but the rows go to the live writer in chunks, so the API
+  keeps a single writer per shard and never touches the indexes
+
+CSV files need a header row naming the event fields (event_type, timestamp,
+waste_volume, water_added, planet_name, event_id, station_id, astronaut_id);
+other columns such as id are ignored.
+
+Import files by hand (WaterLog may keep running; live writes wait between chunks):
+    python3 microservices/WaterLog/bulk_import.py station_b.csv more_events.ndjson.gz
+Faster loads of large files, with WaterLog stopped:
+    python3 microservices/WaterLog/bulk_import.py --defer-indexes events.ndjson
+"""
+
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+
+# Shared modules (metrics, event codec) live in microservices/Common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Common"))
+
+from group_writer import INSERT_EVENT_SQL, STATION_ID_INDEX
+import rollups
+import tank_state
+
+FORMATS = ("csv", "ndjson")
+CHUNK_ROWS = 50000  # rows per transaction
+WRITER_CHUNK_ROWS = 5000  # rows per write request when importing through the live writer
+MAX_REPORTED_INVALID = 10  # invalid line numbers listed in the report
+
+# CSV cells are strings; these fields are converted, empty cells become None
+CSV_NUMBER_FIELDS = {"waste_volume": int, "water_added": int, "timestamp": float}
+
+
+def detect_format(name):
+    """Guesses the format from a file name (".csv", ".ndjson", ".jsonl", optionally ".gz")."""
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "csv" if name.lower().endswith(".csv") else "ndjson"
+
+
+def open_text(path):
+    """Opens a (possibly gzipped) file for reading as text."""
+    return gzip.open(path, "rt", newline="") if path.endswith(".gz") else open(path, newline="")
+
+
+def text_lines(binary, compressed=False):
+    """
+    Yields the lines of a binary stream (e.g. an HTTP request body) as text for read_events.
+
+    Only readline() is needed, which server request bodies provide even where they aren't full io objects.
+    """
+    if compressed:
+        binary = gzip.GzipFile(fileobj=binary)
+    for line in iter(binary.readline, b""):
+        yield line.decode("utf-8")
+
+
+def csv_event(record):
+    """
+    Converts a CSV record to an event, casting the CSV_NUMBER_FIELDS.
+
+    Raises:
+        ValueError: A number cell doesn't parse, or a volume isn't a whole number
+    """
+    event = {}
+    for field, value in record.items():
+        if field is None or value is None or value == "":
+            continue  # Extra cells without a header, or an empty cell
+        cast = CSV_NUMBER_FIELDS.get(field)
+        if cast is int:
+            number = float(value)  # Accepts "3.0" as written by spreadsheets
+            if not number.is_integer():  # Also false for inf and nan
+                raise ValueError(f"{field} must be a whole number, got {value!r}")
+            event[field] = int(number)
+        else:
+            event[field] = cast(value) if cast else value
+    return event
+
+
+def read_events(stream, fmt):
+    """
+    Yields (line number, event) from a text stream; unparseable lines yield a None event.
+
+    Args:
+        stream: Text file object (or any iterable of text lines)
+        fmt (str): "csv" or "ndjson"
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            try:
+                yield reader.line_num, csv_event(record)
+            except (ValueError, OverflowError):
+                yield reader.line_num, None
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+def secondary_indexes(conn):
+    """Returns (name, sql) of the events indexes that can be rebuilt after a load (not the unique ones)."""
+    unique = {row[1] for row in conn.execute("PRAGMA index_list(events)") if row[2]}
+    return [(name, sql) for name, sql in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'events' AND sql IS NOT NULL")
+        if name not in unique]
+
+
+def ensure_unused(path):
+    """
+    Makes sure no other connection (e.g. a running WaterLog) has the database at path open.
+
+    Raises:
+        sqlite3.OperationalError: The database is in use
+    """
+    conn = sqlite3.connect(path, isolation_level=None, timeout=0)
+    try:
+        # An exclusive lock is only granted while no other connection, idle or not, is open (WAL mode)
+        conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+        conn.execute("BEGIN EXCLUSIVE")
+        conn.execute("ROLLBACK")
+    except sqlite3.OperationalError:
+        raise sqlite3.OperationalError(f"{path} is in use (is WaterLog running?); stop it to defer indexes, "
+                                       "or import with the indexes kept") from None
+    finally:
+        conn.close()
+
+
+def new_report():
+    """Returns an empty import report (filled in by import_events and import_through_writer)."""
+    return {"rows": 0, "imported": 0, "duplicates": 0, "invalid": 0, "invalid_lines": [], "stations": {}}
+
+
+def valid_chunks(events, event_to_row, chunk_rows, report):
+    """
+    Yields lists of (event, row) for the valid events, chunk_rows input lines at a time,
+    counting invalid ones (and their first line numbers) in report.
+    """
+    events = iter(events)
+    while True:
+        chunk = list(itertools.islice(events, chunk_rows))
+        if not chunk:
+            return
+        valid = []
+        for line_number, event in chunk:
+            row = event_to_row(event) if event is not None else None
+            if row is None:
+                report["invalid"] += 1
+                if len(report["invalid_lines"]) < MAX_REPORTED_INVALID:
+                    report["invalid_lines"].append(line_number)
+            else:
+                valid.append((event, row))
+        report["rows"] += len(valid)
+        yield valid
+
+
+def finish_report(report, started):
+    report["duplicates"] = report["rows"] - report["imported"]
+    report["seconds"] = time.perf_counter() - started
+    report["rows_per_sec"] = report["rows"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+def import_through_writer(events, event_to_row, write, chunk_rows=WRITER_CHUNK_ROWS, report=None):
+    """
+    Validates events and hands them to the live writer in chunks, one write per station per chunk.
+
+    Args:
+        events (iterable): (line number, event dict or None) pairs, e.g. from read_events
+        event_to_row (callable): Validates an event and returns its insert row (None if invalid)
+        write (callable): Stores one station's (events, rows) and returns the writer's receipt
+            (count, duplicates); may raise whatever the writer raises
+        chunk_rows (int): Input lines per chunk
+        report (dict): Report to fill in (see new_report); pass one in to keep the
+            counts of the chunks stored before an error
+
+    Returns:
+        dict: Same fields as import_events' report
+    """
+    started = time.perf_counter()
+    report = new_report() if report is None else report
+    for chunk in valid_chunks(events, event_to_row, chunk_rows, report):
+        by_station = {}
+        for event, row in chunk:
+            by_station.setdefault(row[STATION_ID_INDEX], []).append((event, row))
+        for station_id, pairs in by_station.items():
+            receipt = write([event for event, _ in pairs], [row for _, row in pairs])
+            imported = receipt["count"] - receipt["duplicates"]
+            report["imported"] += imported
+            report["stations"][station_id] = report["stations"].get(station_id, 0) + imported
+    return finish_report(report, started)
+
+
+def import_events(registry, events, event_to_row, chunk_rows=CHUNK_ROWS, defer_indexes=False, busy_timeout=5.0):
+    """
+    Inserts events in chunked transactions per station shard and returns an import report.
+
+    Args:
+        registry (shards.StationRegistry): Resolves (and creates) each station's shard
+        events (iterable): (line number, event dict or None) pairs, e.g. from read_events
+        event_to_row (callable): Validates an event and returns its insert row (None if invalid)
+        chunk_rows (int): Rows per transaction
+        defer_indexes (bool): Drop the non-unique events indexes during the load and rebuild them after;
+            only while nothing else has the databases open
+        busy_timeout (float): Seconds to wait for the write lock held by the live writer
+
+    Returns:
+        dict: rows, imported, duplicates, invalid (+ the first invalid line numbers),
+            imported per station, seconds, rows_per_sec
+
+    Raises:
+        sqlite3.OperationalError: defer_indexes was asked for while a database is in use (see ensure_unused)
+    """
+    started = time.perf_counter()
+    report = new_report()
+    if defer_indexes:
+        ensure_unused(registry.database)
+    connections = {}  # station_id -> (connection, deferred indexes)
+
+    def shard(station_id):
+        if station_id not in connections:
+            path = registry.register(station_id)
+            if defer_indexes:
+                ensure_unused(path)
+            conn = sqlite3.connect(path, isolation_level=None, timeout=busy_timeout)
+            deferred = secondary_indexes(conn) if defer_indexes else []
+            connections[station_id] = (conn, deferred)
+            for name, _ in deferred:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+        return connections[station_id][0]
+
+    try:
+        for chunk in valid_chunks(events, event_to_row, chunk_rows, report):
+            by_station = {}
+            for _, row in chunk:
+                by_station.setdefault(row[STATION_ID_INDEX], []).append(row)
+            for station_id, station_rows in by_station.items():
+                imported = insert_chunk(shard(station_id), station_rows)
+                report["imported"] += imported
+                report["stations"][station_id] = report["stations"].get(station_id, 0) + imported
+    finally:
+        # Rebuilt even if the load failed part way, so no table is left without its indexes
+        for conn, deferred in connections.values():
+            for _, sql in deferred:
+                conn.execute(sql.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+            conn.close()
+
+    return finish_report(report, started)
+
+
+def insert_chunk(conn, rows):
+    """Inserts rows and folds the stored ones into the rollups and tank state in one transaction; returns how many were stored."""
+    # Taking the write lock up front means every id above `before` is ours
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        conn.executemany(INSERT_EVENT_SQL, rows)
+        stored = conn.execute("SELECT event_type, waste_volume, water_added, id FROM events WHERE id > ? ORDER BY id",
+                              (before,)).fetchall()
+        if stored:
+            rollups.apply_since(conn, before)
+            tank_state.apply_rows(conn, stored, stored[-1][3], time.time())
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(stored)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import CSV or NDJSON event files into WaterLog")
+    parser.add_argument("files", nargs="+", help="event files (.csv, .ndjson or .jsonl, optionally .gz)")
+    parser.add_argument("--database", default="data/water_log.db",
+                        help="path to the main WaterLog database (other stations' shards live next to it)")
+    parser.add_argument("--format", choices=FORMATS, help="file format (default: from each file's extension)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows per transaction")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="drop the non-unique indexes for the load and rebuild them at the end "
+                             "(faster; refused while WaterLog has the database open)")
+    args = parser.parse_args()
+
+    import water_log  # Schema and event validation; imported here since water_log imports this module
+
+    water_log.DATABASE = args.database
+    water_log.init_db()
+
+    failed = False
+    for path in args.files:
+        try:
+            with open_text(path) as stream:
+                report = import_events(water_log.get_registry(), read_events(stream, args.format or detect_format(path)),
+                                       water_log.event_to_row, args.chunk_rows, args.defer_indexes)
+        except (OSError, ValueError, sqlite3.Error) as e:  # ValueError: undecodable text, station limit
+            print(f"❌ {path}: {e}")
+            failed = True
+            continue
+
+        print(f"✅ {path}: imported {report['imported']} of {report['rows']} rows "
+              f"({report['duplicates']} duplicates, {report['invalid']} invalid) "
+              f"in {report['seconds']:.2f}s, {report['rows_per_sec']:.0f} rows/sec")
+        if report["invalid_lines"]:
+            print(f"⚠️ First invalid lines: {', '.join(map(str, report['invalid_lines']))}")
+
+    sys.exit(1 if failed else 0)
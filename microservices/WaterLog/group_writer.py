@@ -0,0 +1,392 @@
+"""
+Group-Commit Writer for WaterLog
+
+- Owns the one long-lived SQLite connection used for inserts (WAL mode)
+- Request handlers hand their events over through a bounded queue
+- Events are committed in groups (by event count or a small latency budget),
+  so many requests share a single fsync
+- Each caller is released only once the group holding its events is durable
+- The per-minute and per-hour rollups and the tank state are updated in the
+  same transaction (see rollups.py and tank_state.py)
+- Events carrying a producer event_id are stored at most once: a cache of
+  recently seen ids catches most retries before they reach SQLite, and the
+  unique index on events.event_id catches the rest
+- Records commit times, group sizes and queue-to-commit latency in the
+  process's metrics (see metrics.py)
+"""
+
+import collections
+import queue
+import sqlite3
+import threading
+import time
+
+import metrics
+import rollups
+import tank_state
+
+# logged_at stamps the commit time (ms resolution) in SQL, so rows need no extra Python work.
+# Rows whose event_id is already stored are skipped by the unique index.
+INSERT_EVENT_SQL = '''
+    INSERT OR IGNORE INTO events (event_type, waste_volume, water_added, planet_name, timestamp, event_id,
+                                  station_id, astronaut_id, logged_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, (julianday('now') - 2440587.5) * 86400.0)
+'''
+EVENT_ID_INDEX = 5  # position of event_id in a row
+STATION_ID_INDEX = 6  # position of station_id in a row (selects the shard, see shards.py)
+
+SYNC_MODES = ("FULL", "NORMAL")
+
+
+class WriteRequest:
+    """One caller's rows; acknowledged together once their group commits."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = threading.Event()
+        self.error = None
+        self.first_id = None  # id of the first inserted row; inserted rows get contiguous ids
+        self.ids = []  # one id per row: the new id, or the stored id for a duplicate
+        self.inserted = []  # the rows actually inserted (rows minus duplicates)
+        self.queued_at = time.perf_counter()
+
+    @property
+    def duplicates(self):
+        return len(self.rows) - len(self.inserted)
+
+    def receipt(self):
+        """
+        Summarizes the committed request for the caller's reply.
+
+        Without duplicates the ids are first_id .. first_id + count - 1; otherwise
+        the per-row ids are included as well.
+        """
+        receipt = {"first_id": self.first_id, "count": len(self.rows), "duplicates": self.duplicates}
+        if self.duplicates:
+            receipt["ids"] = self.ids
+        return receipt
+
+
+class GroupCommitWriter:
+    """
+    Serializes all event inserts through a single writer thread.
+
+    Args:
+        database (str): Path to the SQLite database file
+        sync_mode (str): "FULL" (fsync on every commit) or "NORMAL" (WAL only
+            syncs at checkpoints; a power loss may drop the last commits)
+        max_group_events (int): Commit as soon as a group holds this many events
+        max_delay (float): Seconds to wait for more events before committing
+        queue_size (int): Pending requests allowed before callers are blocked
+        dedup_cache_size (int): Recently committed event_ids remembered for the
+            duplicate fast path (0 leaves every check to the unique index)
+        busy_timeout (float): Seconds to wait for the database lock held by
+            another connection (retention, /clear) before a commit fails
+        labels (dict): Labels for this writer's metrics (e.g. its station)
+    """
+
+    def __init__(self, database, sync_mode="FULL", max_group_events=500, max_delay=0.005, queue_size=10000,
+                 dedup_cache_size=100000, busy_timeout=5.0, labels=None):
+        sync_mode = sync_mode.upper()
+        if sync_mode not in SYNC_MODES:
+            raise ValueError(f"sync_mode must be one of {SYNC_MODES}, got {sync_mode!r}")
+
+        self.database = database
+        self.sync_mode = sync_mode
+        self.max_group_events = max_group_events
+        self.max_delay = max_delay
+        self.dedup_cache_size = dedup_cache_size
+        self.busy_timeout = busy_timeout
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="waterlog-writer", daemon=True)
+        self._stats_lock = threading.Lock()
+        self._recent_ids = collections.OrderedDict()  # event_id -> id, least recently seen first
+        self._recent_lock = threading.Lock()
+        self._data_version = None  # PRAGMA data_version the recent ids are valid for
+
+        self.started_at = None
+        self.commits = 0
+        self.events_written = 0
+        self.requests_written = 0
+        self.commit_seconds = 0.0
+        self.duplicates_cached = 0
+        self.duplicates_indexed = 0
+
+        labels = labels or {}
+        self._commit_time = metrics.histogram("waterlog_commit_seconds", "SQLite transaction time per group commit",
+                                              **labels)
+        self._group_size = metrics.histogram("waterlog_group_events", "Events inserted per group commit",
+                                             metrics.SIZE_BUCKETS, **labels)
+        self._write_latency = metrics.histogram("waterlog_write_seconds",
+                                                "Time from a write request being queued to its commit", **labels)
+        self._commit_errors = metrics.counter("waterlog_commit_errors_total", "Write requests whose commit failed",
+                                              **labels)
+        metrics.gauge("waterlog_write_queue_depth", "Write requests waiting for the writer", self._queue.qsize, **labels)
+        metrics.counter("waterlog_events_written_total", "Events inserted", lambda: self.events_written, **labels)
+        metrics.counter("waterlog_duplicates_total", "Events skipped as already stored",
+                        lambda: self.duplicates_cached + self.duplicates_indexed, **labels)
+
+    def start(self):
+        """Starts the writer thread and returns the writer."""
+        self.started_at = time.time()
+        self._thread.start()
+        return self
+
+    def close(self, timeout=None):
+        """Flushes everything already queued, then stops the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def submit(self, rows, timeout=None):
+        """
+        Queues rows for insertion without waiting for the commit.
+
+        Args:
+            rows (list): Tuples matching INSERT_EVENT_SQL's placeholders
+            timeout (float): Max seconds to wait for queue space (0 fails immediately)
+
+        Returns:
+            WriteRequest: Its done event is set once the rows are committed (or failed)
+
+        Raises:
+            queue.Full: The writer is saturated and no queue space freed up in time
+        """
+        request = WriteRequest(rows)
+        self._queue.put(request, timeout=timeout)
+        return request
+
+    def write(self, rows, timeout=None):
+        """
+        Queues rows for insertion and blocks until they are committed.
+
+        Args:
+            rows (list): Tuples matching INSERT_EVENT_SQL's placeholders
+            timeout (float): Max seconds to wait for queue space and for the commit
+
+        Returns:
+            WriteRequest: The committed request (see ids and duplicates for what was stored)
+
+        Raises:
+            queue.Full: The writer is saturated and no queue space freed up in time
+            TimeoutError: The rows were queued but not committed in time
+            sqlite3.Error: The rows could not be committed (rows that slip past validation may
+                fail with the TypeError or ValueError the rollups raised instead)
+        """
+        request = self.submit(rows, timeout)
+
+        if not request.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for group commit")
+        if request.error is not None:
+            raise request.error
+        return request
+
+    def stats(self):
+        """Returns throughput counters for tuning the group size and delay."""
+        with self._stats_lock:
+            uptime = time.time() - self.started_at if self.started_at else 0.0
+            return {
+                "sync_mode": self.sync_mode,
+                "max_group_events": self.max_group_events,
+                "max_delay_ms": self.max_delay * 1000,
+                "queue_depth": self._queue.qsize(),
+                "commits": self.commits,
+                "events_written": self.events_written,
+                "commits_per_sec": self.commits / uptime if uptime else 0.0,
+                "mean_group_events": self.events_written / self.commits if self.commits else 0.0,
+                "mean_group_requests": self.requests_written / self.commits if self.commits else 0.0,
+                "mean_commit_ms": self.commit_seconds / self.commits * 1000 if self.commits else 0.0,
+                "duplicates_cached": self.duplicates_cached,
+                "duplicates_indexed": self.duplicates_indexed,
+                "dedup_cache_entries": len(self._recent_ids),
+            }
+
+    def forget_recent(self):
+        """Empties the recent event_id cache (done automatically when another connection writes)."""
+        with self._recent_lock:
+            self._recent_ids.clear()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=self.busy_timeout)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.sync_mode}")
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+        stopping = False
+
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            group = [first]
+            group_events = len(first.rows)
+            deadline = time.monotonic() + self.max_delay
+
+            # Keep collecting until the group is full or the latency budget is spent
+            while group_events < self.max_group_events:
+                remaining = deadline - time.monotonic()
+                try:
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                group.append(request)
+                group_events += len(request.rows)
+
+            try:
+                self._commit_group(conn, group)
+            except Exception as e:
+                # Never let one group take the writer thread down; fail whatever wasn't answered yet
+                for request in group:
+                    if not request.done.is_set():
+                        request.error = e
+                        self._commit_errors.inc()
+                        request.done.set()
+
+        conn.close()
+
+    def _commit_group(self, conn, group):
+        started = time.perf_counter()
+        self._check_outside_writes(conn)
+        try:
+            with conn:
+                for request in group:
+                    self._insert(conn, request)
+                self._update_derived(conn, group)
+        except Exception:
+            # Retry one request per transaction so a single bad request can't fail its neighbours
+            for request in group:
+                self._commit_group_of_one(conn, request)
+            return
+
+        self._record_commit(group, time.perf_counter() - started)
+        for request in group:
+            self._remember(request)
+            request.done.set()
+
+    def _commit_group_of_one(self, conn, request):
+        started = time.perf_counter()
+        try:
+            with conn:
+                self._insert(conn, request)
+                self._update_derived(conn, [request])
+        except Exception as e:  # Bad data reaching the rollups (TypeError etc.) as well as SQLite errors
+            request.error = e
+            self._commit_errors.inc()
+        else:
+            self._record_commit([request], time.perf_counter() - started)
+            self._remember(request)
+        request.done.set()
+
+    def _check_outside_writes(self, conn):
+        """
+        Drops the recent event_id cache once any other connection has committed.
+
+        Deletes made elsewhere (/clear from a web worker, retention) could
+        otherwise leave the cache pointing at rows that no longer exist.
+        """
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            if self._data_version is not None:
+                self.forget_recent()
+            self._data_version = version
+
+    def _insert(self, conn, request):
+        request.first_id, request.ids, request.inserted = None, [None] * len(request.rows), []
+        if not request.rows:
+            return
+
+        # Fast path: retries of recently committed events are answered from the cache
+        event_ids = [row[EVENT_ID_INDEX] for row in request.rows]
+        with self._recent_lock:
+            cached = [self._recent_ids.get(event_id) for event_id in event_ids] if self._recent_ids else None
+        if cached is None or cached.count(None) == len(cached):
+            fresh = range(len(request.rows))
+        else:
+            fresh = [position for position, stored_id in enumerate(cached) if stored_id is None]
+            request.ids = cached
+            with self._stats_lock:
+                self.duplicates_cached += len(request.rows) - len(fresh)
+            if not fresh:
+                return
+
+        if not conn.in_transaction:
+            conn.execute("BEGIN")  # A savepoint outside a transaction would commit on release
+        conn.execute("SAVEPOINT insert_request")
+        changes = conn.total_changes
+        fresh_rows = request.rows if len(fresh) == len(request.rows) else [request.rows[position] for position in fresh]
+        conn.executemany(INSERT_EVENT_SQL, fresh_rows)
+        if conn.total_changes - changes == len(fresh):
+            # Common case, nothing ignored: this connection is the only writer, so the ids are a contiguous run
+            conn.execute("RELEASE insert_request")
+            request.first_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0] - len(fresh) + 1
+            for offset, position in enumerate(fresh):
+                request.ids[position] = request.first_id + offset
+            request.inserted = fresh_rows
+        else:
+            # The unique index skipped some rows (and an ignored row still uses up an id),
+            # so redo them one by one to learn which were stored and under which id
+            conn.execute("ROLLBACK TO insert_request")
+            conn.execute("RELEASE insert_request")
+            self._insert_one_by_one(conn, request, fresh)
+
+    def _insert_one_by_one(self, conn, request, positions):
+        duplicates = 0
+        for position in positions:
+            row = request.rows[position]
+            cursor = conn.execute(INSERT_EVENT_SQL, row)
+            if cursor.rowcount:
+                request.ids[position] = cursor.lastrowid
+                request.inserted.append(row)
+                if request.first_id is None:
+                    request.first_id = cursor.lastrowid
+            else:
+                request.ids[position] = conn.execute("SELECT id FROM events WHERE event_id = ?",
+                                                     (row[EVENT_ID_INDEX],)).fetchone()[0]
+                duplicates += 1
+        with self._stats_lock:
+            self.duplicates_indexed += duplicates
+
+    def _remember(self, request):
+        """Adds a committed request's event_ids to the recent cache, evicting the least recently seen."""
+        if not self.dedup_cache_size:
+            return
+        seen = [(row[EVENT_ID_INDEX], stored_id) for row, stored_id in zip(request.rows, request.ids)
+                if row[EVENT_ID_INDEX] is not None]
+        if not seen:
+            return
+        with self._recent_lock:
+            if request.duplicates:
+                for event_id, _ in seen:  # Refresh the ids that were retried
+                    if event_id in self._recent_ids:
+                        self._recent_ids.move_to_end(event_id)
+            self._recent_ids.update(seen)
+            while len(self._recent_ids) > self.dedup_cache_size:
+                self._recent_ids.popitem(last=False)
+
+    def _update_derived(self, conn, group):
+        """Folds the group's inserted rows (in id order) into the rollups and the tank state."""
+        rows = [row for request in group for row in request.inserted]
+        if not rows:
+            return
+        # New ids are always above the ids a duplicate points back to
+        last_id = max(stored_id for request in group if request.inserted for stored_id in request.ids)
+        rollups.apply_rows(conn, rows)
+        tank_state.apply_rows(conn, rows, last_id, time.time())
+
+    def _record_commit(self, group, elapsed):
+        inserted = sum(len(request.inserted) for request in group)
+        with self._stats_lock:
+            self.commits += 1
+            self.requests_written += len(group)
+            self.events_written += inserted
+            self.commit_seconds += elapsed
+        now = time.perf_counter()
+        self._commit_time.observe(elapsed)
+        self._group_size.observe(inserted)
+        self._write_latency.observe_all(now - request.queued_at for request in group)
@@ -0,0 +1,231 @@
+"""
+Retention for WaterLog
+
+- Raw events older than the retention age move from the hot events table into
+  monthly archive databases (data/archive/water_log_YYYY-MM.db; other stations'
+  shards archive into data/archive/<station_id>/)
+- Their totals stay in the hot database: events_hour is kept forever, while
+  events_minute is pruned after its own (longer) age
+- Rows move in small batches with a pause in between, so the group-commit
+  writer is never locked out for long
+- Freed pages are returned to the filesystem with incremental vacuum
+
+Archives use the same events schema, so they can be attached for historical queries:
+    ATTACH DATABASE 'data/archive/water_log_2026-01.db' AS jan;
+    SELECT * FROM jan.events WHERE event_type = 'flush';
+
+Run one pass by hand (add --vacuum once to enable incremental vacuum on an older database):
+    python3 microservices/WaterLog/retention.py --database data/water_log.db --days 30
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import rollups
+
+ARCHIVE_COLUMNS = "id, event_type, waste_volume, water_added, planet_name, timestamp, logged_at, event_id, station_id, astronaut_id"
+
+ARCHIVE_PLACEHOLDERS = ", ".join("?" for _ in ARCHIVE_COLUMNS.split(", "))
+
+
+def archive_path(archive_dir, timestamp):
+    """Returns the archive database holding events from timestamp's (UTC) month."""
+    month = datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m")
+    return os.path.join(archive_dir, f"water_log_{month}.db")
+
+
+def open_archive(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            event_type TEXT NOT NULL,
+            waste_volume INTEGER,
+            water_added INTEGER,
+            planet_name TEXT,
+            timestamp REAL NOT NULL,
+            logged_at REAL,
+            event_id TEXT,
+            station_id TEXT,
+            astronaut_id TEXT
+        )
+    ''')
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(events)")]
+    for column in ("event_id", "station_id", "astronaut_id"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE events ADD COLUMN {column} TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp)")
+    conn.commit()
+    return conn
+
+
+class RetentionJob:
+    """
+    Periodically archives old events and trims the hot database.
+
+    Args:
+        database (str): Path to the WaterLog database
+        archive_dir (str): Directory for the monthly archive databases
+        retention_days (float): Raw events older than this are archived (0 disables the job)
+        minute_rollup_days (float): events_minute rows older than this are deleted
+        batch_size (int): Events moved (or rollup rows deleted) per transaction
+        pause (float): Seconds to sleep between batches, leaving room for ingest
+        vacuum_pages (int): Pages reclaimed per incremental vacuum step
+        interval (float): Seconds between passes when run in the background
+    """
+
+    def __init__(self, database, archive_dir, retention_days, minute_rollup_days,
+                 batch_size=1000, pause=0.05, vacuum_pages=256, interval=3600):
+        self.database = database
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.minute_rollup_days = minute_rollup_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.interval = interval
+
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="waterlog-retention", daemon=True)
+
+    def start(self):
+        """Runs a pass now and then every interval seconds, in a background thread."""
+        self._thread.start()
+        return self
+
+    def close(self, timeout=None):
+        """Stops after the current batch."""
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                result = self.run_once()
+                if result["events_archived"] or result["pages_reclaimed"]:
+                    print(f"🗄 Retention: archived {result['events_archived']} events, "
+                          f"pruned {result['minute_rollups_deleted']} minute rollups, "
+                          f"reclaimed {result['pages_reclaimed']} pages")
+            except sqlite3.Error as e:
+                print(f"❌ Retention pass failed: {e}")
+            self._stopping.wait(self.interval)
+
+    def run_once(self, now=None):
+        """
+        Runs one retention pass.
+
+        Returns:
+            dict: events_archived, minute_rollups_deleted and pages_reclaimed
+        """
+        now = time.time() if now is None else now
+        result = {"events_archived": 0, "minute_rollups_deleted": 0, "pages_reclaimed": 0}
+        if self.retention_days <= 0:
+            return result
+
+        conn = sqlite3.connect(self.database, timeout=30)
+        try:
+            cutoff = now - self.retention_days * 86400
+            # Recorded first, so a concurrent rollup rebuild keeps the totals of what's about to move
+            with conn:
+                rollups.set_archived_before(conn, cutoff)
+
+            result["events_archived"] = self._archive_events(conn, cutoff)
+            result["minute_rollups_deleted"] = self._prune_minute_rollups(conn, now - self.minute_rollup_days * 86400)
+            result["pages_reclaimed"] = self._reclaim_space(conn)
+        finally:
+            conn.close()
+        return result
+
+    def _archive_events(self, conn, cutoff):
+        archives = {}
+        moved = 0
+        try:
+            while not self._stopping.is_set():
+                rows = conn.execute(f'''
+                    SELECT {ARCHIVE_COLUMNS} FROM events
+                    WHERE timestamp < ? ORDER BY timestamp LIMIT ?
+                ''', (cutoff, self.batch_size)).fetchall()
+                if not rows:
+                    break
+
+                by_archive = {}
+                for row in rows:
+                    by_archive.setdefault(archive_path(self.archive_dir, row[5]), []).append(row)
+
+                # Archive first: a crash before the delete only means re-copying (ignored by id) next pass
+                for path, archive_rows in by_archive.items():
+                    if path not in archives:
+                        archives[path] = open_archive(path)
+                    with archives[path]:
+                        archives[path].executemany(f"INSERT OR IGNORE INTO events ({ARCHIVE_COLUMNS}) VALUES ({ARCHIVE_PLACEHOLDERS})", archive_rows)
+
+                with conn:
+                    conn.executemany("DELETE FROM events WHERE id = ?", [(row[0],) for row in rows])
+                moved += len(rows)
+                time.sleep(self.pause)
+        finally:
+            for archive in archives.values():
+                archive.close()
+        return moved
+
+    def _prune_minute_rollups(self, conn, cutoff):
+        deleted = 0
+        while not self._stopping.is_set():
+            with conn:
+                count = conn.execute('''
+                    DELETE FROM events_minute WHERE (bucket, event_type) IN (
+                        SELECT bucket, event_type FROM events_minute WHERE bucket < ? LIMIT ?
+                    )
+                ''', (cutoff, self.batch_size)).rowcount
+            deleted += count
+            if count < self.batch_size:
+                break
+            time.sleep(self.pause)
+        return deleted
+
+    def _reclaim_space(self, conn):
+        """Returns free pages to the filesystem a few at a time (needs auto_vacuum=INCREMENTAL)."""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+
+        reclaimed = 0
+        while not self._stopping.is_set():
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            conn.execute(f"PRAGMA incremental_vacuum({min(free, self.vacuum_pages)})").fetchall()
+            reclaimed += min(free, self.vacuum_pages)
+            time.sleep(self.pause)
+        return reclaimed
+
+
+def enable_incremental_vacuum(database):
+    """Switches an existing database to auto_vacuum=INCREMENTAL (rewrites the whole file once)."""
+    conn = sqlite3.connect(database, isolation_level=None, timeout=30)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old WaterLog events and trim the hot database")
+    parser.add_argument("--database", default="data/water_log.db", help="path to the WaterLog database")
+    parser.add_argument("--archive-dir", default="data/archive", help="directory for monthly archive databases")
+    parser.add_argument("--days", type=float, default=30, help="archive raw events older than this many days")
+    parser.add_argument("--minute-rollup-days", type=float, default=90, help="delete per-minute rollups older than this")
+    parser.add_argument("--vacuum", action="store_true", help="first enable incremental vacuum (one full VACUUM)")
+    args = parser.parse_args()
+
+    if args.vacuum:
+        enable_incremental_vacuum(args.database)
+        print("✅ Incremental vacuum enabled.")
+
+    started = time.perf_counter()
+    result = RetentionJob(args.database, args.archive_dir, args.days, args.minute_rollup_days, pause=0).run_once()
+    print(f"✅ Archived {result['events_archived']} events, pruned {result['minute_rollups_deleted']} minute rollups, "
+          f"reclaimed {result['pages_reclaimed']} pages in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,169 @@
+"""
+Rollup Tables for WaterLog
+
+- Per-minute and per-hour totals by event type (count, waste_volume, water_added)
+- Kept current inside the group-commit transaction that inserts the events,
+  so a rollup never disagrees with the events table
+- Aggregate queries over days or months read these instead of scanning events
+- Once old events are archived (see retention.py) the rollups are the only hot
+  copy of their totals, so rebuilds leave buckets before the archive cutoff alone
+
+Rebuild the rollups of an existing database (e.g. one created before they existed):
+    python3 microservices/WaterLog/rollups.py --database data/water_log.db
+"""
+
+import argparse
+import sqlite3
+import time
+
+# Rollup table -> bucket width in seconds; buckets start at multiples of the width
+ROLLUPS = {
+    "events_minute": 60,
+    "events_hour": 3600,
+}
+
+UPSERT_SQL = '''
+    INSERT INTO {table} (bucket, event_type, count, waste_volume, water_added)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (bucket, event_type) DO UPDATE SET
+        count = count + excluded.count,
+        waste_volume = waste_volume + excluded.waste_volume,
+        water_added = water_added + excluded.water_added
+'''
+
+REBUILD_SQL = '''
+    INSERT INTO {table} (bucket, event_type, count, waste_volume, water_added)
+    SELECT CAST(timestamp / {width} AS INTEGER) * {width}, event_type,
+           COUNT(*), COALESCE(SUM(waste_volume), 0), COALESCE(SUM(water_added), 0)
+    FROM events
+    WHERE timestamp >= ?
+    GROUP BY 1, 2
+'''
+
+# Folds a just-inserted id range in one statement (bulk imports); the WHERE keeps the upsert unambiguous
+APPLY_RANGE_SQL = '''
+    INSERT INTO {table} (bucket, event_type, count, waste_volume, water_added)
+    SELECT CAST(timestamp / {width} AS INTEGER) * {width}, event_type,
+           COUNT(*), COALESCE(SUM(waste_volume), 0), COALESCE(SUM(water_added), 0)
+    FROM events
+    WHERE id > ?
+    GROUP BY 1, 2
+    ON CONFLICT (bucket, event_type) DO UPDATE SET
+        count = count + excluded.count,
+        waste_volume = waste_volume + excluded.waste_volume,
+        water_added = water_added + excluded.water_added
+'''
+
+
+def create_tables(conn):
+    """
+    Creates any missing rollup tables.
+
+    Returns:
+        bool: True if a table was created (it needs a rebuild if events already exist)
+    """
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in ROLLUPS:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                waste_volume INTEGER NOT NULL,
+                water_added INTEGER NOT NULL,
+                PRIMARY KEY (bucket, event_type)
+            ) WITHOUT ROWID
+        ''')
+
+    # Single row: events before archived_before have been moved out of the events table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_floor (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            archived_before REAL NOT NULL
+        )
+    ''')
+    return not existing.issuperset(ROLLUPS)
+
+
+def archived_before(conn):
+    """Returns the timestamp before which raw events have been archived, or None."""
+    row = conn.execute("SELECT archived_before FROM rollup_floor WHERE id = 0").fetchone()
+    return row[0] if row else None
+
+
+def set_archived_before(conn, timestamp):
+    """Raises the archive cutoff to timestamp (it never moves back), in the caller's transaction."""
+    conn.execute('''
+        INSERT INTO rollup_floor (id, archived_before) VALUES (0, ?)
+        ON CONFLICT (id) DO UPDATE SET archived_before = MAX(archived_before, excluded.archived_before)
+    ''', (timestamp,))
+
+
+def apply_rows(conn, rows):
+    """
+    Adds newly inserted event rows to every rollup, in the caller's transaction.
+
+    Args:
+        conn (sqlite3.Connection): The connection that inserted the rows
+        rows (list): Tuples of (event_type, waste_volume, water_added, planet_name, timestamp, ...)
+    """
+    for table, width in ROLLUPS.items():
+        totals = {}
+        for event_type, waste_volume, water_added, _, timestamp, *_ in rows:
+            key = (int(timestamp // width) * width, event_type)
+            count, waste, water = totals.get(key, (0, 0, 0))
+            totals[key] = (count + 1, waste + (waste_volume or 0), water + (water_added or 0))
+
+        conn.executemany(UPSERT_SQL.format(table=table),
+                         [(bucket, event_type, *sums) for (bucket, event_type), sums in totals.items()])
+
+
+def apply_since(conn, after_id):
+    """Adds every event with id > after_id to the rollups, in the caller's transaction (after a bulk insert)."""
+    for table, width in ROLLUPS.items():
+        conn.execute(APPLY_RANGE_SQL.format(table=table, width=width), (after_id,))
+
+
+def clear(conn):
+    """Empties every rollup, in the caller's transaction."""
+    for table in ROLLUPS:
+        conn.execute(f"DELETE FROM {table}")
+
+
+def rebuild(conn):
+    """
+    Recomputes every rollup from the events table in one transaction.
+
+    Buckets that start before the archive cutoff are kept as they are, since
+    part of their events now live only in the archives.
+
+    Returns:
+        dict: Rows written per rollup table
+    """
+    create_tables(conn)
+    written = {}
+    with conn:
+        # Take the write lock first so no group commit lands between the delete and the insert
+        conn.execute("BEGIN IMMEDIATE")
+        floor = archived_before(conn)
+        for table, width in ROLLUPS.items():
+            start = -(-floor // width) * width if floor is not None else float("-inf")
+            conn.execute(f"DELETE FROM {table} WHERE bucket >= ?", (start,))
+            written[table] = conn.execute(REBUILD_SQL.format(table=table, width=width), (start,)).rowcount
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild WaterLog's rollup tables from the events table")
+    parser.add_argument("--database", default="data/water_log.db", help="path to the WaterLog database")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.database, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 10000")
+    written = rebuild(conn)
+    conn.close()
+
+    for table, rows in written.items():
+        print(f"✅ Rebuilt {table}: {rows} rows")
+    print(f"⏱ Done in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,290 @@
+"""
+Per-Station Shards for WaterLog
+
+- Every station's events live in their own SQLite database: the default
+  station in the main database (data/water_log.db), the others in
+  data/stations/<station_id>.db, each with its own rollups and tank state
+- Each shard has its own group-commit writer, so stations never wait on each
+  other's write lock or disk sync
+- The main database's stations table registers the shards; a station gets its
+  shard the first time one of its events arrives, up to max_stations of them
+- Ids stay unique across shards without any translation: shard n hands out
+  ids from n << ID_SHARD_BITS upwards (its AUTOINCREMENT sequence is seeded
+  there), so an id alone still names one event
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from group_writer import STATION_ID_INDEX
+
+ID_SHARD_BITS = 40  # ~10^12 ids per shard; ids stay below 2^53, exact in JSON, for 8192 shards
+
+
+def create_table(conn, default_station):
+    """Creates the stations registry (in the main database) with the default station as shard 0."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stations (
+            shard INTEGER PRIMARY KEY,
+            station_id TEXT NOT NULL UNIQUE,
+            created_at REAL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO stations (shard, station_id, created_at) VALUES (0, ?, ?)",
+                 (default_station, time.time()))
+
+
+def seed_ids(conn, shard):
+    """Moves an events table's AUTOINCREMENT sequence up to its shard's id range (no-op once there)."""
+    base = shard << ID_SHARD_BITS
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+    if row is None:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('events', ?)", (base,))
+    elif row[0] < base:
+        conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'events'", (base,))
+
+
+class StationLimitError(ValueError):
+    """A new station would exceed the registry's max_stations."""
+
+
+class StationRegistry:
+    """
+    Maps station ids to their shard databases, creating shards on first use.
+
+    Args:
+        database (str): Path to the main WaterLog database (the default station's shard)
+        station_dir (str): Directory for the other stations' databases
+        init_schema (callable): Creates or migrates the WaterLog schema in the database at a path
+        default_station (str): Station stored in the main database
+        busy_timeout (float): Seconds to wait for the registry's write lock
+        max_stations (int): Most stations (the default one included) that may be registered; None for no limit
+    """
+
+    def __init__(self, database, station_dir, init_schema, default_station, busy_timeout=5.0, max_stations=None):
+        self.database = database
+        self.station_dir = station_dir
+        self.init_schema = init_schema
+        self.default_station = default_station
+        self.busy_timeout = busy_timeout
+        self.max_stations = max_stations
+        self._ready = set()  # stations whose shard this process has created or checked
+        self._lock = threading.Lock()
+
+    def path(self, station_id):
+        """Returns the database file holding station_id's events (registered or not)."""
+        if station_id == self.default_station:
+            return self.database
+        return os.path.join(self.station_dir, f"{station_id}.db")
+
+    def stations(self, conn):
+        """
+        Lists the registered stations, default station first.
+
+        Args:
+            conn (sqlite3.Connection): Any connection to the main database
+
+        Returns:
+            list: (station_id, path) pairs
+        """
+        return [(station_id, self.path(station_id))
+                for (station_id,) in conn.execute("SELECT station_id FROM stations ORDER BY shard")]
+
+    def register(self, station_id):
+        """
+        Makes sure station_id has a shard, creating its database on first use.
+
+        Returns:
+            str: Path of the station's database
+
+        Raises:
+            StationLimitError: station_id is new and max_stations are already registered
+        """
+        path = self.path(station_id)
+        if station_id == self.default_station or station_id in self._ready:
+            return path
+
+        with self._lock:
+            if station_id in self._ready:
+                return path
+            os.makedirs(self.station_dir, exist_ok=True)
+            conn = sqlite3.connect(self.database, isolation_level=None, timeout=self.busy_timeout)
+            try:
+                # Serializes registrations across processes (the writer, /import in web workers)
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT shard FROM stations WHERE station_id = ?", (station_id,)).fetchone()
+                if row is None:
+                    count = conn.execute("SELECT COUNT(*) FROM stations").fetchone()[0]
+                    if self.max_stations is not None and count >= self.max_stations:
+                        raise StationLimitError(f"Station limit reached ({self.max_stations}), "
+                                                f"not creating a shard for {station_id}")
+                    shard = conn.execute("SELECT COALESCE(MAX(shard), 0) + 1 FROM stations").fetchone()[0]
+                    conn.execute("INSERT INTO stations (shard, station_id, created_at) VALUES (?, ?, ?)",
+                                 (shard, station_id, time.time()))
+                else:
+                    shard = row[0]
+                # The shard is ready before its registration commits, so readers never find a missing file
+                self.init_schema(path)
+                shard_conn = sqlite3.connect(path, timeout=self.busy_timeout)
+                with shard_conn:
+                    seed_ids(shard_conn, shard)
+                shard_conn.close()
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+            self._ready.add(station_id)
+        print(f"🛰 Station {station_id} stored in shard {shard} ({path})")
+        return path
+
+
+class ShardedRequest:
+    """
+    A write spanning several stations: one WriteRequest per shard, completed once all are.
+
+    Offers the parts of WriteRequest the ingest socket and HTTP handlers use
+    (done, error, duplicates, receipt()).
+    """
+
+    def __init__(self, rows, parts):
+        self.rows = rows
+        self.parts = parts  # (positions in rows, WriteRequest) per shard
+        self.done = self
+
+    # ---- done: a composite of the parts' events ----
+
+    def is_set(self):
+        return all(request.done.is_set() for _, request in self.parts)
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for _, request in self.parts:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not request.done.wait(remaining):
+                return False
+        return True
+
+    @property
+    def error(self):
+        return next((request.error for _, request in self.parts if request.error is not None), None)
+
+    @property
+    def ids(self):
+        ids = [None] * len(self.rows)
+        for positions, request in self.parts:
+            for position, stored_id in zip(positions, request.ids):
+                ids[position] = stored_id
+        return ids
+
+    @property
+    def duplicates(self):
+        return sum(request.duplicates for _, request in self.parts)
+
+    def receipt(self):
+        """
+        Summarizes the committed request; ids are always listed, since each
+        shard assigns its own range.
+        """
+        ids = self.ids
+        first_ids = [request.first_id for _, request in self.parts if request.first_id is not None]
+        return {"first_id": min(first_ids, default=None), "count": len(self.rows),
+                "duplicates": self.duplicates, "ids": ids}
+
+
+class ShardedWriter:
+    """
+    Routes rows to one group-commit writer per station shard.
+
+    Writers are started on first use by new_writer(station_id, path), which
+    also starts anything else that runs per shard (retention).
+
+    Args:
+        registry (StationRegistry): Resolves (and creates) the shards
+        new_writer (callable): Returns a started GroupCommitWriter for (station_id, path)
+    """
+
+    def __init__(self, registry, new_writer):
+        self.registry = registry
+        self.new_writer = new_writer
+        self.writers = {}  # station_id -> GroupCommitWriter
+        self._lock = threading.Lock()
+
+    def writer(self, station_id):
+        """Returns station_id's writer, creating its shard and writer on first use."""
+        writer = self.writers.get(station_id)
+        if writer is None:
+            with self._lock:
+                writer = self.writers.get(station_id)
+                if writer is None:
+                    writer = self.new_writer(station_id, self.registry.register(station_id))
+                    self.writers[station_id] = writer
+        return writer
+
+    def submit(self, rows, timeout=None):
+        """
+        Queues rows with their stations' writers without waiting for the commits.
+
+        Returns:
+            WriteRequest | ShardedRequest: A plain WriteRequest when every row belongs to one station
+
+        Raises:
+            StationLimitError: A row's station is new and the registry is full (nothing is queued)
+            queue.Full: A station's writer is saturated (rows already queued with other stations still commit)
+        """
+        by_station = {}
+        for position, row in enumerate(rows):
+            by_station.setdefault(row[STATION_ID_INDEX], []).append(position)
+
+        if len(by_station) <= 1:
+            station_id = next(iter(by_station), self.registry.default_station)
+            return self.writer(station_id).submit(rows, timeout)
+
+        # Resolve every shard before queuing anything, so a refused station rejects the whole write
+        writers = {station_id: self.writer(station_id) for station_id in by_station}
+        parts = []
+        for station_id, positions in by_station.items():
+            request = writers[station_id].submit([rows[position] for position in positions], timeout)
+            parts.append((positions, request))
+        return ShardedRequest(rows, parts)
+
+    def write(self, rows, timeout=None):
+        """
+        Queues rows and blocks until every station's part is committed.
+
+        Raises:
+            StationLimitError: As submit
+            queue.Full, TimeoutError, sqlite3.Error: As GroupCommitWriter.write
+        """
+        request = self.submit(rows, timeout)
+        if not request.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for group commit")
+        if request.error is not None:
+            raise request.error
+        return request
+
+    def stats(self):
+        """Returns the writers' summed counters plus each station's own stats."""
+        stations = {station_id: writer.stats() for station_id, writer in list(self.writers.items())}
+        commits = sum(stats["commits"] for stats in stations.values())
+        events = sum(stats["events_written"] for stats in stations.values())
+        return {
+            "shards": len(stations),
+            "commits": commits,
+            "events_written": events,
+            "commits_per_sec": sum(stats["commits_per_sec"] for stats in stations.values()),
+            "mean_group_events": events / commits if commits else 0.0,
+            "queue_depth": sum(stats["queue_depth"] for stats in stations.values()),
+            "duplicates_cached": sum(stats["duplicates_cached"] for stats in stations.values()),
+            "duplicates_indexed": sum(stats["duplicates_indexed"] for stats in stations.values()),
+            "stations": stations,
+        }
+
+    def close(self, timeout=None):
+        """Flushes and stops every station's writer."""
+        for writer in list(self.writers.values()):
+            writer.close(timeout)
@@ -0,0 +1,165 @@
+"""
+Water Tank State for WaterLog
+
+- Running totals (water level, cumulative waste and water, flush/refill counts)
+  kept in a single-row table, so reading them costs the same at any history size
+- Updated in the group-commit transaction that inserts the events, so the
+  state always matches what is stored and survives restarts
+- Sliding-window ratios come from the per-minute rollups (see rollups.py)
+
+Tank model: the tank starts full. Refills add their water_added; every unit of
+flushed waste uses WATER_PER_WASTE units of water. The level stays within
+0 .. TANK_CAPACITY.
+"""
+
+import os
+
+TANK_CAPACITY = float(os.environ.get("WATERLOG_TANK_CAPACITY", 1000))
+WATER_PER_WASTE = float(os.environ.get("WATERLOG_WATER_PER_WASTE", 6))
+LOW_LEVEL_FRACTION = 0.2  # below this the level is reported as LOW
+
+# Sliding windows reported by /state, in seconds
+WINDOWS = {"1h": 3600, "24h": 86400}
+
+STATE_COLUMNS = ("level", "total_waste", "total_water_added", "flushes", "refills", "events", "last_event_id", "updated_at")
+
+
+def create_table(conn):
+    """
+    Creates the tank_state table if missing.
+
+    Returns:
+        bool: True if it was created (the state then needs initialize())
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tank_state'").fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tank_state (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            level REAL NOT NULL,
+            total_waste INTEGER NOT NULL,
+            total_water_added INTEGER NOT NULL,
+            flushes INTEGER NOT NULL,
+            refills INTEGER NOT NULL,
+            events INTEGER NOT NULL,
+            last_event_id INTEGER NOT NULL,
+            updated_at REAL
+        )
+    ''')
+    return exists is None
+
+
+def initial_state():
+    return {"level": TANK_CAPACITY, "total_waste": 0, "total_water_added": 0, "flushes": 0,
+            "refills": 0, "events": 0, "last_event_id": 0, "updated_at": None}
+
+
+def fold(state, rows):
+    """Applies event rows (event_type, waste_volume, water_added, planet_name, timestamp, ...) to state in order."""
+    level = state["level"]
+    for event_type, waste_volume, water_added, *_ in rows:
+        if event_type == "flush":
+            level = max(0.0, level - WATER_PER_WASTE * (waste_volume or 0))
+            state["total_waste"] += waste_volume or 0
+            state["flushes"] += 1
+        elif event_type == "water_refill":
+            level = min(TANK_CAPACITY, level + (water_added or 0))
+            state["total_water_added"] += water_added or 0
+            state["refills"] += 1
+        state["events"] += 1
+    state["level"] = level
+    return state
+
+
+def load(conn):
+    """Returns the stored state (the initial state if none is stored yet)."""
+    row = conn.execute(f"SELECT {', '.join(STATE_COLUMNS)} FROM tank_state WHERE id = 0").fetchone()
+    return dict(zip(STATE_COLUMNS, row)) if row else initial_state()
+
+
+def save(conn, state):
+    conn.execute(f'''
+        INSERT OR REPLACE INTO tank_state (id, {', '.join(STATE_COLUMNS)})
+        VALUES (0, {', '.join('?' for _ in STATE_COLUMNS)})
+    ''', [state[column] for column in STATE_COLUMNS])
+
+
+def apply_rows(conn, rows, last_event_id, committed_at):
+    """
+    Advances the stored state past newly inserted rows, in the caller's transaction.
+
+    Args:
+        conn (sqlite3.Connection): The connection that inserted the rows
+        rows (list): Event rows in id order
+        last_event_id (int): Highest id among the rows
+        committed_at (float): Commit time (epoch seconds)
+    """
+    if not rows:
+        return
+    state = fold(load(conn), rows)
+    state["last_event_id"] = max(state["last_event_id"], last_event_id)
+    state["updated_at"] = committed_at
+    save(conn, state)
+
+
+def reset(conn):
+    """Refills the tank and zeroes the totals, in the caller's transaction."""
+    save(conn, initial_state())
+
+
+def initialize(conn, fetch_size=10000):
+    """Computes the state by replaying the events table in id order (for databases that predate it)."""
+    state = initial_state()
+    cursor = conn.execute("SELECT event_type, waste_volume, water_added, planet_name, timestamp, id FROM events ORDER BY id")
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        fold(state, [row[:5] for row in rows])
+        state["last_event_id"] = rows[-1][5]
+    with conn:
+        save(conn, state)
+    return state
+
+
+def level_status(level):
+    """Returns (level as a fraction of capacity, "OK"/"LOW"/"EMPTY")."""
+    fraction = level / TANK_CAPACITY if TANK_CAPACITY else 0.0
+    return fraction, "EMPTY" if level <= 0 else "LOW" if fraction < LOW_LEVEL_FRACTION else "OK"
+
+
+def summarize(conn):
+    """Returns a station's tank level and status, for overviews of every station."""
+    state = load(conn)
+    fraction, status = level_status(state["level"])
+    return {"level": state["level"], "level_fraction": fraction, "status": status, "events": state["events"]}
+
+
+def describe(conn, now):
+    """
+    Returns the state as served by /state, with sliding-window counts from the minute rollups.
+
+    Args:
+        conn (sqlite3.Connection | None): Any connection to the station's database
+            (None for a station with no events yet, which has a full tank)
+        now (float): End of the sliding windows (epoch seconds)
+    """
+    state = load(conn) if conn is not None else initial_state()
+    fraction, status = level_status(state["level"])
+
+    windows = {}
+    for name, seconds in WINDOWS.items():
+        flushes, refills = conn.execute('''
+            SELECT COALESCE(SUM(CASE WHEN event_type = 'flush' THEN count END), 0),
+                   COALESCE(SUM(CASE WHEN event_type = 'water_refill' THEN count END), 0)
+            FROM events_minute WHERE bucket >= ?
+        ''', (now - seconds,)).fetchone() if conn is not None else (0, 0)
+        windows[name] = {"flushes": flushes, "refills": refills, "ratio": flushes / refills if refills else None}
+
+    return {
+        **state,
+        "capacity": TANK_CAPACITY,
+        "level_fraction": fraction,
+        "status": status,
+        "ratio": state["flushes"] / state["refills"] if state["refills"] else None,
+        "windows": windows,
+    }
@@ -1,146 +1,981 @@
-"""
-WaterLog Microservice
-
-- Stores astronaut activity data (Flushes, Water Refills, Planet Visits)
-- Uses SQLite for persistent storage
-- Exposes a REST API (Flask) for data retrieval
-"""
-
-from flask import Flask, request, jsonify
-import sqlite3
-
-app = Flask(__name__)
-
-DATABASE = "data/water_log.db"
-
-def init_db():
-    """
-    Initializes the SQLite database with required tables.
-    """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-
-    # Create events table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            event_type TEXT NOT NULL,
-            waste_volume INTEGER,
-            water_added INTEGER,
-            planet_name TEXT,
-            timestamp REAL NOT NULL
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
-
-@app.route('/log', methods=['POST'])
-def log_event():
-    """
-    Logs an astronaut activity event (Flush, Water Refill, Planet Visit).
-    """
-    data = request.json
-
-    if not isinstance(data, dict):
-        return jsonify({"error": "Invalid data format, expected a single event object"}), 400
-
-    event_type = data.get("event_type")
-    waste_volume = data.get("waste_volume")
-    water_added = data.get("water_added")
-    planet_name = data.get("planet_name")
-    timestamp = data.get("timestamp")
-
-    if not event_type or not timestamp:
-        return jsonify({"error": "Invalid event data"}), 400
-
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-
-    # Insert new event
-    c.execute('''
-        INSERT INTO events (event_type, waste_volume, water_added, planet_name, timestamp)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (event_type, waste_volume, water_added, planet_name, timestamp))
-
-    conn.commit()  # ✅ Ensure data is saved!
-    conn.close()
-
-    return jsonify({"status": "Event logged successfully"}), 201
-
-
-@app.route('/history', methods=['GET'])
-def get_history():
-    """
-    Retrieves all stored events from the database.
-    """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-
-    c.execute("SELECT * FROM events ORDER BY timestamp DESC")
-    rows = c.fetchall()
-    conn.close()
-
-    events = [
-        {"id": row[0], "event_type": row[1], "waste_volume": row[2],
-         "water_added": row[3], "planet_name": row[4], "timestamp": row[5]}
-        for row in rows
-    ]
-
-    return jsonify(events)
-
-@app.route('/clear', methods=['POST'])
-def clear_database():
-    """
-    Clears all records from the events table.
-    """
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("DELETE FROM events")  # Remove all data
-    conn.commit()
-    conn.close()
-
-    return jsonify({"status": "Database cleared"}), 200
-
-@app.route('/log_batch', methods=['POST'])
-def log_batch_events():
-    """
-    Logs multiple astronaut activity events in a single batch.
-    """
-    data = request.json
-
-    if not isinstance(data, list):
-        return jsonify({"error": "Invalid data format, expected a list of events"}), 400
-
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-
-    try:
-        for event in data:
-            event_type = event.get("event_type")
-            waste_volume = event.get("waste_volume")
-            water_added = event.get("water_added")
-            planet_name = event.get("planet_name")
-            timestamp = event.get("timestamp")
-
-            if not event_type or not timestamp:
-                return jsonify({"error": "Invalid event data"}), 400
-
-            # Insert new event
-            c.execute('''
-                INSERT INTO events (event_type, waste_volume, water_added, planet_name, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (event_type, waste_volume, water_added, planet_name, timestamp))
-
-        conn.commit()  # ✅ Ensure all data is saved!
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": str(e)}), 500
-    finally:
-        conn.close()
-
-    return jsonify({"status": "Batch events logged successfully"}), 201
-
-if __name__ == '__main__':
-    init_db()
-    app.run(host='0.0.0.0', port=5001, debug=True)
+"""
+WaterLog Microservice
+
+- Stores astronaut activity data (Flushes, Water Refills, Planet Visits)
+- Uses SQLite for persistent storage
+- Exposes a REST API (Flask) for data retrieval
+- Funnels all inserts through a group-commit writer (see group_writer.py)
+- Accepts internal event batches over ZeroMQ, bypassing HTTP (see zmq_ingest.py)
+- Archives raw events past the retention age into monthly databases (see retention.py)
+- Stores each producer event_id once, so retried deliveries don't duplicate events
+- Imports CSV/NDJSON event files in bulk through /import (see bulk_import.py)
+- Shards storage by station: one SQLite file and writer per station_id, with
+  reads fanned out across the shards in parallel and merged (see shards.py)
+- Serves production traffic from gunicorn worker processes that read through
+  reused per-thread connections and hand every write to this process's writer
+- Serves request latencies, shard query times and the writer's commit metrics
+  on /metrics (see metrics.py)
+
+Usage:
+    python3 water_log.py                 # writer + gunicorn workers (threaded server if gunicorn is missing)
+    python3 water_log.py --workers 8 --threads 4
+    python3 water_log.py --dev           # Flask development server with debugger and reloader
+"""
+
+from flask import Flask, Response, g, request, jsonify
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import importlib.util
+import json
+import math
+import os
+import queue
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+# Shared modules (event codec, metrics) live in microservices/Common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Common"))
+
+import bulk_import
+import event_codec
+import metrics
+from group_writer import GroupCommitWriter
+from retention import RetentionJob
+import rollups
+import shards
+import tank_state
+from zmq_ingest import WriterClient, ZmqIngestServer
+
+app = Flask(__name__)
+
+DATABASE = "data/water_log.db"  # Also the default station's shard and the stations registry
+STATION_DIR = "stations"  # Other stations' shards, next to DATABASE (data/stations/<station_id>.db)
+PORT = 5001
+
+# Production serving: gunicorn workers (processes) x threads; every write goes to this process's writer
+WORKERS = int(os.environ.get("WATERLOG_WORKERS", min(4, os.cpu_count() or 1)))
+THREADS = int(os.environ.get("WATERLOG_THREADS", 4))
+WRITER_BIND = os.environ.get("WATERLOG_WRITER_BIND", "tcp://127.0.0.1:5559")  # workers -> writer, local only
+WRITER_ENDPOINT = os.environ.get("WATERLOG_WRITER_ENDPOINT", "")  # set for the workers by the launcher
+BUSY_TIMEOUT = float(os.environ.get("WATERLOG_BUSY_TIMEOUT_MS", 5000)) / 1000  # seconds to wait on a locked database
+
+# Group-commit tuning: FULL syncs every commit, NORMAL trades the last few commits on power loss for speed
+SYNC_MODE = os.environ.get("WATERLOG_SYNC_MODE", "FULL")
+GROUP_MAX_EVENTS = int(os.environ.get("WATERLOG_GROUP_MAX_EVENTS", 500))
+GROUP_MAX_DELAY = float(os.environ.get("WATERLOG_GROUP_MAX_DELAY_MS", 5)) / 1000
+WRITE_QUEUE_SIZE = int(os.environ.get("WATERLOG_WRITE_QUEUE_SIZE", 10000))
+WRITE_TIMEOUT = 10  # seconds a request waits for queue space and its commit
+DEDUP_CACHE_SIZE = int(os.environ.get("WATERLOG_DEDUP_CACHE", 100000))  # recent event_ids checked in memory
+EVENT_ID_MAX_LENGTH = 128
+DEFAULT_STATION_ID = event_codec.DEFAULT_STATION_ID  # Events without a station_id are stored here
+STATION_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")  # Station ids name shard files (lowercased)
+# Shard creation limits: a comma-separated allow-list (empty allows any id) and a cap on registered stations
+STATIONS = {s.strip().lower() for s in os.environ.get("WATERLOG_STATIONS", "").split(",") if s.strip()}
+MAX_STATIONS = int(os.environ.get("WATERLOG_MAX_STATIONS", 256))
+ASTRONAUT_ID_MAX_LENGTH = 64
+SQLITE_INT_MIN, SQLITE_INT_MAX = -2 ** 63, 2 ** 63 - 1  # INTEGER range; larger Python ints can't be bound
+FANOUT_THREADS = int(os.environ.get("WATERLOG_FANOUT_THREADS", 8))  # shards queried in parallel per process
+
+# Internal ZeroMQ ingest socket for LiveTrack; set to "" to disable
+ZMQ_INGEST_ENDPOINT = os.environ.get("WATERLOG_ZMQ_INGEST", "tcp://*:5557")
+
+# Retention: raw events older than WATERLOG_RETENTION_DAYS move to data/archive (0 keeps everything)
+RETENTION_DAYS = float(os.environ.get("WATERLOG_RETENTION_DAYS", 30))
+MINUTE_ROLLUP_DAYS = float(os.environ.get("WATERLOG_MINUTE_ROLLUP_DAYS", 90))
+RETENTION_INTERVAL = float(os.environ.get("WATERLOG_RETENTION_INTERVAL", 3600))
+ARCHIVE_DIR = "data/archive"
+
+HISTORY_DEFAULT_LIMIT = 500
+HISTORY_MAX_LIMIT = 5000
+EXPORT_FETCH_SIZE = 1000  # rows pulled from the cursor per streamed chunk
+STATS_DEFAULT_WINDOW = 86400  # seconds
+STATS_DEFAULT_RESOLUTION = 300  # seconds per bucket
+STATS_MAX_BUCKETS = 5000
+
+EVENT_COLUMNS = "id, event_type, waste_volume, water_added, planet_name, timestamp, event_id, station_id, astronaut_id"
+
+writer = None
+writer_client = None
+writer_lock = threading.Lock()
+registry = None
+fanout_pool = None
+fanout_lock = threading.Lock()
+read_connections = threading.local()
+
+def init_db():
+    """
+    Initializes the main database (the default station's shard plus the stations
+    registry) and brings every registered station's shard up to date.
+    """
+    init_schema(DATABASE)
+    conn = sqlite3.connect(DATABASE)
+    with conn:
+        shards.create_table(conn, DEFAULT_STATION_ID)
+    stations = get_registry().stations(conn)
+    conn.close()
+
+    for _, path in stations:
+        if path != DATABASE:
+            init_schema(path)
+
+def init_schema(path):
+    """
+    Creates (or migrates) the events schema, rollups and tank state in one shard's database.
+    """
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+
+    # Lets retention hand freed pages back in small steps (only takes effect on a new file;
+    # older databases switch over with `retention.py --vacuum`)
+    c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    # WAL lets readers keep working while the writer commits
+    c.execute("PRAGMA journal_mode=WAL")
+
+    # Create events table
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            waste_volume INTEGER,
+            water_added INTEGER,
+            planet_name TEXT,
+            timestamp REAL NOT NULL,
+            logged_at REAL,
+            event_id TEXT,
+            station_id TEXT NOT NULL DEFAULT 'main',
+            astronaut_id TEXT
+        )
+    ''')
+
+    # Databases created before these columns existed get them added in place
+    # (their events all belong to the default station)
+    columns = [row[1] for row in c.execute("PRAGMA table_info(events)")]
+    if "logged_at" not in columns:
+        c.execute("ALTER TABLE events ADD COLUMN logged_at REAL")
+    if "event_id" not in columns:
+        c.execute("ALTER TABLE events ADD COLUMN event_id TEXT")
+    if "station_id" not in columns:
+        c.execute(f"ALTER TABLE events ADD COLUMN station_id TEXT NOT NULL DEFAULT '{DEFAULT_STATION_ID}'")
+    if "astronaut_id" not in columns:
+        c.execute("ALTER TABLE events ADD COLUMN astronaut_id TEXT")
+
+    # Producers' event ids are stored once; events without one are never deduplicated and stay out of the index
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_events_event_id ON events (event_id) WHERE event_id IS NOT NULL")
+
+    # Indexes backing /history's time-ordered pages and event_type filters
+    c.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_events_type_timestamp ON events (event_type, timestamp)")
+
+    # Per-minute/per-hour rollups; backfilled once if this database predates them
+    needs_rebuild = rollups.create_tables(conn)
+    needs_tank_state = tank_state.create_table(conn)
+    conn.commit()
+    if needs_rebuild:
+        rollups.rebuild(conn)
+    if needs_tank_state:
+        tank_state.initialize(conn)
+
+    conn.close()
+
+def get_registry():
+    """Returns the station registry for DATABASE (rebuilt if DATABASE was pointed elsewhere)."""
+    global registry
+    if registry is None or registry.database != DATABASE:
+        registry = shards.StationRegistry(DATABASE, os.path.join(os.path.dirname(DATABASE), STATION_DIR),
+                                          init_schema, DEFAULT_STATION_ID, busy_timeout=BUSY_TIMEOUT,
+                                          max_stations=MAX_STATIONS)
+    return registry
+
+def start_shard_writer(station_id, path):
+    """
+    Starts the group-commit writer for one station's shard, and its retention job.
+    """
+    shard_writer = GroupCommitWriter(
+        path,
+        sync_mode=SYNC_MODE,
+        max_group_events=GROUP_MAX_EVENTS,
+        max_delay=GROUP_MAX_DELAY,
+        queue_size=WRITE_QUEUE_SIZE,
+        dedup_cache_size=DEDUP_CACHE_SIZE,
+        busy_timeout=BUSY_TIMEOUT,
+        labels={"station": station_id},
+    ).start()
+    if RETENTION_DAYS > 0:
+        archive_dir = ARCHIVE_DIR if station_id == DEFAULT_STATION_ID else os.path.join(ARCHIVE_DIR, station_id)
+        RetentionJob(path, archive_dir, RETENTION_DAYS, MINUTE_ROLLUP_DAYS, interval=RETENTION_INTERVAL).start()
+    return shard_writer
+
+def get_writer():
+    """
+    Returns the process-wide sharded writer (one group-commit writer per
+    station), starting it on first use.
+
+    In a web worker (WRITER_ENDPOINT set) this is a WriterClient for the
+    writer process instead, so there is still only one writer per shard.
+    """
+    global writer, writer_client
+    with writer_lock:
+        if WRITER_ENDPOINT:
+            if writer_client is None:
+                writer_client = WriterClient(WRITER_ENDPOINT)
+            return writer_client
+        if writer is None:
+            writer = shards.ShardedWriter(get_registry(), start_shard_writer)
+        return writer
+
+def read_connection(database=None):
+    """
+    Returns this thread's read-only connection to a shard (DATABASE by default), opening it on first use.
+
+    Reusing it across requests saves the open and schema parse per request;
+    WAL lets it read while the writer commits, and the busy timeout rides out
+    the short exclusive locks of checkpoints.
+    """
+    database = database or DATABASE
+    conns = getattr(read_connections, "conns", None)
+    if conns is None:
+        conns = read_connections.conns = {}
+    conn = conns.get(database)
+    if conn is None:
+        conn = sqlite3.connect(database, timeout=BUSY_TIMEOUT)
+        conn.execute("PRAGMA query_only = ON")
+        conns[database] = conn
+    return conn
+
+def requested_stations():
+    """
+    Returns the (station_id, path) shards a read covers: the station_id query
+    parameter's (none if that station has no events yet), or every station's.
+    """
+    stations = get_registry().stations(read_connection())
+    station_id = request.args.get("station_id", "").lower()
+    if station_id:
+        return [station for station in stations if station[0] == station_id]
+    return stations
+
+def fan_out(stations, work):
+    """
+    Runs work(station_id, conn) on every shard in parallel, each on a read connection of its own thread.
+
+    Returns:
+        list: work's results, in the order of stations
+    """
+    global fanout_pool
+
+    def timed_work(station):
+        station_id, path = station
+        with metrics.histogram("waterlog_shard_query_seconds", "Time spent reading one shard for a request",
+                               station=station_id).time():
+            return work(station_id, read_connection(path))
+
+    if len(stations) == 1:
+        return [timed_work(stations[0])]
+
+    with fanout_lock:
+        if fanout_pool is None:
+            fanout_pool = ThreadPoolExecutor(FANOUT_THREADS, thread_name_prefix="waterlog-fanout")
+    return list(fanout_pool.map(timed_work, stations))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Times every request by endpoint and counts its responses by status."""
+    endpoint = request.endpoint or "unmatched"
+    started = g.pop("request_started", None)
+    if started is not None:
+        # Streamed responses (/export) are timed to their first byte
+        metrics.histogram("waterlog_http_request_seconds", "HTTP request handling time",
+                          endpoint=endpoint, method=request.method).observe(time.perf_counter() - started)
+    metrics.counter("waterlog_http_responses_total", "HTTP responses by status",
+                    endpoint=endpoint, status=response.status_code).inc()
+    return response
+
+def is_number(value):
+    """
+    True for a finite float or an int SQLite can store (bools and numeric strings don't count).
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    if isinstance(value, int):
+        return SQLITE_INT_MIN <= value <= SQLITE_INT_MAX
+    return math.isfinite(value)
+
+def event_to_row(event):
+    """
+    Validates an event dict and converts it to an insert row.
+
+    Returns:
+        tuple | None: The row, or None if the event is missing required fields, has a
+            non-numeric or non-finite timestamp or volume, or carries a malformed
+            event_id, station_id or astronaut_id
+    """
+    if not isinstance(event, dict):
+        return None
+
+    event_type = event.get("event_type")
+    timestamp = event.get("timestamp")
+    event_id = event.get("event_id")
+    station_id = event.get("station_id")
+    astronaut_id = event.get("astronaut_id")
+    planet_name = event.get("planet_name")
+
+    if not event_type or not isinstance(event_type, str) or not timestamp or not is_number(timestamp):
+        return None
+    # The rollups and tank state do arithmetic on these as they are committed
+    if any(event.get(field) is not None and not is_number(event[field]) for field in ("waste_volume", "water_added")):
+        return None
+    if planet_name is not None and not isinstance(planet_name, str):
+        return None
+    if event_id is not None and (not isinstance(event_id, str) or not 0 < len(event_id) <= EVENT_ID_MAX_LENGTH):
+        return None
+    if station_id is None:
+        station_id = DEFAULT_STATION_ID
+    elif not isinstance(station_id, str) or not STATION_ID_PATTERN.fullmatch(station_id):
+        return None
+    else:
+        # "Mars" and "mars" are one station (and one file on case-insensitive filesystems)
+        station_id = station_id.lower()
+        if STATIONS and station_id not in STATIONS and station_id != DEFAULT_STATION_ID:
+            return None
+    if astronaut_id is not None and (not isinstance(astronaut_id, str) or not 0 < len(astronaut_id) <= ASTRONAUT_ID_MAX_LENGTH):
+        return None
+
+    return (event_type, event.get("waste_volume"), event.get("water_added"), planet_name, timestamp,
+            event_id, station_id, astronaut_id)
+
+def row_to_event(row):
+    """
+    Converts a row selected with EVENT_COLUMNS back into an event dict.
+    """
+    return {"id": row[0], "event_type": row[1], "waste_volume": row[2], "water_added": row[3],
+            "planet_name": row[4], "timestamp": row[5], "event_id": row[6], "station_id": row[7],
+            "astronaut_id": row[8]}
+
+def query_arg(name, cast):
+    """
+    Returns a query parameter converted with cast, or None if it is absent.
+
+    Raises:
+        ValueError: The parameter is present but cannot be converted
+    """
+    value = request.args.get(name)
+    return cast(value) if value not in (None, "") else None
+
+def finite_float(value):
+    """
+    float() for query parameters that must be real numbers.
+
+    Raises:
+        ValueError: value is not a number, or is nan or infinite
+    """
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+def query_flag(name):
+    """Returns True if a boolean query parameter is set ("1", "true" or "yes")."""
+    return request.args.get(name, "").lower() in ("1", "true", "yes")
+
+def event_filters():
+    """
+    Builds WHERE clauses for the event_type, astronaut_id, since, until and max_id query parameters.
+
+    Returns:
+        tuple: (clauses, params) ready to be AND-ed into a query
+
+    Raises:
+        ValueError: since or until is not a finite number, or max_id is not an integer
+    """
+    clauses = []
+    params = []
+
+    event_type = request.args.get("event_type")
+    astronaut_id = request.args.get("astronaut_id")
+    since = query_arg("since", finite_float)
+    until = query_arg("until", finite_float)
+    max_id = query_arg("max_id", int)
+
+    if event_type:
+        clauses.append("event_type = ?")
+        params.append(event_type)
+    if astronaut_id:
+        clauses.append("astronaut_id = ?")
+        params.append(astronaut_id)
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("timestamp < ?")
+        params.append(until)
+    if max_id is not None:
+        clauses.append("id <= ?")
+        params.append(max_id)
+
+    return clauses, params
+
+def parse_history_cursor(cursor):
+    """
+    Parses a /history cursor of the form "<timestamp>:<id>".
+
+    Raises:
+        ValueError: The cursor is malformed
+    """
+    if not cursor:
+        return None
+    timestamp, _, event_id = cursor.rpartition(":")
+    return float(timestamp), int(event_id)
+
+def write_events(events, rows):
+    """
+    Hands validated events to the writer and waits until they are durable.
+
+    Args:
+        events (list): The events as received (a web worker forwards these to the writer process)
+        rows (list): Their insert rows from event_to_row (the in-process writer takes these)
+
+    Returns:
+        dict: The writer's receipt (see WriteRequest.receipt())
+
+    Raises:
+        ValueError, queue.Full, TimeoutError, sqlite3.Error: As GroupCommitWriter.write / WriterClient.write
+    """
+    if WRITER_ENDPOINT:
+        return get_writer().write(events, timeout=WRITE_TIMEOUT)
+    return get_writer().write(rows, timeout=WRITE_TIMEOUT).receipt()
+
+def store_events(events):
+    """
+    Validates events and waits until the writer has made them durable.
+
+    Returns:
+        tuple: (receipt, None) once committed, or (None, error response); see
+        WriteRequest.receipt() for the receipt's fields
+    """
+    rows = [event_to_row(event) for event in events]
+    if None in rows:
+        return None, (jsonify({"error": "Invalid event data"}), 400)
+
+    try:
+        receipt = write_events(events, rows)
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    except queue.Full:
+        return None, (jsonify({"error": "WaterLog is overloaded, retry later"}), 503)
+    except TimeoutError as e:
+        return None, (jsonify({"error": str(e)}), 503)
+    except (sqlite3.Error, TypeError, OverflowError) as e:
+        return None, (jsonify({"error": str(e)}), 500)
+    return receipt, None
+
+@app.route('/log', methods=['POST'])
+def log_event():
+    """
+    Logs an astronaut activity event (Flush, Water Refill, Planet Visit).
+    """
+    data = request.json
+
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid data format, expected a single event object"}), 400
+
+    receipt, error = store_events([data])
+    if error:
+        return error
+
+    # A retry of an already stored event_id succeeds with the stored id
+    event_id = receipt["ids"][0] if receipt["duplicates"] else receipt["first_id"]
+    return jsonify({"status": "Event logged successfully", "id": event_id, "duplicate": bool(receipt["duplicates"])}), 201
+
+
+@app.route('/history', methods=['GET'])
+def get_history():
+    """
+    Retrieves stored events one page at a time.
+
+    Query params:
+        limit (int): Max events per page (default HISTORY_DEFAULT_LIMIT)
+        station_id (str): Only return this station's events (default: every station)
+        event_type (str): Only return events of this type
+        astronaut_id (str): Only return this astronaut's events
+        since / until (float): Only return events with since <= timestamp < until
+        max_id (int): Only return events with id <= max_id (a consistent snapshot of one station)
+        since_id (int): Incremental mode, only events with id > since_id, oldest first;
+            requires station_id, since ids only order one station's events
+        cursor (str): The next_cursor from a previous page (newest-first mode only)
+        count (bool): Also return "total", the number of events matching the filters
+
+    Returns newest-first pages unless since_id is given. Poll a station for new
+    events by passing the returned last_id back as since_id with the same station_id.
+
+    Each station's shard assigns ids from its own range, so ids only increase
+    in commit order within a station. Newest-first pages across every station
+    are queried from all shards in parallel and merged by (timestamp, id);
+    latest_id is then the highest id of any shard.
+    """
+    try:
+        limit = min(int(request.args.get("limit", HISTORY_DEFAULT_LIMIT)), HISTORY_MAX_LIMIT)
+        since_id = query_arg("since_id", int)
+        cursor = parse_history_cursor(request.args.get("cursor"))
+        clauses, params = event_filters()
+        count = query_flag("count")
+    except ValueError:
+        return jsonify({"error": "Invalid query parameters"}), 400
+
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    if since_id is not None and not request.args.get("station_id"):
+        # A cursor from one shard says nothing about the others' ids
+        return jsonify({"error": "since_id requires station_id"}), 400
+
+    stations = requested_stations()
+
+    # The total ignores since_id/cursor so it describes the whole filtered history
+    count_where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    count_params = list(params)
+
+    if since_id is not None:
+        clauses.append("id > ?")
+        params.append(since_id)
+        order = "id ASC"
+    else:
+        if cursor:
+            # Keyset pagination: resume strictly after the last (timestamp, id) we returned
+            clauses.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([cursor[0], cursor[0], cursor[1]])
+        order = "timestamp DESC, id DESC"
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    def query_shard(station_id, conn):
+        c = conn.cursor()
+        # Fetch one extra row to learn whether another page exists
+        c.execute(f"SELECT {EVENT_COLUMNS} FROM events {where} ORDER BY {order} LIMIT ?", params + [limit + 1])
+        rows = c.fetchall()
+        latest_id = c.execute("SELECT MAX(id) FROM events").fetchone()[0]
+        total = c.execute(f"SELECT COUNT(*) FROM events {count_where}", count_params).fetchone()[0] if count else None
+        c.close()
+        return rows, latest_id, total
+
+    results = fan_out(stations, query_shard) if stations else []
+
+    # Each shard's page is already sorted, so merging keeps the first limit + 1 rows overall
+    rows = list(heapq.merge(*(shard_rows for shard_rows, _, _ in results),
+                            key=lambda row: row[0] if since_id is not None else (row[5], row[0]),
+                            reverse=since_id is None))[:limit + 1]
+    latest_id = max((shard_latest for _, shard_latest, _ in results if shard_latest is not None), default=None)
+    total = sum(shard_total for _, _, shard_total in results) if count else None
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    events = [row_to_event(row) for row in rows]
+
+    if since_id is not None:
+        last_id = rows[-1][0] if rows else since_id
+        next_cursor = None
+    else:
+        last_id = max((row[0] for row in rows), default=None)
+        next_cursor = f"{rows[-1][5]!r}:{rows[-1][0]}" if has_more else None
+
+    result = {
+        "events": events,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "last_id": last_id,
+        "latest_id": latest_id,
+    }
+    if count:
+        result["total"] = total
+    return jsonify(result)
+
+@app.route('/export', methods=['GET'])
+def export_events():
+    """
+    Streams matching events as newline-delimited JSON, oldest first.
+
+    Query params:
+        station_id, event_type, astronaut_id, since, until: Same filters as /history
+        since_id (int): Only export events with id > since_id (requires station_id)
+        gzip (bool): Compress the stream ("1"/"true"), served as application/gzip
+
+    Rows are read EXPORT_FETCH_SIZE at a time, so memory stays flat no matter
+    how large the table is and consumers get the first rows immediately.
+    Without station_id the stations' shards are exported one after another.
+    """
+    try:
+        since_id = query_arg("since_id", int)
+        clauses, params = event_filters()
+    except ValueError:
+        return jsonify({"error": "Invalid query parameters"}), 400
+
+    if since_id is not None:
+        if not request.args.get("station_id"):
+            return jsonify({"error": "since_id requires station_id"}), 400
+        clauses.append("id > ?")
+        params.append(since_id)
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"SELECT {EVENT_COLUMNS} FROM events {where} ORDER BY id ASC"
+    compress = query_flag("gzip")
+    paths = [path for _, path in requested_stations()]
+
+    def generate_lines():
+        for path in paths:
+            # Its own connection: the stream can outlive the request that started it
+            conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+            try:
+                c = conn.execute(query, params)
+                while True:
+                    rows = c.fetchmany(EXPORT_FETCH_SIZE)
+                    if not rows:
+                        break
+                    yield "".join(json.dumps(row_to_event(row), separators=(",", ":")) + "\n" for row in rows).encode()
+            finally:
+                conn.close()
+
+    def generate_gzip():
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # gzip container
+        for chunk in generate_lines():
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    if compress:
+        return Response(generate_gzip(), mimetype="application/gzip",
+                        headers={"Content-Disposition": "attachment; filename=events.ndjson.gz"})
+    return Response(generate_lines(), mimetype="application/x-ndjson")
+
+# Each shard's buckets are computed by SQLite over an index range scan of the window;
+# the shards' buckets are then summed per slot and the running totals taken in Python
+STATS_FROM_EVENTS = '''
+    SELECT CAST((timestamp - :since) / :resolution AS INTEGER) AS slot,
+           SUM(event_type = 'flush') AS flushes,
+           SUM(event_type = 'water_refill') AS refills,
+           SUM(CASE WHEN event_type = 'flush' THEN COALESCE(waste_volume, 0) ELSE 0 END) AS waste_volume,
+           SUM(CASE WHEN event_type = 'water_refill' THEN COALESCE(water_added, 0) ELSE 0 END) AS water_added
+    FROM events
+    WHERE timestamp >= :since AND timestamp < :until {filters}
+    GROUP BY slot
+'''
+
+STATS_FROM_ROLLUP = '''
+    SELECT CAST((bucket - :since) / :resolution AS INTEGER) AS slot,
+           SUM(CASE WHEN event_type = 'flush' THEN count ELSE 0 END) AS flushes,
+           SUM(CASE WHEN event_type = 'water_refill' THEN count ELSE 0 END) AS refills,
+           SUM(CASE WHEN event_type = 'flush' THEN waste_volume ELSE 0 END) AS waste_volume,
+           SUM(CASE WHEN event_type = 'water_refill' THEN water_added ELSE 0 END) AS water_added
+    FROM {table}
+    WHERE bucket >= :since AND bucket < :until
+    GROUP BY slot
+'''
+
+def stats_source(resolution):
+    """Returns the coarsest rollup (table, width) whose buckets divide resolution, or None for raw events."""
+    for table, width in sorted(rollups.ROLLUPS.items(), key=lambda item: -item[1]):
+        if resolution % width == 0:
+            return table, width
+    return None
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """
+    Summarizes flushes and refills over a time window in fixed-size buckets, oldest first.
+
+    Query params:
+        window (float): Seconds covered, ending at until (default STATS_DEFAULT_WINDOW)
+        resolution (float): Seconds per bucket (default STATS_DEFAULT_RESOLUTION)
+        until (float): End of the window (default now)
+        station_id (str): Only count this station's events (default: every station, shards queried in parallel)
+        astronaut_id (str): Only count this astronaut's events (scans the events table)
+        raw (bool): Always scan the events table instead of the rollups
+
+    Each bucket holds its counts and volumes plus the cumulative flush-to-refill
+    ratio since the start of the window (null until the first refill). Empty
+    buckets are omitted.
+
+    Resolutions in whole minutes (or hours) are answered from the rollup tables;
+    the window is then widened to whole minutes (or hours) at both ends.
+    """
+    try:
+        window = query_arg("window", finite_float) or STATS_DEFAULT_WINDOW
+        resolution = query_arg("resolution", finite_float) or STATS_DEFAULT_RESOLUTION
+        until = query_arg("until", finite_float) or time.time()
+    except ValueError:
+        return jsonify({"error": "Invalid query parameters"}), 400
+
+    if window <= 0 or resolution <= 0:
+        return jsonify({"error": "window and resolution must be positive"}), 400
+    if window / resolution > STATS_MAX_BUCKETS:
+        return jsonify({"error": f"At most {STATS_MAX_BUCKETS} buckets per request, use a coarser resolution"}), 400
+
+    since = until - window
+    astronaut_id = request.args.get("astronaut_id")
+    # The rollups don't break totals down by astronaut
+    source = None if query_flag("raw") or astronaut_id else stats_source(resolution)
+    query_params = {"since": since, "until": until, "resolution": resolution, "astronaut_id": astronaut_id}
+
+    if source:
+        table, width = source
+        since = query_params["since"] = since // width * width
+        until = query_params["until"] = -(-until // width) * width
+        query = STATS_FROM_ROLLUP.format(table=table)
+    else:
+        table = "events"
+        query = STATS_FROM_EVENTS.format(filters="AND astronaut_id = :astronaut_id" if astronaut_id else "")
+
+    stations = requested_stations()
+    results = fan_out(stations, lambda station_id, conn: conn.execute(query, query_params).fetchall()) if stations else []
+
+    slots = {}
+    for rows in results:
+        for slot, *values in rows:
+            sums = slots.setdefault(slot, [0, 0, 0, 0])
+            for position, value in enumerate(values):
+                sums[position] += value
+
+    buckets = []
+    totals = {"flushes": 0, "refills": 0, "waste_volume": 0, "water_added": 0}
+    for slot in sorted(slots):
+        flushes, refills, waste_volume, water_added = slots[slot]
+        totals["flushes"] += flushes
+        totals["refills"] += refills
+        totals["waste_volume"] += waste_volume
+        totals["water_added"] += water_added
+        buckets.append({
+            "start": since + slot * resolution,
+            "flushes": flushes,
+            "refills": refills,
+            "waste_volume": waste_volume,
+            "water_added": water_added,
+            "ratio": totals["flushes"] / totals["refills"] if totals["refills"] else None,
+        })
+
+    totals["ratio"] = totals["flushes"] / totals["refills"] if totals["refills"] else None
+
+    return jsonify({
+        "since": since,
+        "until": until,
+        "resolution": resolution,
+        "source": table,
+        "buckets": buckets,
+        "totals": totals,
+    })
+
+@app.route('/state', methods=['GET'])
+def get_state():
+    """
+    Returns a station's live tank state: water level and status, cumulative waste,
+    water and flush/refill counts, and flush/refill ratios over sliding windows.
+
+    Query params:
+        station_id (str): The station whose tank is described (default DEFAULT_STATION_ID)
+
+    "stations" summarizes every station's tank (level and status). The states are
+    maintained as events commit, so this never scans the event history.
+    """
+    station_id = request.args.get("station_id", "").lower() or DEFAULT_STATION_ID
+    now = time.time()
+    stations = get_registry().stations(read_connection())
+    summaries = dict(zip((station for station, _ in stations),
+                         fan_out(stations, lambda station, conn: tank_state.summarize(conn))))
+
+    path = dict(stations).get(station_id)
+    state = tank_state.describe(read_connection(path) if path else None, now)
+    return jsonify({**state, "station_id": station_id, "stations": summaries})
+
+@app.route('/clear', methods=['POST'])
+def clear_database():
+    """
+    Clears all records from the events table of every station's shard, or only
+    of the station named by the station_id query parameter.
+    """
+    # The writers notice this outside write and drop their caches of recent event ids
+    for _, path in requested_stations():
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        c = conn.cursor()
+        c.execute("DELETE FROM events")  # Remove all data
+        rollups.clear(conn)
+        tank_state.reset(conn)
+        conn.commit()
+        conn.close()
+
+    return jsonify({"status": "Database cleared"}), 200
+
+@app.route('/log_batch', methods=['POST'])
+def log_batch_events():
+    """
+    Logs multiple astronaut activity events in a single batch.
+    """
+    data = request.json
+
+    if not isinstance(data, list):
+        return jsonify({"error": "Invalid data format, expected a list of events"}), 400
+
+    # Each station's part of the batch rides in one group of its shard's writer, so it commits atomically
+    receipt, error = store_events(data)
+    if error:
+        return error
+
+    # A single station's new ids are assigned contiguously in batch order; "ids" is added
+    # when some events were duplicates or the batch spans several stations
+    return jsonify({"status": "Batch events logged successfully", **receipt}), 201
+
+@app.route('/import', methods=['POST'])
+def import_events():
+    """
+    Imports a CSV or NDJSON request body in bulk (see bulk_import.py).
+
+    Query params:
+        format (str): "csv" or "ndjson" (default: csv for a text/csv body, otherwise ndjson)
+        gzip (bool): The body is gzip-compressed (e.g. a saved /export?gzip=1)
+
+    Rows go to the writer in chunks of bulk_import.WRITER_CHUNK_ROWS, like any other write, so
+    the import never holds the database lock for long or touches the indexes (for those, run
+    bulk_import.py by hand). Invalid rows are skipped and counted; rows whose event_id is
+    already stored are skipped as duplicates. Rows go to their station's shard, which is
+    created on first use. If a chunk fails, the error response reports what was imported before it.
+    """
+    fmt = request.args.get("format") or ("csv" if request.mimetype == "text/csv" else "ndjson")
+    if fmt not in bulk_import.FORMATS:
+        return jsonify({"error": f"format must be one of {bulk_import.FORMATS}"}), 400
+
+    events = bulk_import.read_events(bulk_import.text_lines(request.stream, query_flag("gzip")), fmt)
+    report = bulk_import.new_report()
+    try:
+        bulk_import.import_through_writer(events, event_to_row, write_events, report=report)
+    except (queue.Full, TimeoutError) as e:  # Before OSError, which TimeoutError subclasses
+        return jsonify({"error": str(e) or "WaterLog is overloaded, retry later", **report}), 503
+    except (OSError, EOFError, UnicodeDecodeError) as e:  # Truncated or not actually gzip/utf-8
+        return jsonify({"error": f"Unreadable import body: {e}", **report}), 400
+    except ValueError as e:  # The writer rejected a chunk as invalid
+        return jsonify({"error": str(e), **report}), 400
+    except (sqlite3.Error, TypeError, OverflowError) as e:
+        return jsonify({"error": str(e), **report}), 500
+
+    return jsonify({"status": "Events imported", **report}), 201
+
+@app.route('/writer_stats', methods=['GET'])
+def get_writer_stats():
+    """
+    Reports group-commit throughput (commits/sec, mean group size) for tuning,
+    summed over the shards' writers and per station under "stations".
+    """
+    try:
+        return jsonify(get_writer().stats(timeout=WRITE_TIMEOUT) if WRITER_ENDPOINT else get_writer().stats())
+    except TimeoutError as e:  # The writer process didn't answer
+        return jsonify({"error": str(e)}), 503
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Serves this process's metrics in the Prometheus text format (?format=json for JSON).
+
+    Under gunicorn the answering worker reports its own HTTP and shard query
+    metrics (workers don't share them), followed by the writer process's
+    commit and ingest metrics, fetched over the writer socket.
+    """
+    as_json = request.args.get("format") == "json"
+    worker = metrics.REGISTRY.snapshot() if as_json else metrics.REGISTRY.render()
+    if not WRITER_ENDPOINT:
+        # json.dumps rather than jsonify, which would sort the histogram buckets as strings
+        return Response(json.dumps(worker), mimetype="application/json") if as_json else Response(worker, mimetype="text/plain")
+
+    try:
+        writer_metrics = get_writer().metrics(timeout=WRITE_TIMEOUT)
+    except TimeoutError as e:  # The writer process didn't answer
+        return jsonify({"error": str(e)}), 503
+    if as_json:
+        return Response(json.dumps({"worker": {"pid": os.getpid(), **worker}, "writer": writer_metrics["metrics"]}),
+                        mimetype="application/json")
+    return Response(f"# Worker pid {os.getpid()}\n{worker}# Writer process\n{writer_metrics['text']}",
+                    mimetype="text/plain")
+
+def start_writer_process(ingest_endpoints):
+    """
+    Starts this process's writer side: a group-commit writer and retention job
+    per registered station (new stations get theirs on first use) and the
+    ZeroMQ ingest socket(s).
+    """
+    conn = sqlite3.connect(DATABASE, timeout=BUSY_TIMEOUT)
+    stations = get_registry().stations(conn)
+    conn.close()
+    for station_id, _ in stations:
+        get_writer().writer(station_id)
+    if ingest_endpoints:
+        ZmqIngestServer(ingest_endpoints, get_writer, event_to_row).start()
+
+
+def serve(workers, threads):
+    """
+    Serves the API for production: this process owns the writer, while
+    `workers` gunicorn processes with `threads` threads each answer HTTP and
+    forward their writes here over WRITER_BIND.
+
+    Without gunicorn (or with workers=0) the API is served by threads of this process.
+
+    Returns:
+        int: Exit code for this process; nonzero when gunicorn exited on its own, so
+            main_program's supervisor restarts WaterLog (SIGTERM exits with 0 instead)
+    """
+    endpoints = [ZMQ_INGEST_ENDPOINT] if ZMQ_INGEST_ENDPOINT else []
+
+    if workers <= 0 or importlib.util.find_spec("gunicorn") is None:
+        if workers > 0:
+            print("⚠️ gunicorn is not installed, serving with threads from a single process")
+        start_writer_process(endpoints)
+        app.run(host='0.0.0.0', port=PORT, threaded=True)
+        return 0
+
+    start_writer_process(endpoints + [WRITER_BIND])
+    command = [
+        sys.executable, "-m", "gunicorn", "water_log:app",
+        "--bind", f"0.0.0.0:{PORT}",
+        "--workers", str(workers),
+        "--threads", str(threads),
+        "--worker-class", "gthread",
+        "--pythonpath", os.path.dirname(os.path.abspath(__file__)),
+    ]
+    env = {**os.environ, "WATERLOG_WRITER_ENDPOINT": WRITER_BIND.replace("*", "127.0.0.1")}
+    print(f"🚀 WaterLog: {workers} workers x {threads} threads on port {PORT}, single writer in pid {os.getpid()}")
+
+    # Stop the workers along with this process (main_program sends SIGTERM); SystemExit(0) unwinds through the finally
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server = subprocess.Popen(command, env=env)
+    try:
+        code = server.wait()
+        print(f"💥 gunicorn exited on its own (exit code {code})")
+    finally:
+        server.terminate()
+        server.wait()
+        get_writer().close(timeout=WRITE_TIMEOUT)
+    return code if code > 0 else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the WaterLog API")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="gunicorn worker processes (0 serves threads from this process)")
+    parser.add_argument("--threads", type=int, default=THREADS, help="request threads per worker")
+    parser.add_argument("--dev", action="store_true", help="Flask development server with the debugger and reloader")
+    args = parser.parse_args()
+
+    init_db()
+
+    if not args.dev:
+        sys.exit(serve(args.workers, args.threads))
+
+    # With the debug reloader, only the serving child process may bind the ingest socket or run retention
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_writer_process([ZMQ_INGEST_ENDPOINT] if ZMQ_INGEST_ENDPOINT else [])
+
+    app.run(host='0.0.0.0', port=PORT, debug=True)
@@ -0,0 +1,230 @@
+"""
+ZeroMQ Ingest Channel for WaterLog
+
+- Internal hot path for LiveTrack: event batches arrive on a ROUTER socket
+  instead of HTTP, skipping Flask request parsing entirely
+- Feeds the same group-commit writer as /log and /log_batch
+- Every batch is acknowledged once it is durable (or rejected)
+- In production serving, WaterLog's web workers also write through it
+  (WriterClient), so a single writer process owns all inserts
+
+Wire format (multipart):
+    request:  [request_id, payload]          payload = events encoded with event_codec
+    reply:    [request_id, status]           status  = JSON {"status": <http-like code>, ...}
+
+Accepted batches are acknowledged with the ids they were assigned. Events of
+one station get contiguous ids in batch order:
+{"status": 201, "first_id": <id>, "count": <n>, "duplicates": 0}.
+If some events were already stored (same event_id), "duplicates" counts them and
+"ids" lists every event's id, the stored one for duplicates. Batches spanning
+several stations are committed per station shard and always list "ids".
+
+A payload of STATS_REQUEST is answered with the writer's stats instead: {"status": 200, ...},
+and METRICS_REQUEST with this process's metrics: {"status": 200, "text": <Prometheus text>, "metrics": {...}}.
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+import zmq
+
+import event_codec
+import metrics
+
+STATS_REQUEST = b"?stats"
+METRICS_REQUEST = b"?metrics"
+
+
+class ZmqIngestServer:
+    """
+    Receives event batches over ZeroMQ and acknowledges them after commit.
+
+    Args:
+        endpoint (str | list): Address(es) to bind (e.g. "tcp://*:5557")
+        get_writer (callable): Returns the (sharded) writer to submit rows to
+        event_to_row (callable): Validates an event dict, returning a row or None
+    """
+
+    def __init__(self, endpoint, get_writer, event_to_row):
+        self.endpoints = [endpoint] if isinstance(endpoint, str) else list(endpoint)
+        self.get_writer = get_writer
+        self.event_to_row = event_to_row
+        self._running = False
+        self._thread = threading.Thread(target=self._run, name="waterlog-zmq-ingest", daemon=True)
+        self._ack_latency = metrics.histogram("waterlog_ingest_ack_seconds",
+                                              "Time from receiving a ZeroMQ batch to acknowledging it")
+        self._batch_size = metrics.histogram("waterlog_ingest_batch_events", "Events per ZeroMQ batch",
+                                             metrics.SIZE_BUCKETS)
+
+    def start(self):
+        """Binds the socket in a background thread and returns the server."""
+        self._running = True
+        self._thread.start()
+        return self
+
+    def close(self, timeout=None):
+        """Stops accepting batches; already committed ones have been acknowledged."""
+        self._running = False
+        self._thread.join(timeout)
+
+    def _run(self):
+        context = zmq.Context.instance()
+        socket = context.socket(zmq.ROUTER)
+        socket.setsockopt(zmq.LINGER, 1000)
+        for endpoint in self.endpoints:
+            socket.bind(endpoint)
+
+        poller = zmq.Poller()
+        poller.register(socket, zmq.POLLIN)
+
+        # Each station's writer commits on its own, so any pending batch may finish first
+        pending = []
+
+        while self._running:
+            # Poll briefly while commits are outstanding so acks go out promptly
+            ready = dict(poller.poll(1 if pending else 100))
+
+            if socket in ready:
+                while True:
+                    try:
+                        frames = socket.recv_multipart(zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    self._accept(socket, frames, pending)
+
+            if pending:
+                still_pending = []
+                for identity, request_id, write_request, received_at in pending:
+                    if not write_request.done.is_set():
+                        still_pending.append((identity, request_id, write_request, received_at))
+                        continue
+                    if write_request.error is not None:
+                        self._reply(socket, identity, request_id, {"status": 500, "error": str(write_request.error)})
+                    else:
+                        self._reply(socket, identity, request_id, {"status": 201, **write_request.receipt()})
+                    self._ack_latency.observe(time.perf_counter() - received_at)
+                pending = still_pending
+
+        socket.close()
+
+    def _accept(self, socket, frames, pending):
+        """Validates one incoming batch and hands it to the writer without blocking."""
+        if len(frames) != 3:
+            return  # Not a well-formed [identity, request_id, payload] message
+
+        identity, request_id, payload = frames
+        received_at = time.perf_counter()
+
+        if payload == STATS_REQUEST:
+            self._reply(socket, identity, request_id, {"status": 200, **self.get_writer().stats()})
+            return
+        if payload == METRICS_REQUEST:
+            self._reply(socket, identity, request_id, {"status": 200, "text": metrics.REGISTRY.render(),
+                                                       "metrics": metrics.REGISTRY.snapshot()})
+            return
+
+        try:
+            events = event_codec.decode_events(payload)
+        except event_codec.CodecError as e:
+            self._reply(socket, identity, request_id, {"status": 400, "error": f"Undecodable payload: {e}"})
+            return
+
+        rows = [self.event_to_row(event) for event in events]
+        if None in rows:
+            self._reply(socket, identity, request_id, {"status": 400, "error": "Invalid event data"})
+            return
+
+        try:
+            pending.append((identity, request_id, self.get_writer().submit(rows, timeout=0), received_at))
+        except queue.Full:
+            self._reply(socket, identity, request_id, {"status": 503, "error": "WaterLog is overloaded, retry later"})
+            return
+        except ValueError as e:  # e.g. shards.StationLimitError
+            self._reply(socket, identity, request_id, {"status": 400, "error": str(e)})
+            return
+        self._batch_size.observe(len(rows))
+
+    def _reply(self, socket, identity, request_id, reply):
+        metrics.counter("waterlog_ingest_replies_total", "ZeroMQ ingest replies by status", status=reply["status"]).inc()
+        socket.send_multipart([identity, request_id, json.dumps(reply).encode()])
+
+
+class WriterClient:
+    """
+    Hands events to the writer process's ingest socket and waits for the commit.
+
+    Used by WaterLog's web workers, so every insert goes through one writer no
+    matter how many worker processes serve HTTP. Safe to share between threads:
+    each thread gets its own socket.
+
+    Args:
+        endpoint (str): The writer process's ingest address (e.g. "tcp://127.0.0.1:5559")
+        codec (str): event_codec codec for the batches
+    """
+
+    def __init__(self, endpoint, codec="struct"):
+        self.endpoint = endpoint
+        self.codec = codec
+        self._local = threading.local()
+
+    def write(self, events, timeout=None):
+        """
+        Sends events and blocks until the writer has committed them.
+
+        Returns:
+            dict: The writer's receipt (first_id, count, duplicates and, with duplicates or
+                several stations, ids)
+
+        Raises:
+            ValueError: The writer rejected the events as invalid
+            queue.Full: The writer is saturated
+            TimeoutError: No acknowledgement arrived in time
+            sqlite3.Error: The events could not be committed
+        """
+        reply = self._request(event_codec.encode_events(events, self.codec), timeout)
+        status = reply.pop("status")
+        if status == 201:
+            return reply
+        if status == 400:
+            raise ValueError(reply.get("error"))
+        if status == 503:
+            raise queue.Full(reply.get("error"))
+        raise sqlite3.OperationalError(reply.get("error"))
+
+    def stats(self, timeout=None):
+        """Returns the writer's ShardedWriter.stats()."""
+        reply = self._request(STATS_REQUEST, timeout)
+        reply.pop("status")
+        return reply
+
+    def metrics(self, timeout=None):
+        """Returns the writer process's metrics: {"text": Prometheus text, "metrics": snapshot dict}."""
+        reply = self._request(METRICS_REQUEST, timeout)
+        reply.pop("status")
+        return reply
+
+    def _request(self, payload, timeout):
+        socket = getattr(self._local, "socket", None)
+        if socket is None:
+            socket = self._local.socket = zmq.Context.instance().socket(zmq.DEALER)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.connect(self.endpoint)
+
+        request_id = uuid.uuid4().bytes
+        socket.send_multipart([request_id, payload])
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and (remaining <= 0 or not socket.poll(remaining * 1000)):
+                # Drop the socket so the abandoned request isn't delivered again on reconnect
+                socket.close()
+                self._local.socket = None
+                raise TimeoutError(f"No ack from the writer at {self.endpoint} within {timeout}s")
+            reply_id, reply = socket.recv_multipart()
+            if reply_id == request_id:
+                return json.loads(reply)
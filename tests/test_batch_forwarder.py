@@ -0,0 +1,125 @@
+"""
+Tests for LiveTrack's batch forwarder: the overflow policies applied when WaterLog falls behind.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "microservices", "LiveTrack"))
+sys.path.append(os.path.join(ROOT, "microservices", "Common"))
+
+from batch_forwarder import BatchForwarder
+
+
+def event(n):
+    return {"event_type": "flush", "waste_volume": n, "timestamp": 1700000000.0 + n}
+
+
+class FakeWaterLog:
+    """Stands in for BatchForwarder._deliver: stores batches, optionally only once released."""
+
+    def __init__(self):
+        self.batches = []
+        self.released = threading.Event()
+        self.released.set()
+
+    def deliver(self, events):
+        self.released.wait(5)
+        first_id = sum(len(batch) for batch in self.batches) + 1
+        self.batches.append(list(events))
+        return 201, {"first_id": first_id, "count": len(events), "duplicates": 0}
+
+    def volumes(self):
+        return [e["waste_volume"] for batch in self.batches for e in batch]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def forwarder(tmp_path, **options):
+    waterlog = FakeWaterLog()
+    forwarder = BatchForwarder("http://waterlog.invalid", batch_size=2, max_age=0.01, queue_size=3,
+                               spill_path=str(tmp_path / "spill.ndjson"), **options)
+    forwarder._deliver = waterlog.deliver
+    return forwarder, waterlog
+
+
+def test_drop_oldest_keeps_the_newest_events(tmp_path):
+    fwd, waterlog = forwarder(tmp_path, overflow="drop_oldest")
+    for n in range(5):
+        fwd.submit(event(n))
+    assert fwd.stats()["events_dropped"] == 2 and fwd.stats()["queue_depth"] == 3
+
+    fwd.start().close(timeout=5)
+    assert waterlog.volumes() == [2, 3, 4]
+
+
+def test_spill_writes_overflow_to_disk_and_sends_it_once_the_queue_drains(tmp_path):
+    fwd, waterlog = forwarder(tmp_path, overflow="spill")
+    for n in range(5):
+        fwd.submit(event(n))
+    assert fwd.stats()["events_spilled"] == 2 and fwd.stats()["events_dropped"] == 0
+    with open(fwd.spill_path) as f:
+        assert [json.loads(line)["waste_volume"] for line in f] == [3, 4]
+
+    fwd.start()
+    try:
+        wait_for(lambda: len(waterlog.volumes()) == 5)
+    finally:
+        fwd.close(timeout=5)
+    assert waterlog.volumes() == [0, 1, 2, 3, 4]
+    assert not os.path.exists(fwd.spill_path) and not os.path.exists(fwd.spill_path + ".draining")
+    assert max(len(batch) for batch in waterlog.batches) <= fwd.batch_size
+
+
+def test_block_holds_the_receiver_until_there_is_room(tmp_path):
+    fwd, waterlog = forwarder(tmp_path, overflow="block")
+    waterlog.released.clear()  # WaterLog falls behind: the first delivery hangs
+    fwd.start()
+    try:
+        fwd.submit(event(0))
+        fwd.submit(event(1))
+        wait_for(lambda: fwd.stats()["queue_depth"] == 0)  # The first batch is out, stuck in delivery
+        for n in range(2, 5):
+            fwd.submit(event(n))
+
+        submitted = threading.Event()
+        receiver = threading.Thread(target=lambda: (fwd.submit(event(5)), submitted.set()))
+        receiver.start()
+        assert not submitted.wait(0.2)  # Queue full: the receiver waits instead of dropping
+
+        waterlog.released.set()
+        assert submitted.wait(5)
+        receiver.join(5)
+        wait_for(lambda: len(waterlog.volumes()) == 6)
+    finally:
+        waterlog.released.set()
+        fwd.close(timeout=5)
+
+    assert waterlog.volumes() == [0, 1, 2, 3, 4, 5]
+    assert fwd.stats()["events_dropped"] == 0 and fwd.stats()["events_spilled"] == 0
+
+
+def test_spill_keeps_undelivered_events_when_closing_during_an_outage(tmp_path):
+    fwd, waterlog = forwarder(tmp_path, overflow="spill")
+    fwd._deliver = lambda events: (503, {"error": "WaterLog is overloaded, retry later"})
+    fwd.start()
+    for n in range(3):
+        fwd.submit(event(n))
+    wait_for(lambda: fwd.stats()["queue_depth"] < 3)
+    fwd.close(timeout=5)
+
+    with open(fwd.spill_path) as f:
+        assert sorted(json.loads(line)["waste_volume"] for line in f) == [0, 1, 2]
+    assert fwd.stats()["events_sent"] == 0
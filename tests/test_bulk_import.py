@@ -0,0 +1,70 @@
+"""
+Tests for WaterLog's bulk import parsing.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import io
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "microservices", "WaterLog"))
+
+import bulk_import
+import water_log
+
+
+def read_csv(text):
+    return list(bulk_import.read_events(io.StringIO(text), "csv"))
+
+
+def test_csv_volumes_must_be_whole_finite_numbers():
+    events = read_csv("event_type,timestamp,waste_volume\n"
+                      "flush,1700000000,3\n"
+                      "flush,1700000000,3.0\n"
+                      "flush,1700000000,2.7\n"
+                      "flush,1700000000,inf\n"
+                      "flush,1700000000,nan\n"
+                      "flush,1700000000,lots\n")
+    assert events[0] == (2, {"event_type": "flush", "timestamp": 1700000000.0, "waste_volume": 3})
+    assert events[1][1]["waste_volume"] == 3
+    assert [event for _, event in events[2:]] == [None, None, None, None]
+
+
+def index_names(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+
+
+def test_deferring_indexes_is_refused_while_the_database_is_open(tmp_path, monkeypatch):
+    monkeypatch.setattr(water_log, "DATABASE", str(tmp_path / "water_log.db"))
+    monkeypatch.setattr(water_log, "registry", None)
+    water_log.init_db()
+    registry = water_log.get_registry()
+    indexes = index_names(water_log.DATABASE)
+    events = read_csv("event_type,timestamp,waste_volume\nflush,1700000000,3\n")
+
+    live = sqlite3.connect(water_log.DATABASE)  # e.g. the running WaterLog's writer
+    live.execute("SELECT COUNT(*) FROM events").fetchone()
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="in use"):
+            bulk_import.import_events(registry, iter(events), water_log.event_to_row, defer_indexes=True)
+        assert index_names(water_log.DATABASE) == indexes
+
+        # The default keeps the indexes, so it can run alongside
+        report = bulk_import.import_events(registry, iter(events), water_log.event_to_row)
+        assert report["imported"] == 1
+    finally:
+        live.close()
+
+    report = bulk_import.import_events(registry, iter(events), water_log.event_to_row, defer_indexes=True)
+    assert report["rows"] == 1
+    assert index_names(water_log.DATABASE) == indexes
@@ -0,0 +1,50 @@
+"""
+Regression tests for LiveTrack's disk spool recovery.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import glob
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "microservices", "LiveTrack"))
+sys.path.append(os.path.join(ROOT, "microservices", "Common"))
+
+import disk_spool
+from disk_spool import DiskSpool
+
+
+def event(n):
+    return {"event_type": "flush", "waste_volume": n, "timestamp": 1700000000.0 + n}
+
+
+def test_reopen_with_empty_newest_segment_keeps_sequence_numbers_increasing(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_spool, "SEGMENT_BYTES", 200)
+    directory = str(tmp_path / "spool")
+
+    spool = DiskSpool(directory, codec="json")
+    for n in range(10):
+        spool.append(event(n))
+    spool.close()
+
+    # A crash right after a roll leaves the newest segment empty
+    segments = sorted(glob.glob(os.path.join(directory, "segment-*.log")))
+    assert len(segments) > 2
+    open(segments[-1], "wb").close()
+    newest_first_seq = int(os.path.basename(segments[-1])[len("segment-"):-len(".log")])
+
+    spool = DiskSpool(directory, codec="json")
+    try:
+        assert spool.next_seq == newest_first_seq
+        seq = spool.append(event(99))
+        assert seq == newest_first_seq
+
+        last_seq, events = spool.read_batch(100)
+        assert last_seq == seq
+        assert events[-1]["waste_volume"] == 99
+        assert [e["waste_volume"] for e in events[:-1]] == list(range(newest_first_seq - 1))
+    finally:
+        spool.close()
@@ -0,0 +1,80 @@
+"""
+Tests for the shared event codec.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "microservices", "Common"))
+
+import event_codec
+from event_codec import CodecError
+
+FULL_EVENT = {"event_type": "flush", "waste_volume": 3, "timestamp": 1700000000.25, "id": (2 << 40) + 7,
+              "event_id": "0123456789abcdef", "station_id": "lunar-gateway", "astronaut_id": "astro-2"}
+
+
+def with_version(payload, version):
+    """Relabels a struct payload as an older version (their layouts only lack the newer fields)."""
+    return payload[:1] + bytes([version]) + payload[2:]
+
+
+# The fields each older version could carry
+@pytest.mark.parametrize("version, event", [
+    (1, {"event_type": "water_refill", "water_added": 50, "timestamp": 1700000000.5}),
+    (2, {"event_type": "planet_visit", "planet_name": "Kepler-22b ✨", "timestamp": 1700000000.0, "id": 42}),
+    (3, {"event_type": "flush", "waste_volume": 0, "timestamp": 1700000000.0, "id": 43, "event_id": "abc"}),
+    (4, FULL_EVENT),
+])
+def test_struct_versions_round_trip(version, event):
+    payload = event_codec.encode_events([event, {"event_type": "flush", "timestamp": 1.0}])
+    assert payload[:2] == b"S\x04"
+    assert event_codec.decode_events(with_version(payload, version)) == [event, {"event_type": "flush", "timestamp": 1.0}]
+
+
+def test_custom_types_and_json_fallback_round_trip():
+    custom = {"event_type": "airlock_cycle", "timestamp": 1700000000.0, "waste_volume": -2 ** 31}
+    assert event_codec.encode_events([custom])[:1] == b"S"
+    assert event_codec.decode_events(event_codec.encode_events([custom])) == [custom]
+
+    # Don't fit the struct layout: sent (and decoded) as JSON, unchanged
+    for event in ({**FULL_EVENT, "waste_volume": 2.5}, {**FULL_EVENT, "extra": True},
+                  {**FULL_EVENT, "water_added": 2 ** 31}):
+        payload = event_codec.encode_events([FULL_EVENT, event])
+        assert payload[:1] == b"J"
+        assert event_codec.decode_events(payload) == [FULL_EVENT, event]
+
+    assert event_codec.decode_events(event_codec.encode_events([FULL_EVENT], "json")) == [FULL_EVENT]
+    assert event_codec.decode_events(json.dumps(FULL_EVENT).encode()) == [FULL_EVENT]  # untagged, older senders
+
+
+@pytest.mark.parametrize("mangle", [
+    lambda payload: with_version(payload, 5),
+    lambda payload: with_version(payload, 0),
+    lambda payload: payload[:-1],
+    lambda payload: payload + b"\x00",
+    lambda payload: payload[:3],
+    lambda payload: b"X" + payload[1:],
+])
+def test_malformed_struct_payloads_are_undecodable(mangle):
+    with pytest.raises(CodecError):
+        event_codec.decode_events(mangle(event_codec.encode_events([FULL_EVENT])))
+
+
+@pytest.mark.parametrize("payload", [b"J[1, 2]", b"J\"flush\"", b"J42", b"Jnull", b"[null]", b"[{}, 3]", b"J[[{}]]"])
+def test_json_that_is_not_events_is_undecodable(payload):
+    with pytest.raises(CodecError):
+        event_codec.decode_events(payload)
+
+
+def test_json_event_or_list_decodes_to_a_list_of_dicts():
+    assert event_codec.decode_events(b'{"event_type": "flush"}') == [{"event_type": "flush"}]
+    assert event_codec.decode_events(b'J[{"event_type": "flush"}, {}]') == [{"event_type": "flush"}, {}]
+    assert event_codec.decode_events(b"J[]") == []
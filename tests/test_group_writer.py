@@ -0,0 +1,88 @@
+"""
+Tests for WaterLog's group-commit writer: event_id deduplication.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "microservices", "WaterLog"))
+
+import water_log
+from group_writer import GroupCommitWriter
+
+
+def row(event_id=None, event_type="flush", waste_volume=3):
+    return (event_type, waste_volume, None, None, time.time(), event_id, "main", None)
+
+
+@pytest.fixture(params=[100, 0], ids=["cache", "index-only"])
+def writer(request, tmp_path):
+    database = str(tmp_path / "water_log.db")
+    water_log.init_schema(database)
+    writer = GroupCommitWriter(database, max_delay=0, dedup_cache_size=request.param).start()
+    yield writer
+    writer.close(timeout=5)
+
+
+def count(writer, sql):
+    conn = sqlite3.connect(writer.database)
+    try:
+        return conn.execute(sql).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_retried_event_ids_are_stored_once_under_their_first_id(writer):
+    first = writer.write([row("a"), row("b"), row()], timeout=5)
+    assert first.duplicates == 0
+    assert first.ids == [first.first_id, first.first_id + 1, first.first_id + 2]
+
+    retry = writer.write([row("b"), row("c"), row("a")], timeout=5)
+    assert retry.duplicates == 2
+    assert retry.ids[0] == first.ids[1] and retry.ids[2] == first.ids[0]
+    assert retry.ids[1] not in first.ids
+    assert retry.receipt()["ids"] == retry.ids
+
+    # Events without an event_id are never deduplicated
+    assert writer.write([row()], timeout=5).duplicates == 0
+
+    assert count(writer, "SELECT COUNT(*) FROM events") == 5
+    # Duplicates don't reach the rollups or the tank state
+    assert count(writer, "SELECT flushes FROM tank_state") == 5
+    assert count(writer, "SELECT SUM(count) FROM events_minute") == 5
+
+    stats = writer.stats()
+    if writer.dedup_cache_size:
+        assert (stats["duplicates_cached"], stats["duplicates_indexed"]) == (2, 0)
+    else:
+        assert (stats["duplicates_cached"], stats["duplicates_indexed"]) == (0, 2)
+
+
+def test_repeated_event_id_within_one_request(writer):
+    request = writer.write([row("x"), row("x")], timeout=5)
+    assert request.duplicates == 1
+    assert request.ids[0] == request.ids[1] == request.first_id
+    assert count(writer, "SELECT COUNT(*) FROM events") == 1
+
+
+def test_cache_is_dropped_when_another_connection_deletes(writer):
+    if not writer.dedup_cache_size:
+        pytest.skip("only the cache can go stale")
+    stored = writer.write([row("a")], timeout=5)
+
+    conn = sqlite3.connect(writer.database)
+    with conn:
+        conn.execute("DELETE FROM events")  # e.g. /clear from a web worker
+    conn.close()
+
+    again = writer.write([row("a")], timeout=5)
+    assert again.duplicates == 0 and again.first_id != stored.first_id
+    assert count(writer, "SELECT COUNT(*) FROM events") == 1
@@ -0,0 +1,59 @@
+"""
+Tests for main_program's service supervisor: restart backoff.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import main_program
+from main_program import Service
+
+
+class RecordingStop:
+    """Stands in for Service._stopping: records each backoff wait instead of sleeping, stops after `waits`."""
+
+    def __init__(self, waits):
+        self.waits = waits
+        self.delays = []
+        self.stopped = False
+
+    def is_set(self):
+        return self.stopped
+
+    def set(self):
+        self.stopped = True
+
+    def wait(self, timeout=None):
+        self.delays.append(timeout)
+        self.stopped = len(self.delays) >= self.waits
+        return self.stopped
+
+
+def supervise(exit_code, waits):
+    service = Service("crasher", [sys.executable, "-c", f"import sys; sys.exit({exit_code})"])
+    service._stopping = RecordingStop(waits)
+    service._supervise()  # Runs in this thread until the recorder stops it
+    return service
+
+
+def test_crashes_in_a_row_double_the_backoff_up_to_the_cap():
+    service = supervise(exit_code=3, waits=7)
+    assert service._stopping.delays == [1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0]
+    assert service.restarts == 6
+    assert service.startup_seconds is not None  # Each start was "ready" (no probe) before it crashed
+
+
+def test_backoff_starts_over_after_a_stable_run(monkeypatch):
+    monkeypatch.setattr(main_program, "STABLE_AFTER", 0)  # Every run counts as stable
+    assert supervise(exit_code=3, waits=4)._stopping.delays == [1.0, 1.0, 1.0, 1.0]
+
+
+def test_clean_exit_is_not_restarted():
+    service = supervise(exit_code=0, waits=1)
+    assert service._stopping.delays == [] and service.restarts == 0
@@ -0,0 +1,82 @@
+"""
+Tests for WaterLog's retention: archiving old events and pruning minute rollups.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "microservices", "WaterLog"))
+
+import rollups
+import water_log
+from group_writer import GroupCommitWriter
+from retention import RetentionJob
+
+DAY = 86400
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+NOW = utc(2024, 3, 15)
+TIMESTAMPS = [
+    utc(2024, 1, 31, 23, 59, 59),  # January's archive
+    utc(2024, 2, 1),  # February's archive, from the first second
+    NOW - 31 * DAY,  # 2024-02-13, one day past the retention age
+    NOW - 29 * DAY,  # Stays hot
+    NOW - 60,
+]
+
+
+def query(database, sql, params=()):
+    conn = sqlite3.connect(database)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def test_retention_archives_by_month_and_keeps_the_hourly_totals(tmp_path):
+    database = str(tmp_path / "water_log.db")
+    archive_dir = str(tmp_path / "archive")
+    water_log.init_schema(database)
+    writer = GroupCommitWriter(database, max_delay=0).start()
+    try:
+        ids = writer.write([("flush", 2, None, None, timestamp, f"evt-{n}", "main", None)
+                            for n, timestamp in enumerate(TIMESTAMPS)], timeout=5).ids
+    finally:
+        writer.close(timeout=5)
+    hours_before = query(database, "SELECT * FROM events_hour ORDER BY bucket")
+
+    job = RetentionJob(database, archive_dir, retention_days=30, minute_rollup_days=40, batch_size=2, pause=0)
+    result = job.run_once(now=NOW)
+
+    assert result["events_archived"] == 3
+    assert [row[0] for row in query(database, "SELECT id FROM events ORDER BY id")] == ids[3:]
+    january = os.path.join(archive_dir, "water_log_2024-01.db")
+    february = os.path.join(archive_dir, "water_log_2024-02.db")
+    assert sorted(os.listdir(archive_dir)) == ["water_log_2024-01.db", "water_log_2024-02.db"]
+    assert query(january, "SELECT id, timestamp, event_id FROM events") == [(ids[0], TIMESTAMPS[0], "evt-0")]
+    assert query(february, "SELECT id, timestamp FROM events ORDER BY id") == [(ids[1], TIMESTAMPS[1]),
+                                                                              (ids[2], TIMESTAMPS[2])]
+
+    # Hourly totals stay for good; minute rollups go after minute_rollup_days (the two oldest here)
+    assert query(database, "SELECT * FROM events_hour ORDER BY bucket") == hours_before
+    assert result["minute_rollups_deleted"] == 2
+    assert [bucket for (bucket,) in query(database, "SELECT bucket FROM events_minute ORDER BY bucket")] == \
+        [int(timestamp // 60 * 60) for timestamp in TIMESTAMPS[2:]]
+
+    conn = sqlite3.connect(database)
+    assert rollups.archived_before(conn) == NOW - 30 * DAY
+    conn.close()
+
+    # A second pass has nothing left to move
+    assert job.run_once(now=NOW)["events_archived"] == 0
+    assert RetentionJob(database, archive_dir, 0, 40).run_once(now=NOW + 365 * DAY)["events_archived"] == 0
@@ -0,0 +1,133 @@
+"""
+Tests for WaterLog's per-minute and per-hour rollups.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "microservices", "WaterLog"))
+
+import rollups
+import water_log
+from group_writer import GroupCommitWriter
+
+HOUR = 1700002800.0  # 2023-11-14 23:00:00 UTC, a whole hour
+
+
+def row(event_type, timestamp, waste_volume=None, water_added=None):
+    return (event_type, waste_volume, water_added, None, timestamp, None, "main", None)
+
+
+ROWS = [
+    row("flush", HOUR, waste_volume=3),
+    row("flush", HOUR + 59.999, waste_volume=4),
+    row("flush", HOUR + 60, waste_volume=5),  # A bucket starts exactly at its boundary
+    row("flush", HOUR + 61),  # No volume counts as 0
+    row("water_refill", HOUR + 30, water_added=40),
+    row("water_refill", HOUR + 3599.5, water_added=10),
+    row("planet_visit", HOUR + 3600),
+]
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = str(tmp_path / "water_log.db")
+    water_log.init_schema(database)
+    return database
+
+
+def write(database, rows):
+    writer = GroupCommitWriter(database, max_delay=0).start()
+    try:
+        # One request per row and one for all of them: both paths fold into the rollups
+        writer.write(rows[:1], timeout=5)
+        writer.write(rows[1:], timeout=5)
+    finally:
+        writer.close(timeout=5)
+
+
+def table(database, name):
+    conn = sqlite3.connect(database)
+    try:
+        return conn.execute(f"SELECT bucket, event_type, count, waste_volume, water_added FROM {name} "
+                            "ORDER BY bucket, event_type").fetchall()
+    finally:
+        conn.close()
+
+
+def test_commits_fold_events_into_minute_and_hour_buckets(database):
+    write(database, ROWS)
+
+    minute = int(HOUR)
+    assert table(database, "events_minute") == [
+        (minute, "flush", 2, 7, 0),
+        (minute, "water_refill", 1, 0, 40),
+        (minute + 60, "flush", 2, 5, 0),
+        (minute + 3540, "water_refill", 1, 0, 10),
+        (minute + 3600, "planet_visit", 1, 0, 0),
+    ]
+    assert table(database, "events_hour") == [
+        (minute, "flush", 4, 12, 0),
+        (minute, "water_refill", 2, 0, 50),
+        (minute + 3600, "planet_visit", 1, 0, 0),
+    ]
+
+
+def test_bulk_range_and_rebuild_agree_with_the_commit_path(database, tmp_path):
+    write(database, ROWS)
+    expected = {name: table(database, name) for name in rollups.ROLLUPS}
+
+    # apply_since, as bulk imports use it, on a second copy
+    other = str(tmp_path / "other.db")
+    water_log.init_schema(other)
+    conn = sqlite3.connect(other)
+    with conn:
+        conn.executemany("INSERT INTO events (event_type, waste_volume, water_added, planet_name, timestamp, "
+                         "event_id, station_id, astronaut_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ROWS)
+        rollups.apply_since(conn, 0)
+    conn.close()
+    assert {name: table(other, name) for name in rollups.ROLLUPS} == expected
+
+    conn = sqlite3.connect(database, isolation_level=None)
+    rollups.rebuild(conn)
+    conn.close()
+    assert {name: table(database, name) for name in rollups.ROLLUPS} == expected
+
+
+def test_rebuild_keeps_buckets_from_before_the_archive_cutoff(database):
+    write(database, ROWS)
+
+    conn = sqlite3.connect(database, isolation_level=None)
+    with conn:
+        # As retention does: record the cutoff, then move the older events out
+        rollups.set_archived_before(conn, HOUR + 90)
+        conn.execute("DELETE FROM events WHERE timestamp < ?", (HOUR + 90,))
+        for name in rollups.ROLLUPS:
+            conn.execute(f"UPDATE {name} SET count = 99")  # Marks what rebuild leaves alone
+    rollups.set_archived_before(conn, HOUR)  # The cutoff never moves back
+    assert rollups.archived_before(conn) == HOUR + 90
+    rollups.rebuild(conn)
+    conn.close()
+
+    # Buckets starting before the cutoff (including the ones straddling it) are kept,
+    # the rest are recomputed from the remaining events
+    minute = int(HOUR)
+    assert [entry[:3] for entry in table(database, "events_minute")] == [
+        (minute, "flush", 99),
+        (minute, "water_refill", 99),
+        (minute + 60, "flush", 99),
+        (minute + 3540, "water_refill", 1),
+        (minute + 3600, "planet_visit", 1),
+    ]
+    assert [entry[:3] for entry in table(database, "events_hour")] == [
+        (minute, "flush", 99),
+        (minute, "water_refill", 99),
+        (minute + 3600, "planet_visit", 1),
+    ]
@@ -0,0 +1,212 @@
+"""
+Regression tests for WaterLog's ingestion path.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "microservices", "WaterLog"))
+
+import water_log
+from group_writer import GroupCommitWriter
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A Flask test client on a fresh database, with an in-process writer and no retention."""
+    monkeypatch.setattr(water_log, "DATABASE", str(tmp_path / "water_log.db"))
+    monkeypatch.setattr(water_log, "WRITER_ENDPOINT", "")
+    monkeypatch.setattr(water_log, "RETENTION_DAYS", 0)
+    monkeypatch.setattr(water_log, "writer", None)
+    water_log.init_db()
+    yield water_log.app.test_client()
+    if water_log.writer is not None:
+        water_log.writer.close(timeout=5)
+        water_log.writer = None
+
+
+def good_event(**fields):
+    return {"event_type": "flush", "waste_volume": 3, "timestamp": time.time(), **fields}
+
+
+@pytest.mark.parametrize("bad", [
+    {"timestamp": "abc"},
+    {"timestamp": float("nan")},
+    {"timestamp": float("inf")},
+    {"timestamp": True},
+    {"waste_volume": "3"},
+    {"water_added": "lots", "event_type": "water_refill"},
+    {"waste_volume": 2 ** 70},
+    {"water_added": -2 ** 64, "event_type": "water_refill"},
+])
+def test_bad_typed_event_is_rejected_and_writer_keeps_running(client, bad):
+    response = client.post("/log", json=good_event(**bad))
+    assert response.status_code == 400
+
+    response = client.post("/log", json=good_event())
+    assert response.status_code == 201
+    assert client.get("/history").get_json()["events"][0]["id"] == response.get_json()["id"]
+
+
+def test_writer_survives_rows_that_break_the_rollups(tmp_path):
+    database = str(tmp_path / "water_log.db")
+    water_log.init_schema(database)
+    writer = GroupCommitWriter(database, max_delay=0).start()
+    try:
+        # Bypasses event_to_row, as a future caller might
+        bad = writer.submit([("flush", 3, None, None, "abc", None, "main", None)])
+        assert bad.done.wait(5)
+        assert bad.error is not None
+
+        good = writer.write([("flush", 3, None, None, time.time(), None, "main", None)], timeout=5)
+        assert good.error is None and good.first_id is not None
+    finally:
+        writer.close(timeout=5)
+
+
+def test_since_id_polling_is_per_station(client):
+    client.post("/log_batch", json=[good_event(station_id="main"), good_event(station_id="mars")])
+
+    assert client.get("/history?since_id=0").status_code == 400
+    assert client.get("/export?since_id=0").status_code == 400
+
+    for station_id in ("main", "mars"):
+        page = client.get(f"/history?since_id=0&station_id={station_id}").get_json()
+        assert [event["station_id"] for event in page["events"]] == [station_id]
+        assert page["last_id"] == page["latest_id"] == page["events"][0]["id"]
+
+        client.post("/log", json=good_event(station_id=station_id))
+        newer = client.get(f"/history?since_id={page['last_id']}&station_id={station_id}").get_json()
+        assert len(newer["events"]) == 1 and newer["events"][0]["id"] > page["last_id"]
+
+
+def test_station_ids_are_case_insensitive_and_shard_creation_is_capped(client, monkeypatch):
+    monkeypatch.setattr(water_log, "MAX_STATIONS", 2)
+    monkeypatch.setattr(water_log, "registry", None)
+
+    assert client.post("/log", json=good_event(station_id="Mars")).status_code == 201
+    assert client.post("/log", json=good_event(station_id="MARS")).status_code == 201
+    page = client.get("/history?station_id=mArS").get_json()
+    assert [event["station_id"] for event in page["events"]] == ["mars", "mars"]
+
+    # main and mars fill the registry: a new station is refused, alone or alongside known ones
+    assert client.post("/log", json=good_event(station_id="venus")).status_code == 400
+    assert client.post("/log_batch", json=[good_event(), good_event(station_id="venus")]).status_code == 400
+    assert len(client.get("/history").get_json()["events"]) == 2
+    assert client.post("/log", json=good_event(station_id="mars")).status_code == 201
+
+
+def test_station_allow_list(client, monkeypatch):
+    monkeypatch.setattr(water_log, "STATIONS", {"mars"})
+
+    assert client.post("/log", json=good_event(station_id="Mars")).status_code == 201
+    assert client.post("/log", json=good_event()).status_code == 201
+    assert client.post("/log", json=good_event(station_id="venus")).status_code == 400
+
+
+@pytest.mark.parametrize("query", ["window=nan", "window=inf", "resolution=inf", "resolution=nan", "until=nan",
+                                   "until=-inf", "window=abc"])
+def test_stats_rejects_non_finite_parameters(client, query):
+    assert client.get(f"/stats?{query}").status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/history", "/export"])
+@pytest.mark.parametrize("query", ["since=nan", "until=nan", "since=-inf", "until=inf"])
+def test_time_filters_reject_non_finite_values(client, path, query):
+    assert client.get(f"{path}?{query}").status_code == 400
+
+
+def test_log_retry_returns_the_stored_id(client):
+    first = client.post("/log", json=good_event(event_id="evt-1")).get_json()
+    retry = client.post("/log", json=good_event(event_id="evt-1")).get_json()
+    assert first["duplicate"] is False
+    assert retry["duplicate"] is True and retry["id"] == first["id"]
+
+    batch = client.post("/log_batch", json=[good_event(event_id="evt-2"), good_event(event_id="evt-1")]).get_json()
+    assert batch["duplicates"] == 1 and batch["ids"][1] == first["id"]
+    assert len(client.get("/history").get_json()["events"]) == 2
+
+
+def test_history_merges_shards_and_pages_without_gaps(client):
+    events = []
+    for n in range(12):
+        # Shared timestamps across stations exercise the id tiebreak
+        events.append(good_event(station_id=("main", "mars", "venus")[n % 3], timestamp=1700000000.0 + n // 2))
+    ids = client.post("/log_batch", json=events).get_json()["ids"]
+    assert {stored_id >> water_log.shards.ID_SHARD_BITS for stored_id in ids} == {0, 1, 2}
+
+    pages, cursor = [], None
+    while True:
+        query = "limit=5&count=1" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(f"/history?{query}").get_json()
+        assert page["total"] == 12 and page["latest_id"] == max(ids)
+        pages.append(page["events"])
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            assert cursor is None
+            break
+
+    assert [len(page) for page in pages] == [5, 5, 2]
+    merged = [(event["timestamp"], event["id"]) for page in pages for event in page]
+    assert merged == sorted(((event["timestamp"], stored_id) for event, stored_id in zip(events, ids)), reverse=True)
+
+    mars = client.get("/history?station_id=mars&limit=3").get_json()
+    assert [event["station_id"] for event in mars["events"]] == ["mars"] * 3 and mars["has_more"]
+    assert mars["latest_id"] == max(stored_id for event, stored_id in zip(events, ids) if event["station_id"] == "mars")
+
+
+STATS_HOUR = 1700002800.0  # A whole hour (UTC)
+
+
+def stats(client, **params):
+    query = "&".join(f"{name}={value}" for name, value in {"until": STATS_HOUR + 3600, "window": 3600, **params}.items())
+    response = client.get(f"/stats?{query}")
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_stats_buckets_across_shards_and_sources(client):
+    client.post("/log_batch", json=[
+        good_event(timestamp=STATS_HOUR + 10, waste_volume=3),
+        good_event(timestamp=STATS_HOUR + 20, event_type="water_refill", water_added=40, waste_volume=None),
+        good_event(timestamp=STATS_HOUR + 130, waste_volume=5, astronaut_id="astro-1"),
+        good_event(timestamp=STATS_HOUR + 70, waste_volume=2, station_id="mars"),
+        good_event(timestamp=STATS_HOUR + 3700, event_type="water_refill", water_added=10, station_id="mars"),
+    ])
+
+    by_minute = stats(client, resolution=60)
+    assert by_minute["source"] == "events_minute"
+    assert [(b["start"] - STATS_HOUR, b["flushes"], b["refills"], b["waste_volume"], b["water_added"], b["ratio"])
+            for b in by_minute["buckets"]] == [(0, 1, 1, 3, 40, 1.0), (60, 1, 0, 2, 0, 2.0), (120, 1, 0, 5, 0, 3.0)]
+    assert by_minute["totals"] == {"flushes": 3, "refills": 1, "waste_volume": 10, "water_added": 40, "ratio": 3.0}
+
+    # The raw scan agrees with the rollups
+    raw = stats(client, resolution=60, raw=1)
+    assert raw["source"] == "events" and raw["buckets"] == by_minute["buckets"]
+
+    by_hour = stats(client, resolution=3600)
+    assert by_hour["source"] == "events_hour"
+    assert [(b["start"], b["flushes"], b["refills"]) for b in by_hour["buckets"]] == [(STATS_HOUR, 3, 1)]
+
+    # Not a whole number of minutes: counted from the events, slots start at since
+    odd = stats(client, resolution=90)
+    assert odd["source"] == "events"
+    assert [(b["start"] - STATS_HOUR, b["flushes"]) for b in odd["buckets"]] == [(0, 2), (90, 1)]
+
+    # Rollup windows widen to whole buckets
+    widened = stats(client, resolution=60, until=STATS_HOUR + 3590)
+    assert (widened["since"], widened["until"]) == (STATS_HOUR - 60, STATS_HOUR + 3600)
+    assert widened["buckets"][0]["start"] == STATS_HOUR
+
+    assert stats(client, resolution=60, station_id="mars")["totals"]["flushes"] == 1
+    assert stats(client, resolution=60, astronaut_id="astro-1")["totals"]["waste_volume"] == 5
+
+    assert client.get("/stats?window=3600&resolution=0.5").status_code == 400  # Too many buckets
+    assert client.get("/stats?window=-60").status_code == 400